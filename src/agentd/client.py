@@ -0,0 +1,68 @@
+"""
+Thin client for the agent daemon.
+
+Only uses the standard library so the CLI entry points can talk to a warm daemon
+without importing dspy, litellm or fastmcp.
+"""
+
+import json
+import os
+import socket
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+
+SOCKET_PATH = Path(
+    os.getenv(
+        "AGENTD_SOCKET", Path.home() / ".cache" / "dspy-demo" / "agentd.sock"
+    )
+)
+
+
+class DaemonError(Exception):
+    pass
+
+
+def ask_in_terminal(question: str) -> str:
+    print(f"🤖 Agent: {question}")
+    return input("👤 You: ")
+
+
+def call(
+    command: str,
+    args: Dict[str, Any],
+    ask: Callable[[str], str] = ask_in_terminal,
+    socket_path: Path = SOCKET_PATH,
+) -> Optional[Any]:
+    """
+    Run a command on the daemon and return its result.
+
+    Returns None when no daemon is listening, so callers can fall back to
+    running in-process. Errors raised by the handler come back as DaemonError.
+    """
+    if os.getenv("AGENTD_DISABLE") == "1" or not socket_path.exists():
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(socket_path))
+    except OSError:
+        sock.close()
+        return None
+
+    with sock, sock.makefile("rwb") as stream:
+        _send(stream, {"command": command, "args": args})
+        for line in stream:
+            message = json.loads(line)
+            kind = message.get("type")
+            if kind == "ask":
+                _send(stream, {"answer": ask(message["question"])})
+            elif kind == "result":
+                return message["result"]
+            elif kind == "error":
+                raise DaemonError(message["error"])
+    raise DaemonError("Daemon closed the connection without a result")
+
+
+def _send(stream, payload: Dict[str, Any]):
+    stream.write(json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n")
+    stream.flush()
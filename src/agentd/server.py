@@ -0,0 +1,149 @@
+"""
+Long-running agent daemon.
+
+Keeps LMs, MCP sessions, the tool catalog and the agent modules warm, and serves
+the `assist`, `planner`, `chat` and `meta_plan` CLIs over a Unix socket using
+newline-delimited JSON (see `agentd.client`).
+
+    agentd            # start the daemon, then use the CLIs as usual
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import signal
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict
+
+import dspy
+
+from agentd.client import SOCKET_PATH
+from lib.custom_lm.lms import Lm_Glm
+from lib.dspy_utils import list_tools, load_env_variable, server_key, wrap_lm
+
+
+Ask = Callable[[str], Awaitable[str]]
+# 客户端（例如被 Ctrl-C 的 CLI）中途断开时写 socket 抛出的异常
+_DISCONNECTED = (ConnectionResetError, BrokenPipeError)
+
+
+class AgentDaemon:
+    def __init__(self, socket_path: Path = SOCKET_PATH):
+        self.socket_path = socket_path
+        self.lms: Dict[str, dspy.BaseLM] = {}
+        self._stack = contextlib.AsyncExitStack()
+
+    async def warm_up(self):
+        load_env_variable()
+        from assist import agent as assist_agent
+        from chat.agent import InteractiveAgent
+        from chat.agent import client as chat_client
+        from meta_generate import planning
+        from multi_step_agent.modules import PlanThenReAct
+        from multi_step_agent.modules import client as planner_client
+
+        # 这些模块在构造时调用 init_dspy -> dspy.configure，必须在主 task 里完成；
+        # 之后每个请求只用 dspy.context 切换到各自 namespace 的 LM
+        self.planner = PlanThenReAct()
+        self.chat_agent = InteractiveAgent()
+        self.assist_agent = assist_agent
+        self.planning = planning
+        for namespace in ("assist", "chat", "planner", "meta_plan"):
+            self.lms[namespace] = wrap_lm(Lm_Glm, namespace)
+
+        # 提前连接并保持 MCP 会话；请求里的 `async with client` 会复用已建立的连接
+        clients = [assist_agent.client, chat_client, planner_client, planning.mcp_client]
+        for client in clients:
+            try:
+                await self._stack.enter_async_context(client)
+                await list_tools(client)
+            except Exception as e:
+                logging.warning(f"MCP server {server_key(client)} not ready: {e}")
+        logging.info("agentd warm-up complete")
+
+    async def _run_assist(self, args: Dict[str, Any], ask: Ask) -> str:
+        res = await self.assist_agent.run_agent(args["user_request"])
+        return res.process_result
+
+    async def _run_planner(self, args: Dict[str, Any], ask: Ask) -> str:
+        return await self.planner.forward(goal=args["goal"])
+
+    async def _run_chat(self, args: Dict[str, Any], ask: Ask) -> str:
+        plan = await self.chat_agent.forward(task_goal=args["user_request"], ask=ask)
+        return plan.result
+
+    async def _run_meta_plan(self, args: Dict[str, Any], ask: Ask) -> str:
+        with dspy.context(show_guidelines=True):
+            return await self.planning.exe_plan()
+
+    async def dispatch(self, command: str, args: Dict[str, Any], ask: Ask) -> Any:
+        handler = getattr(self, f"_run_{command}", None)
+        if handler is None:
+            raise ValueError(f"Unknown command: {command}")
+        with dspy.context(lm=self.lms[command]):
+            return await handler(args, ask)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        async def ask(question: str) -> str:
+            await _send(writer, {"type": "ask", "question": question})
+            line = await reader.readline()
+            if not line:
+                raise ConnectionResetError("client closed the connection")
+            return json.loads(line)["answer"]
+
+        try:
+            request = json.loads(await reader.readline())
+            logging.info(f"agentd request: {request}")
+            result = await self.dispatch(request["command"], request.get("args", {}), ask)
+            await _send(writer, {"type": "result", "result": result})
+        except _DISCONNECTED:
+            logging.info("agentd client disconnected")
+        except Exception as e:
+            logging.exception("agentd request failed")
+            # 客户端可能已经断开，错误只能留在日志里
+            with contextlib.suppress(*_DISCONNECTED):
+                await _send(writer, {"type": "error", "error": f"{type(e).__name__}: {e}"})
+        finally:
+            writer.close()
+
+    async def serve(self):
+        await self.warm_up()
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        if self.socket_path.exists():
+            self.socket_path.unlink()
+        # bind 时 socket 就以 0600 创建，不留其他用户可以连接的窗口
+        umask = os.umask(0o177)
+        try:
+            server = await asyncio.start_unix_server(self._handle, path=str(self.socket_path))
+        finally:
+            os.umask(umask)
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+
+        logging.info(f"agentd listening on {self.socket_path}")
+        try:
+            async with server:
+                await stop.wait()
+        finally:
+            if self.socket_path.exists():
+                self.socket_path.unlink()
+            await self._stack.aclose()
+
+
+async def _send(writer: asyncio.StreamWriter, payload: Dict[str, Any]):
+    writer.write(json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n")
+    await writer.drain()
+
+
+def run():
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(AgentDaemon().serve())
+
+
+if __name__ == "__main__":
+    run()
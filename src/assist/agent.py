@@ -0,0 +1,27 @@
+import dspy
+from lib.custom_lm.lms import Lm_Glm
+from lib import dspy_utils
+
+
+client = dspy_utils.create_client("http://127.0.0.1:8999/mcp")
+
+
+class DSPyAssistantService(dspy.Signature):
+    """You are a assistant agent. You are expect to help users get informations they need."""
+
+    user_request: str = dspy.InputField()
+    process_result: str = dspy.OutputField(desc=("使用中文回答"))
+
+
+async def run_agent(user_request: str):
+    async with client:
+        dspy_tools = await dspy_utils.list_tools(client)
+        # Create the agent
+        react = dspy.ReAct(DSPyAssistantService, tools=dspy_tools)
+        res = await react.acall(user_request=user_request)
+        return res
+
+
+async def resolve_user_request(user_request: str):
+    dspy_utils.init_dspy(Lm_Glm, namespace="assist")
+    return await run_agent(user_request)
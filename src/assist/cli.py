@@ -1,41 +1,23 @@
-import argparse
 import logging
 import asyncio
 
-import dspy
-from lib.custom_lm.lms import Lm_Glm
-from lib import dspy_utils
-from fastmcp import Client, FastMCP
-
+from agentd import client as agentd_client
 from lib.utils import parse_args
 
 
-client = Client("http://127.0.0.1:8999/mcp")
-
-
-class DSPyAssistantService(dspy.Signature):
-    """You are a assistant agent. You are expect to help users get informations they need."""
-
-    user_request: str = dspy.InputField()
-    process_result: str = dspy.OutputField(desc=("使用中文回答"))
-
-
 def run():
-    asyncio.run(run_async())
-
-
-async def run_async():
     args = parse_args()
+    logging.basicConfig(level=args.log_level)
     logging.info(f"User request: {args.user_request}")
-    res = await resolve_user_request(args.user_request)
-    logging.info(f"Process result: {res.process_result}")
+    # 优先交给常驻的 agentd，省掉 import 和 MCP 握手；没有运行时在本进程执行
+    result = agentd_client.call("assist", {"user_request": args.user_request})
+    if result is None:
+        result = asyncio.run(run_async(args.user_request))
+    logging.info(f"Process result: {result}")
+
 
+async def run_async(user_request: str) -> str:
+    from assist.agent import resolve_user_request
 
-async def resolve_user_request(user_request: str):
-    dspy_utils.init_dspy(Lm_Glm)
-    async with client:
-        dspy_tools = await dspy_utils.list_tools(client)
-        # Create the agent
-        react = dspy.ReAct(DSPyAssistantService, tools=dspy_tools)
-        res = await react.acall(user_request=user_request)
-        return res
+    res = await resolve_user_request(user_request)
+    return res.process_result
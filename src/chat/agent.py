@@ -1,17 +1,16 @@
 from email.policy import default
 from gc import collect
-from typing import List, Dict
+from typing import Awaitable, Callable, List, Dict
 import dspy
 from dspy import Module
 import dspy.signatures
 
 from lib import dspy_utils
 from lib.custom_lm.lms import Lm_Glm
-from fastmcp import Client
 import logging
 
 
-client = Client("http://127.0.0.1:8999/mcp")
+client = dspy_utils.create_client("http://127.0.0.1:8999/mcp")
 
 
 class AssessCompleteness(dspy.Signature):
@@ -50,6 +49,10 @@ class ExecuteTask(dspy.Signature):
 
 
 class InteractiveAgent(Module):
+    def __init__(self):
+        super().__init__()
+        dspy_utils.init_dspy(Lm_Glm, namespace="chat")
+
     def format_conversation(
         self,
         conversation: List[Dict[str, str]],
@@ -61,8 +64,15 @@ class InteractiveAgent(Module):
             )
         return "\n".join(formatted)
 
-    async def forward(self, task_goal: str):
-        dspy_utils.init_dspy(Lm_Glm)
+    async def forward(
+        self,
+        task_goal: str,
+        ask: Callable[[str], Awaitable[str]],
+    ):
+        """
+        ask 用于向用户提问并取得回复。agent 本身不输出任何内容：在 agentd 里运行时
+        stdout 属于守护进程，问题经 ask 转给客户端，结果由调用方输出。
+        """
         dspy_tools = []
         logging.info(f"Starting interactive agent for task: {task_goal}")
         async with client:
@@ -87,8 +97,7 @@ class InteractiveAgent(Module):
                 )
 
                 if not assessment.is_complete:
-                    print(f"🤖 Agent: {assessment.question_to_user}")
-                    user_reply = input("👤 You: ")
+                    user_reply = await ask(assessment.question_to_user)
                     conversation.append(
                         {
                             "agent": assessment.question_to_user,
@@ -101,5 +110,4 @@ class InteractiveAgent(Module):
                     plan = await execute.acall(
                         user_request=task_goal, conversation_history=user_inputs_str
                     )
-                    print(f"🤖 Agent: Task completed. Result: {plan.result}")
                     return plan
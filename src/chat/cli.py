@@ -1,11 +1,21 @@
 import asyncio
 import logging
-from chat.agent import InteractiveAgent
+
+from agentd import client as agentd_client
 from lib.utils import parse_args
 
 
 def run():
     args = parse_args()
+    logging.basicConfig(level=args.log_level)
     logging.info(f"User request: {args.user_request}")
-    agent = InteractiveAgent()
-    asyncio.run(agent.forward(task_goal=args.user_request))
+    result = agentd_client.call("chat", {"user_request": args.user_request})
+    if result is None:
+        from chat.agent import InteractiveAgent
+
+        async def ask(question: str) -> str:
+            return await asyncio.to_thread(agentd_client.ask_in_terminal, question)
+
+        agent = InteractiveAgent()
+        result = asyncio.run(agent.forward(task_goal=args.user_request, ask=ask)).result
+    print(f"🤖 Agent: Task completed. Result: {result}")
@@ -0,0 +1,139 @@
+"""
+A/B harness: three-call FacilitySupportAnalyzerMM vs. single-call FacilitySupportAnalyzerFusedMM.
+
+    python -m gpea_demo.ab_test --split test --threads 16
+    python -m gpea_demo.ab_test --limit 20
+
+Both variants run on the same examples with the LM response cache disabled, and the
+harness reports accuracy (overall and per field), LM calls, token cost, wall time
+and per-ticket latency.
+"""
+
+import argparse
+import math
+import threading
+import time
+from typing import Dict, List
+
+import dspy
+
+from lib.custom_lm.lms import Ollama_Limiter
+from lib.custom_lm.rate_limit import RateLimitedLM
+from lib.custom_lm.wrapper import LMWrapper
+from lib.dspy_utils import create_lm
+from gpea_demo.init_dataset import init_dataset
+from gpea_demo.labels import LabelArrays
+from gpea_demo.metrics import batch_metric, metric
+from gpea_demo.modules import FacilitySupportAnalyzerFusedMM, FacilitySupportAnalyzerMM
+
+
+class CountingLM(LMWrapper):
+    """统计调用次数和 token 用量"""
+
+    def __init__(self, lm: dspy.BaseLM):
+        super().__init__(lm)
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._lock = threading.Lock()
+
+    def _count(self, response):
+        usage = dict(getattr(response, "usage", None) or {})
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += usage.get("prompt_tokens") or 0
+            self.completion_tokens += usage.get("completion_tokens") or 0
+        return response
+
+    def forward(self, prompt=None, messages=None, **kwargs):
+        return self._count(super().forward(prompt=prompt, messages=messages, **kwargs))
+
+    async def aforward(self, prompt=None, messages=None, **kwargs):
+        return self._count(
+            await super().aforward(prompt=prompt, messages=messages, **kwargs)
+        )
+
+
+class TimedProgram:
+    """记录每条消息的端到端耗时"""
+
+    def __init__(self, program: dspy.Module):
+        self.program = program
+        self.latencies: List[float] = []
+        self._lock = threading.Lock()
+
+    def __call__(self, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self.program(**kwargs)
+        finally:
+            with self._lock:
+                self.latencies.append(time.perf_counter() - start)
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def _field_accuracy(results) -> Dict[str, float]:
+    gold = LabelArrays.from_examples([example for example, _, _ in results])
+    return batch_metric(gold, [prediction for _, prediction, _ in results]).field_accuracy()
+
+
+def run_variant(name: str, program: dspy.Module, lm: dspy.BaseLM, devset, threads: int) -> dict:
+    counter = CountingLM(lm)
+    timed = TimedProgram(program)
+    evaluate = dspy.Evaluate(
+        devset=devset, metric=metric, num_threads=threads, display_progress=True
+    )
+    start = time.perf_counter()
+    with dspy.context(lm=counter):
+        result = evaluate(timed)
+    wall = time.perf_counter() - start
+    n = len(devset)
+    return {
+        "variant": name,
+        "score": result.score,
+        **{f"acc_{field}": acc for field, acc in _field_accuracy(result.results).items()},
+        "lm_calls": counter.calls,
+        "calls_per_ticket": counter.calls / n,
+        "prompt_tokens_per_ticket": counter.prompt_tokens / n,
+        "completion_tokens_per_ticket": counter.completion_tokens / n,
+        "wall_s": wall,
+        "latency_p50_s": _percentile(timed.latencies, 50),
+        "latency_p95_s": _percentile(timed.latencies, 95),
+    }
+
+
+def print_report(rows: List[dict]):
+    keys = [key for key in rows[0] if key != "variant"]
+    print(f"\n{'':<30}" + "".join(f"{row['variant']:>16}" for row in rows))
+    for key in keys:
+        print(f"{key:<30}" + "".join(f"{row[key]:>16.3f}" for row in rows))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="A/B: three-call vs fused analyzer")
+    parser.add_argument("--split", choices=["train", "val", "test"], default="test")
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--threads", type=int, default=16)
+    args = parser.parse_args()
+
+    train_set, val_set, test_set = init_dataset()
+    devset = {"train": train_set, "val": val_set, "test": test_set}[args.split]
+    devset = devset[: args.limit] if args.limit else devset
+
+    # 不走响应缓存，否则第二个变体会命中第一个变体的结果或历史缓存
+    lm = RateLimitedLM(create_lm().copy(cache=False), Ollama_Limiter)
+    rows = [
+        run_variant("three_call", FacilitySupportAnalyzerMM(concurrent=True), lm, devset, args.threads),
+        run_variant("fused", FacilitySupportAnalyzerFusedMM(), lm, devset, args.threads),
+    ]
+    print_report(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""
+Offline benchmark for the gpea_demo evaluation and GEPA optimization loop.
+
+Runs dspy.Evaluate and GEPA on assets/dataset.json against a deterministic fake LM,
+so it needs no network and can run in CI:
+
+    cd src && python -m gpea_demo.benchmark
+    python -m gpea_demo.benchmark --suite evaluate gepa --threads 16 --latency lognormal:0.05,0.5
+    python -m gpea_demo.benchmark --replay recordings.jsonl --json bench.json
+
+The fake LM answers each ticket from the gold labels, right with probability
+`--accuracy`. Every GEPA reflection adds a refinement line to the instructions that
+raises that probability, so the optimizer accepts candidates and runs its full loop.
+Completions recorded from a live run (GPEA_RECORD_LM=path python -m gpea_demo.script)
+can be replayed with `--replay`; calls missing from the recording fall back to the
+scripted answers.
+
+Reported per scenario: LM calls, wall time, LM busy time, peak in-flight calls,
+thread utilization (LM busy time / (wall * threads); above 1 when the program fans
+out its own sub-calls) and metric-call overhead.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Callable, List
+
+import dspy
+
+from lib.custom_lm.scripted import (
+    ReplayLM,
+    ScriptedLM,
+    input_value,
+    parse_latency,
+    requested_fields,
+)
+from gpea_demo.init_dataset import init_dataset
+from gpea_demo.labels import CATEGORY_LABELS, SENTIMENT_LABELS, URGENCY_LABELS, LabelArrays, gold_of
+from gpea_demo.metrics import batch_metric, metric
+from gpea_demo.modules import FacilitySupportAnalyzerFusedMM, FacilitySupportAnalyzerMM
+from gpea_demo.predictions import metric_with_feedback
+
+
+REFINEMENT_MARK = "Refinement:"
+_CODE_BLOCK = re.compile(r"```(?:\w*\n)?(.*?)```", re.DOTALL)
+
+
+def _unit(*parts) -> float:
+    """由输入决定的 [0, 1) 伪随机数，与调用顺序、线程调度无关"""
+    digest = hashlib.sha256("\x1f".join(map(str, parts)).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2**64
+
+
+def _wrong(labels: List[str], gold: str) -> str:
+    return labels[(labels.index(gold) + 1) % len(labels)] if gold in labels else labels[0]
+
+
+class FacilityScript:
+    """
+    gpea_demo 的假 LM 脚本。
+
+    - 分类调用：按 gold 标签回答，每个字段以 accuracy 的概率答对；系统提示里每多一行
+      REFINEMENT_MARK，答对概率加 step（上限 0.95）
+    - 反思调用（没有输出字段）：在当前指令后追加一行 REFINEMENT_MARK，用 ``` 包起来
+    """
+
+    def __init__(self, examples, accuracy: float = 0.6, step: float = 0.1, seed: int = 0):
+        self.gold = {
+            example.message.strip(): gold_of(example) for example in examples
+        }
+        self.accuracy = accuracy
+        self.step = step
+        self.seed = seed
+        self._reflections = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, messages):
+        fields = requested_fields(messages)
+        if not fields:
+            return self.reflect(messages)
+        message = (input_value(messages, "message") or "").strip()
+        system = messages[0].get("content") or ""
+        accuracy = min(0.95, self.accuracy + self.step * system.count(REFINEMENT_MARK))
+        gold = self.gold.get(message) or {
+            "urgency": URGENCY_LABELS[0],
+            "sentiment": SENTIMENT_LABELS[0],
+            "categories": {},
+        }
+        outputs = {}
+        for field in fields:
+            correct = _unit(self.seed, message, field, system) < accuracy
+            if field == "urgency":
+                value = gold["urgency"]
+                outputs[field] = value if correct else _wrong(URGENCY_LABELS, value)
+            elif field == "sentiment":
+                value = gold["sentiment"]
+                outputs[field] = value if correct else _wrong(SENTIMENT_LABELS, value)
+            elif field == "categories":
+                chosen = {label for label, on in gold["categories"].items() if on}
+                if not correct:
+                    # 翻转一个类别
+                    flip = CATEGORY_LABELS[int(_unit(self.seed, message, "flip") * len(CATEGORY_LABELS))]
+                    chosen ^= {flip}
+                outputs[field] = [label for label in CATEGORY_LABELS if label in chosen]
+            else:
+                outputs[field] = "The message describes the customer's situation."
+        return outputs
+
+    def reflect(self, messages) -> str:
+        prompt = messages[-1].get("content") or ""
+        match = _CODE_BLOCK.search(prompt)
+        current = match.group(1).strip() if match else ""
+        with self._lock:
+            self._reflections += 1
+            n = self._reflections
+        return f"```\n{current}\n{REFINEMENT_MARK} read the whole message before answering ({n}).\n```"
+
+
+class TimedMetric:
+    """统计 metric 的调用次数和耗时，签名与 GEPA 要求的 metric 一致"""
+
+    def __init__(self, metric_fn: Callable):
+        self.metric_fn = metric_fn
+        self.calls = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self, example, pred, trace=None, pred_name=None, pred_trace=None):
+        start = time.perf_counter()
+        try:
+            return self.metric_fn(example, pred, trace, pred_name, pred_trace)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.calls += 1
+                self.seconds += elapsed
+
+
+def _row(name: str, wall: float, threads: int, task_lm: ScriptedLM, timed: TimedMetric, **extra) -> dict:
+    return {
+        "scenario": name,
+        "wall_s": wall,
+        "lm_calls": task_lm.calls,
+        "lm_busy_s": task_lm.busy,
+        "peak_in_flight": task_lm.peak_in_flight,
+        "thread_utilization": task_lm.busy / (wall * threads) if wall else 0.0,
+        "metric_calls": timed.calls,
+        "metric_s": timed.seconds,
+        "metric_us_per_call": timed.seconds / timed.calls * 1e6 if timed.calls else 0.0,
+        "metric_share": timed.seconds / wall if wall else 0.0,
+        **extra,
+    }
+
+
+def bench_evaluate(name: str, program: dspy.Module, devset, task_lm: ScriptedLM, threads: int) -> dict:
+    task_lm.reset_stats()
+    timed = TimedMetric(metric)
+    evaluate = dspy.Evaluate(devset=devset, metric=timed, num_threads=threads)
+    start = time.perf_counter()
+    result = evaluate(program)
+    wall = time.perf_counter() - start
+    return _row(f"evaluate/{name}", wall, threads, task_lm, timed, score=result.score)
+
+
+def bench_gepa(
+    train_set, val_set, task_lm: ScriptedLM, reflection_lm: ScriptedLM, threads: int, max_metric_calls: int
+) -> dict:
+    task_lm.reset_stats()
+    reflection_lm.reset_stats()
+    timed = TimedMetric(metric_with_feedback)
+    optimizer = dspy.GEPA(
+        metric=timed,
+        max_metric_calls=max_metric_calls,
+        num_threads=threads,
+        track_stats=True,
+        use_merge=False,
+        reflection_lm=reflection_lm,
+    )
+    start = time.perf_counter()
+    optimized = optimizer.compile(
+        FacilitySupportAnalyzerMM(concurrent=True), trainset=train_set, valset=val_set
+    )
+    wall = time.perf_counter() - start
+    results = optimized.detailed_results
+    return _row(
+        "gepa/three_call",
+        wall,
+        threads,
+        task_lm,
+        timed,
+        reflection_calls=reflection_lm.calls,
+        candidates=len(results.candidates),
+        best_val_score=max(results.val_aggregate_scores),
+    )
+
+
+def bench_metric(devset, task_lm: ScriptedLM, repeats: int = 50) -> dict:
+    """同一组预测上，逐条调用 metric 与 batch_metric 的耗时对比（不含 LM 延迟）"""
+    program = FacilitySupportAnalyzerFusedMM()
+    with dspy.context(lm=ScriptedLM(task_lm.script)):
+        predictions = [program(**example.inputs()) for example in devset]
+    gold = LabelArrays.from_examples(devset)
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        scalar = [metric(example, pred) for example, pred in zip(devset, predictions)]
+    scalar_s = (time.perf_counter() - start) / repeats
+    start = time.perf_counter()
+    for _ in range(repeats):
+        batch = batch_metric(gold, predictions)
+    batch_s = (time.perf_counter() - start) / repeats
+    # 预测已经编码成数组时（例如同一组预测换 metric 重复打分）只剩向量运算
+    encoded = LabelArrays.from_predictions(predictions)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        batch_metric(gold, encoded)
+    encoded_s = (time.perf_counter() - start) / repeats
+    return {
+        "scenario": "metric/scalar_vs_batch",
+        "examples": len(devset),
+        "scalar_ms": scalar_s * 1000,
+        "batch_ms": batch_s * 1000,
+        "batch_encoded_ms": encoded_s * 1000,
+        "same_score": abs(sum(scalar) / len(scalar) - batch.score) < 1e-9,
+    }
+
+
+def print_report(rows: List[dict]):
+    for row in rows:
+        print(f"\n{row['scenario']}")
+        for key, value in row.items():
+            if key == "scenario":
+                continue
+            text = f"{value:.4f}" if isinstance(value, float) else str(value)
+            print(f"  {key:<22}{text}")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline benchmark for gpea_demo Evaluate/GEPA")
+    parser.add_argument(
+        "--suite", nargs="+", default=["evaluate", "gepa", "metric"], choices=["evaluate", "gepa", "metric"]
+    )
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument(
+        "--latency",
+        default="lognormal:0.02,0.5",
+        help='fake LM latency: "0.05", "gauss:MEAN,JITTER", "lognormal:MEDIAN,SIGMA" or "empirical:FILE"',
+    )
+    parser.add_argument("--reflection-latency", default="0.0")
+    parser.add_argument("--accuracy", type=float, default=0.6)
+    parser.add_argument("--max-metric-calls", type=int, default=300)
+    parser.add_argument("--limit", type=int, default=None, help="use only the first N examples of each split")
+    parser.add_argument("--replay", type=Path, default=None, help="JSONL written by RecordingLM")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=Path, default=None, help="also write the report as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> List[dict]:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    train_set, val_set, test_set = init_dataset()
+    if args.limit:
+        train_set, val_set, test_set = (s[: args.limit] for s in (train_set, val_set, test_set))
+
+    script = FacilityScript(train_set + val_set + test_set, accuracy=args.accuracy, seed=args.seed)
+    latency = parse_latency(args.latency, seed=args.seed)
+    task_lm: ScriptedLM
+    if args.replay:
+        task_lm = ReplayLM(args.replay, latency=latency, fallback=script)
+    else:
+        task_lm = ScriptedLM(script, latency=latency)
+    reflection_lm = ScriptedLM(script, latency=parse_latency(args.reflection_latency, seed=args.seed))
+    dspy.configure(lm=task_lm)
+
+    rows: List[dict] = []
+    if "evaluate" in args.suite:
+        rows.append(bench_evaluate("three_call", FacilitySupportAnalyzerMM(), test_set, task_lm, args.threads))
+        rows.append(
+            bench_evaluate(
+                "three_call_concurrent", FacilitySupportAnalyzerMM(concurrent=True), test_set, task_lm, args.threads
+            )
+        )
+        rows.append(bench_evaluate("fused", FacilitySupportAnalyzerFusedMM(), test_set, task_lm, args.threads))
+    if "gepa" in args.suite:
+        rows.append(bench_gepa(train_set, val_set, task_lm, reflection_lm, args.threads, args.max_metric_calls))
+    if "metric" in args.suite:
+        rows.append(bench_metric(test_set, task_lm))
+    if isinstance(task_lm, ReplayLM):
+        print(f"Replayed {task_lm.replayed} recorded completions")
+
+    print_report(rows)
+    if args.json:
+        args.json.write_text(json.dumps(rows, indent=2), encoding="utf-8")
+    return rows
+
+
+if __name__ == "__main__":
+    main()
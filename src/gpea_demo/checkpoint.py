@@ -0,0 +1,299 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import dspy
+
+from lib.custom_lm.wrapper import LMWrapper
+
+
+RUNS_DIR = Path(
+    os.getenv("GPEA_RUNS_DIR", Path.home() / ".cache" / "dspy-demo" / "gpea_runs")
+)
+
+# GEPA 自己的状态文件（log_dir 下），每一轮开始时整体覆盖写入
+STATE_FILE = "gepa_state.bin"
+STATE_BACKUP = "gepa_state.bin.bak"
+CHECKPOINT_FILE = "checkpoint.json"
+BEST_PROGRAM_FILE = "best_program.json"
+REFLECTIONS_FILE = "reflections.jsonl"
+
+
+def _write_atomic(path: Path, content: str):
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def run_fingerprint(
+    student: dspy.Module, valset: List[dspy.Example], metric: Callable
+) -> Dict[str, Any]:
+    """
+    决定一次 GEPA 运行的内容：初始指令、验证集和 metric。gepa 恢复 gepa_state.bin 时不检查
+    这些，所以由 checkpoint.json 记录，prepare() 在不一致时拒绝继续。预算不在其中：
+    中断的运行可以换一个更大的预算继续跑。
+    """
+    examples = json.dumps(
+        [example.toDict() for example in valset], sort_keys=True, ensure_ascii=False, default=str
+    )
+    return {
+        "seed": {
+            name: predictor.signature.instructions
+            for name, predictor in student.named_predictors()
+        },
+        "valset": {
+            "size": len(valset),
+            "sha256": hashlib.sha256(examples.encode("utf-8")).hexdigest(),
+        },
+        # 与 EvalStore.wrap_metric 的命名相同，包装过的 metric 仍然是原来的名字
+        "metric": f"{metric.__module__}.{metric.__qualname__}",
+    }
+
+
+def _readable(path: Path) -> bool:
+    try:
+        with open(path, "rb") as f:
+            pickle.load(f)
+        return True
+    except Exception:
+        return False
+
+
+class ReflectionLog(LMWrapper):
+    """把每次反思的 prompt 和回复追加到 reflections.jsonl，恢复后历史仍然完整"""
+
+    def __init__(self, lm: dspy.BaseLM, path: Path):
+        super().__init__(lm)
+        self.path = Path(path)
+        self._write_lock = threading.Lock()
+
+    def _record(self, prompt, messages, response):
+        try:
+            text = response.choices[0].message.content
+        except (AttributeError, IndexError, KeyError, TypeError):
+            text = None
+        entry = {
+            "time": time.time(),
+            "prompt": prompt if prompt is not None else messages,
+            "response": text,
+        }
+        with self._write_lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+        return response
+
+    def forward(self, prompt=None, messages=None, **kwargs):
+        response = super().forward(prompt=prompt, messages=messages, **kwargs)
+        return self._record(prompt, messages, response)
+
+    async def aforward(self, prompt=None, messages=None, **kwargs):
+        response = await super().aforward(prompt=prompt, messages=messages, **kwargs)
+        return self._record(prompt, messages, response)
+
+
+class GEPACheckpointer:
+    """
+    GEPA 运行的检查点，所有文件都在 run_dir 下：
+
+    - gepa_state.bin：GEPA 自己的完整状态（作为 log_dir 传给 GEPA），同一个 run_dir
+      再次运行时 GEPA 从这里继续；另存一份 .bak，写到一半中断时用它恢复
+    - checkpoint.json：候选指令、父节点、验证集分数和 Pareto 前沿，便于查看
+    - best_program.json：当前最优候选，program.save() 的格式，可以直接 load
+    - reflections.jsonl：每次反思的 prompt 和回复
+
+    作为 stop callback 挂到 GEPA 上，每 every 轮写一次，本身从不要求停止。
+    checkpoint.json 和 .bak 只在 callback 里更新，而 GEPA 每轮开始时直接覆盖写
+    gepa_state.bin（非原子）：状态文件损坏时只能退回上一个 .bak，every > 1 时
+    最多丢失 every 轮的进度，所以默认每轮都写。
+    """
+
+    def __init__(self, run_dir: Path, student: dspy.Module, every: int = 1):
+        self.run_dir = Path(run_dir)
+        self.student = student
+        self.every = max(1, every)
+        self.resumed = False
+        self.fingerprint: Optional[Dict[str, Any]] = None
+        self.budget: Optional[Dict[str, Any]] = None
+        self._best_index: Optional[int] = None
+        self._last_iteration: Optional[int] = None
+
+    def _read_checkpoint(self) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads((self.run_dir / CHECKPOINT_FILE).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def prepare(
+        self, valset: List[dspy.Example], metric: Callable, budget: Dict[str, Any]
+    ) -> "GEPACheckpointer":
+        """
+        检查 run_dir：已有 GEPA 状态时确认它属于同一次运行（初始指令、验证集、metric 都相同）
+        再继续，否则抛出 ValueError；新运行先把 fingerprint 写进 checkpoint.json。
+        budget 只记录下来，恢复时可以改（例如调大 max_metric_calls 继续跑）。
+        """
+        self.fingerprint = run_fingerprint(self.student, valset, metric)
+        # 与 checkpoint.json 中读回的值比较，先做一次 JSON 往返
+        self.budget = json.loads(json.dumps(budget, sort_keys=True, default=str))
+        self.run_dir.mkdir(parents=True, exist_ok=True)
+        state, backup = self.run_dir / STATE_FILE, self.run_dir / STATE_BACKUP
+        if state.exists() and not _readable(state):
+            if backup.exists():
+                logging.warning(f"{state} is corrupt, restoring the previous checkpoint")
+                shutil.copyfile(backup, state)
+            else:
+                logging.warning(f"{state} is corrupt and has no backup, starting over")
+                state.unlink()
+        self.resumed = state.exists()
+        checkpoint = self._read_checkpoint() or {}
+        if not self.resumed:
+            _write_atomic(
+                self.run_dir / CHECKPOINT_FILE,
+                json.dumps(
+                    {"fingerprint": self.fingerprint, "budget": self.budget, "updated": time.time()},
+                    indent=2,
+                ),
+            )
+            return self
+
+        previous = checkpoint.get("fingerprint")
+        if previous != self.fingerprint:
+            changed = (
+                sorted(k for k in self.fingerprint if previous.get(k) != self.fingerprint[k])
+                if isinstance(previous, dict)
+                else ["fingerprint missing"]
+            )
+            raise ValueError(
+                f"{self.run_dir} holds a GEPA run with a different setup ({', '.join(changed)}); "
+                f"use a new run directory instead of resuming it"
+            )
+        if checkpoint.get("budget") != self.budget:
+            logging.info(
+                f"GEPA budget changed from {checkpoint.get('budget')} to {self.budget}; "
+                f"the run continues under the new budget"
+            )
+        if "iteration" in checkpoint:
+            logging.info(
+                f"Resuming GEPA run in {self.run_dir} after iteration {checkpoint['iteration']} "
+                f"({checkpoint['total_metric_calls']} metric calls, "
+                f"{len(checkpoint['candidates'])} candidates)"
+            )
+        else:
+            logging.info(f"Resuming GEPA run in {self.run_dir}")
+        return self
+
+    # ---- 挂到 GEPA 上 ----
+
+    def gepa_options(self, reflection_lm: dspy.BaseLM) -> Dict[str, Any]:
+        """GEPA(...) 需要的 log_dir、reflection_lm 和 gepa_kwargs"""
+        return {
+            "log_dir": str(self.run_dir),
+            "reflection_lm": ReflectionLog(reflection_lm, self.run_dir / REFLECTIONS_FILE),
+            "gepa_kwargs": {"stop_callbacks": [self]},
+        }
+
+    def __call__(self, state) -> bool:
+        if state.i != self._last_iteration and (state.i + 1) % self.every == 0:
+            self._last_iteration = state.i
+            try:
+                self.write(state)
+            except Exception as e:
+                # 检查点失败不应该中断优化本身
+                logging.warning(f"Failed to write GEPA checkpoint: {e}")
+        return False
+
+    # ---- 写检查点 ----
+
+    def build_program(self, candidate: Dict[str, str]) -> dspy.Module:
+        # 与 GEPA 的 DspyAdapter.build_program 相同
+        program = self.student.deepcopy()
+        for name, predictor in program.named_predictors():
+            if name in candidate:
+                predictor.signature = predictor.signature.with_instructions(candidate[name])
+        return program
+
+    def write(self, state):
+        scores = state.program_full_scores_val_set
+        best_index = max(range(len(scores)), key=scores.__getitem__)
+        checkpoint = {
+            "fingerprint": self.fingerprint,
+            "budget": self.budget,
+            "iteration": state.i,
+            "total_metric_calls": state.total_num_evals,
+            "best_index": best_index,
+            "candidates": [
+                {
+                    "index": index,
+                    "instructions": candidate,
+                    "parents": state.parent_program_for_candidate[index],
+                    "val_score": scores[index],
+                    "discovered_at_metric_calls": state.num_metric_calls_by_discovery[index],
+                }
+                for index, candidate in enumerate(state.program_candidates)
+            ],
+            "pareto_front": {
+                "scores": state.pareto_front_valset,
+                "programs": [sorted(programs) for programs in state.program_at_pareto_front_valset],
+            },
+            "updated": time.time(),
+        }
+        _write_atomic(
+            self.run_dir / CHECKPOINT_FILE,
+            json.dumps(checkpoint, ensure_ascii=False, indent=2, default=str),
+        )
+        if best_index != self._best_index:
+            self.export(self.build_program(state.program_candidates[best_index]))
+            self._best_index = best_index
+        self._backup_state()
+
+    def _backup_state(self):
+        state = self.run_dir / STATE_FILE
+        if not state.exists():
+            return
+        fd, tmp = tempfile.mkstemp(dir=self.run_dir, suffix=".tmp")
+        os.close(fd)
+        shutil.copyfile(state, tmp)
+        if _readable(Path(tmp)):
+            os.replace(tmp, self.run_dir / STATE_BACKUP)
+        else:
+            os.unlink(tmp)
+
+    def export(self, program: dspy.Module, path: Optional[Path] = None) -> Path:
+        """program.save() 的 JSON 格式，用 Program().load(path) 读回"""
+        path = Path(path or self.run_dir / BEST_PROGRAM_FILE)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".json")
+        os.close(fd)
+        try:
+            program.save(tmp)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return path
+
+
+def run_dir_for(name: Optional[str] = None, resume: bool = False) -> Path:
+    """
+    name 或 GPEA_RUN 指定时使用 RUNS_DIR/<name>（已有状态就继续）；resume=True 时继续
+    最近一次留下 GEPA 状态的运行；否则每次新建一个带时间戳的目录
+    """
+    name = name or os.getenv("GPEA_RUN")
+    if name:
+        return RUNS_DIR / name
+    if resume:
+        runs = [path.parent for path in RUNS_DIR.glob(f"*/{STATE_FILE}")]
+        if runs:
+            return max(runs, key=lambda path: (path / STATE_FILE).stat().st_mtime)
+        logging.info(f"No GEPA run to resume in {RUNS_DIR}, starting a new one")
+    return RUNS_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
@@ -0,0 +1,256 @@
+import hashlib
+import json
+import os
+import random
+import shutil
+import tempfile
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
+
+import dspy
+import numpy as np
+
+from gpea_demo.labels import (
+    CATEGORY_LABELS,
+    SENTIMENT_LABELS,
+    URGENCY_LABELS,
+    LabelArrays,
+    encode_sentiment,
+    encode_urgency,
+    parse_gold,
+)
+
+
+# src/gpea_demo/ -> 仓库根目录下的 assets/
+DATASET_PATH = Path(__file__).resolve().parents[2] / "assets" / "dataset.json"
+CACHE_DIR = Path(
+    os.getenv("GPEA_DATASET_CACHE_DIR", Path.home() / ".cache" / "dspy-demo" / "gpea_dataset")
+)
+# 缓存格式变化时加一，旧缓存会被重建
+FORMAT_VERSION = 1
+SPLITS = ("train", "val", "test")
+SPLIT_FRACTIONS = (0.33, 0.66)
+SPLIT_SEED = 0
+
+_META = "meta.json"
+
+
+def _records(path: Path) -> Iterator[Dict[str, Any]]:
+    """.jsonl 逐行读取，适合很大的工单导出；.json 是一个列表"""
+    if path.suffix == ".jsonl":
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        yield from json.loads(path.read_text(encoding="utf-8"))
+
+
+def _source_info(path: Path) -> Dict[str, Any]:
+    stat = path.stat()
+    return {"path": str(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def cache_root(source: Path) -> Path:
+    return CACHE_DIR / hashlib.sha1(str(source).encode("utf-8")).hexdigest()[:16]
+
+
+def split_order(n: int) -> np.ndarray:
+    """
+    与原来的 init_dataset 相同的划分：random.Random(0) 打乱后按 33% / 66% 切分。
+    shuffle 的结果只取决于长度，所以打乱下标和打乱 Example 列表得到同样的顺序。
+    """
+    order = list(range(n))
+    random.Random(SPLIT_SEED).shuffle(order)
+    return np.asarray(order, dtype=np.int64)
+
+
+def split_bounds(n: int) -> Dict[str, tuple]:
+    a, b = (int(n * fraction) for fraction in SPLIT_FRACTIONS)
+    return {"train": (0, a), "val": (a, b), "test": (b, n)}
+
+
+class _TextColumn:
+    """一列变长 UTF-8 字符串：所有内容拼接在 <name>.bin 中，offsets 记录边界"""
+
+    def __init__(self, root: Path, name: str):
+        self.offsets = np.load(root / f"{name}.offsets.npy", mmap_mode="r")
+        size = int(self.offsets[-1])
+        # 空文件不能 memmap
+        self.data = (
+            np.memmap(root / f"{name}.bin", dtype=np.uint8, mode="r")
+            if size
+            else np.zeros(0, dtype=np.uint8)
+        )
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return self.data[start:end].tobytes().decode("utf-8")
+
+
+class _TextWriter:
+    def __init__(self, root: Path, name: str):
+        self.root, self.name = root, name
+        self.file = open(root / f"{name}.bin", "wb")
+        self.offsets = array("q", [0])
+
+    def write(self, text: str):
+        data = text.encode("utf-8")
+        self.file.write(data)
+        self.offsets.append(self.offsets[-1] + len(data))
+
+    def close(self):
+        self.file.close()
+        np.save(self.root / f"{self.name}.offsets.npy", np.frombuffer(self.offsets, dtype=np.int64))
+
+
+def build_cache(source: Path, root: Path) -> Path:
+    """
+    把数据集转换成列式缓存，逐条读取、逐条写出，不会同时持有所有 Example：
+
+    - message / answer：拼接的 UTF-8 文本 + int64 偏移
+    - urgency / sentiment：int8 标签下标；categories：(n, 类别数) 的布尔矩阵
+    - order：确定性的划分顺序，meta.json 里记录各个划分的范围
+    """
+    root.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(dir=root.parent, prefix=f".{root.name}-"))
+    try:
+        messages = _TextWriter(staging, "message")
+        answers = _TextWriter(staging, "answer")
+        urgency, sentiment = array("b"), array("b")
+        categories = bytearray()
+        category_index = {label: i for i, label in enumerate(CATEGORY_LABELS)}
+        for record in _records(source):
+            messages.write(record["fields"]["input"])
+            answers.write(record["answer"])
+            gold = json.loads(record["answer"])
+            urgency.append(encode_urgency(gold["urgency"]))
+            sentiment.append(encode_sentiment(gold["sentiment"]))
+            row = bytearray(len(CATEGORY_LABELS))
+            for label, value in gold["categories"].items():
+                if value:
+                    row[category_index[label]] = 1
+            categories += row
+        messages.close()
+        answers.close()
+
+        n = len(urgency)
+        np.save(staging / "urgency.npy", np.frombuffer(urgency, dtype=np.int8))
+        np.save(staging / "sentiment.npy", np.frombuffer(sentiment, dtype=np.int8))
+        np.save(
+            staging / "categories.npy",
+            np.frombuffer(bytes(categories), dtype=bool).reshape(n, len(CATEGORY_LABELS)),
+        )
+        np.save(staging / "order.npy", split_order(n))
+        meta = {
+            "version": FORMAT_VERSION,
+            "source": _source_info(source),
+            "rows": n,
+            "splits": split_bounds(n),
+            "labels": {
+                "urgency": URGENCY_LABELS,
+                "sentiment": SENTIMENT_LABELS,
+                "categories": CATEGORY_LABELS,
+            },
+        }
+        # meta.json 最后写，存在即表示缓存完整
+        (staging / _META).write_text(json.dumps(meta), encoding="utf-8")
+        shutil.rmtree(root, ignore_errors=True)
+        try:
+            staging.rename(root)
+        except OSError:
+            # 另一个进程刚刚建好了同样的缓存
+            shutil.rmtree(staging, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return root
+
+
+def _is_fresh(root: Path, source: Path) -> bool:
+    try:
+        meta = json.loads((root / _META).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return False
+    return (
+        meta.get("version") == FORMAT_VERSION
+        and meta.get("source") == _source_info(source)
+        and meta.get("labels", {}).get("categories") == CATEGORY_LABELS
+    )
+
+
+class TicketSplit(Sequence):
+    """一个划分的惰性视图：按需构造 dspy.Example，iter_examples 流式遍历"""
+
+    def __init__(self, dataset: "TicketDataset", indices: np.ndarray):
+        self.dataset = dataset
+        self.indices = indices
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            return [self.dataset.example(int(i)) for i in self.indices[index]]
+        return self.dataset.example(int(self.indices[index]))
+
+    def __iter__(self) -> Iterator[dspy.Example]:
+        for i in self.indices:
+            yield self.dataset.example(int(i))
+
+    def labels(self) -> LabelArrays:
+        return self.dataset.labels[self.indices]
+
+    def to_list(self) -> List[dspy.Example]:
+        return list(self)
+
+
+class TicketDataset:
+    """
+    内存映射的工单数据集。打开时只读取 meta.json 和偏移/标签数组（mmap），
+    文本在访问某一行时才解码，不会一次性构造所有 dspy.Example。
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.meta = json.loads((self.root / _META).read_text(encoding="utf-8"))
+        self.messages = _TextColumn(self.root, "message")
+        self.answers = _TextColumn(self.root, "answer")
+        self.labels = LabelArrays(
+            urgency=np.load(self.root / "urgency.npy", mmap_mode="r"),
+            sentiment=np.load(self.root / "sentiment.npy", mmap_mode="r"),
+            categories=np.load(self.root / "categories.npy", mmap_mode="r"),
+        )
+        self.order = np.load(self.root / "order.npy", mmap_mode="r")
+
+    def __len__(self) -> int:
+        return self.meta["rows"]
+
+    def example(self, i: int) -> dspy.Example:
+        # answer 在构造 example 时解析一次，metric 通过 labels.gold_of 直接取 gold
+        answer = self.answers[i]
+        return dspy.Example(
+            {"message": self.messages[i], "answer": answer, "gold": parse_gold(answer)}
+        ).with_inputs("message")
+
+    def split(self, name: str) -> TicketSplit:
+        start, end = self.meta["splits"][name]
+        return TicketSplit(self, self.order[start:end])
+
+    def iter_examples(self, start: int = 0, end: Optional[int] = None) -> Iterator[dspy.Example]:
+        """按原始顺序流式遍历，用于数据量大到无法全部放进内存的导出"""
+        for i in range(start, len(self) if end is None else end):
+            yield self.example(i)
+
+
+def load_dataset(source: Optional[Path] = None, rebuild: bool = False) -> TicketDataset:
+    """打开 source 对应的缓存；不存在、格式旧了或者源文件有变化时先重建"""
+    source = Path(source or os.getenv("GPEA_DATASET", DATASET_PATH)).resolve()
+    root = cache_root(source)
+    if rebuild or not _is_fresh(root, source):
+        build_cache(source, root)
+    return TicketDataset(root)
@@ -0,0 +1,245 @@
+import functools
+import hashlib
+import importlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+import dspy
+
+
+DEFAULT_STORE_PATH = Path.home() / ".cache" / "dspy-demo" / "gpea_eval.sqlite3"
+
+# dspy.dsp.utils.settings 这个名字被 Settings 实例遮住了，需要从模块里拿全局配置
+_dspy_settings_module = importlib.import_module("dspy.dsp.utils.settings")
+
+
+@dataclass
+class EvalStats:
+    prediction_hits: int = 0
+    prediction_misses: int = 0
+    score_hits: int = 0
+    score_misses: int = 0
+
+
+def _digest(payload: Any) -> str:
+    text = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _demo(demo) -> Any:
+    return demo.toDict() if hasattr(demo, "toDict") else demo
+
+
+def program_fingerprint(program: dspy.Module) -> str:
+    """程序类名 + 每个 predictor 的签名、指令和 demos + 当前 LM"""
+    lm = dspy.settings.lm
+    return _digest(
+        {
+            "program": type(program).__name__,
+            "lm": getattr(lm, "model", type(lm).__name__),
+            "predictors": [
+                {
+                    "name": name,
+                    "signature": predictor.signature.signature,
+                    "instructions": predictor.signature.instructions,
+                    "demos": [_demo(demo) for demo in predictor.demos],
+                }
+                for name, predictor in program.named_predictors()
+            ],
+        }
+    )
+
+
+def example_id(inputs: Dict[str, Any]) -> str:
+    """数据集里没有 id，用输入字段的内容作为样本 id"""
+    return _digest(inputs)
+
+
+def _capturing_trace() -> bool:
+    # GEPA 收集反思用的轨迹时会用 dspy.context(trace=[]) 换一个新的 trace 列表，这时必须真正调用 LM
+    trace = dspy.settings.trace
+    return trace is not None and trace is not _dspy_settings_module.main_thread_config["trace"]
+
+
+class EvalStore:
+    """
+    按 (程序指纹, 样本 id) 保存预测结果和 metric 分数的 SQLite 存储。
+
+    指纹只由指令、demos 等决定，GEPA 重复评估没有变化的候选、或者中断后重新运行时，
+    已经评估过的 (程序, 样本) 直接读取结果，不再调用 LM。
+    """
+
+    def __init__(self, path: Path = DEFAULT_STORE_PATH):
+        self.path = Path(path)
+        self.stats = EvalStats()
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS predictions (
+                fingerprint TEXT NOT NULL,
+                example_id TEXT NOT NULL,
+                prediction TEXT NOT NULL,
+                created REAL NOT NULL,
+                PRIMARY KEY (fingerprint, example_id)
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS scores (
+                fingerprint TEXT NOT NULL,
+                example_id TEXT NOT NULL,
+                metric TEXT NOT NULL,
+                score REAL NOT NULL,
+                created REAL NOT NULL,
+                PRIMARY KEY (fingerprint, example_id, metric)
+            )
+            """
+        )
+        self._conn.commit()
+
+    # ---- 预测 ----
+
+    def get_prediction(self, fingerprint: str, example: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT prediction FROM predictions WHERE fingerprint = ? AND example_id = ?",
+                (fingerprint, example),
+            ).fetchone()
+            if row is None:
+                self.stats.prediction_misses += 1
+                return None
+            self.stats.prediction_hits += 1
+        return json.loads(row[0])
+
+    def put_prediction(self, fingerprint: str, example: str, prediction: dict):
+        value = json.dumps(prediction, ensure_ascii=False, default=str)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?)",
+                (fingerprint, example, value, time.time()),
+            )
+            self._conn.commit()
+
+    # ---- 分数 ----
+
+    def get_score(self, fingerprint: str, example: str, metric: str) -> Optional[float]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT score FROM scores WHERE fingerprint = ? AND example_id = ? AND metric = ?",
+                (fingerprint, example, metric),
+            ).fetchone()
+            if row is None:
+                self.stats.score_misses += 1
+                return None
+            self.stats.score_hits += 1
+        return row[0]
+
+    def put_score(self, fingerprint: str, example: str, metric: str, score: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?, ?)",
+                (fingerprint, example, metric, float(score), time.time()),
+            )
+            self._conn.commit()
+
+    def wrap_metric(self, metric: Callable) -> Callable:
+        """
+        只缓存整体评估的分数（pred_name 为空、没有 trace 的调用），
+        GEPA 针对单个 predictor 要反馈时照常调用原 metric。
+        """
+        name = f"{metric.__module__}.{metric.__qualname__}"
+
+        @functools.wraps(metric)
+        def stored_metric(example, pred, trace=None, pred_name=None, pred_trace=None):
+            key = getattr(pred, "_eval_key", None)
+            if key is None or trace is not None or pred_name is not None:
+                return metric(example, pred, trace, pred_name, pred_trace)
+            score = self.get_score(*key, name)
+            if score is None:
+                score = metric(example, pred, trace, pred_name, pred_trace)
+                self.put_score(*key, name, getattr(score, "score", score))
+            return score
+
+        return stored_metric
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            predictions = self._conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+            scores = self._conn.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+        return {**asdict(self.stats), "predictions": predictions, "scores": scores}
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM predictions")
+            self._conn.execute("DELETE FROM scores")
+            self._conn.commit()
+
+
+# 当前生效的存储；Evaluate/GEPA 在自己的线程里调用程序，所以用模块级变量而不是 ContextVar
+_active_store: Optional[EvalStore] = None
+
+
+@contextmanager
+def use_eval_store(store: Optional[EvalStore]):
+    global _active_store
+    previous, _active_store = _active_store, store
+    try:
+        yield store
+    finally:
+        _active_store = previous
+
+
+def stored(forward: Callable) -> Callable:
+    """
+    给 dspy.Module.forward 加上评估结果缓存。
+
+    use_eval_store 生效时，同一个程序指纹和输入的预测直接从存储中读取；
+    返回的 Prediction 带有 _eval_key，供 wrap_metric 缓存分数。
+    """
+
+    @functools.wraps(forward)
+    def wrapper(self, *args, **kwargs):
+        store = _active_store
+        if store is None or args or _capturing_trace():
+            return forward(self, *args, **kwargs)
+        key = (program_fingerprint(self), example_id(kwargs))
+        outputs = store.get_prediction(*key)
+        if outputs is not None:
+            prediction = dspy.Prediction(**outputs)
+        else:
+            prediction = forward(self, **kwargs)
+            store.put_prediction(*key, prediction.toDict())
+        prediction._eval_key = key
+        return prediction
+
+    return wrapper
+
+
+_shared_store: Optional[EvalStore] = None
+_shared_store_lock = threading.Lock()
+
+
+def get_eval_store() -> Optional[EvalStore]:
+    """进程内共享的评估存储；设置 GPEA_EVAL_STORE=0 时返回 None"""
+    global _shared_store
+    if os.getenv("GPEA_EVAL_STORE", "1") == "0":
+        return None
+    with _shared_store_lock:
+        if _shared_store is None:
+            _shared_store = EvalStore(
+                Path(os.getenv("GPEA_EVAL_STORE_PATH", DEFAULT_STORE_PATH))
+            )
+            logging.info(f"Using evaluation store at {_shared_store.path}")
+        return _shared_store
@@ -1,29 +1,12 @@
-import dspy
-import json
-import random
-from pathlib import Path
-from typing import List, Literal
+from gpea_demo.dataset_cache import load_dataset
 
 
 def init_dataset():
-    # Load from the local dataset to avoid network dependency
-    data_path = Path(__file__).parent.parent / "assets" / "dataset.json"
-    dataset = json.loads(data_path.read_text())
-    dspy_dataset = [
-        dspy.Example(
-            {
-                "message": d["fields"]["input"],
-                "answer": d["answer"],
-            }
-        ).with_inputs("message")
-        for d in dataset
-    ]
-    random.Random(0).shuffle(dspy_dataset)
-    train_set = dspy_dataset[: int(len(dspy_dataset) * 0.33)]
-    val_set = dspy_dataset[
-        int(len(dspy_dataset) * 0.33) : int(len(dspy_dataset) * 0.66)
-    ]
-    test_set = dspy_dataset[int(len(dspy_dataset) * 0.66) :]
+    # 从本地列式缓存读取，第一次运行时由 assets/dataset.json 生成，避免网络依赖
+    dataset = load_dataset()
+    train_set = dataset.split("train").to_list()
+    val_set = dataset.split("val").to_list()
+    test_set = dataset.split("test").to_list()
     return train_set, val_set, test_set
 
 
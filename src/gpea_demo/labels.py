@@ -0,0 +1,97 @@
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, List, Sequence, get_args
+
+import numpy as np
+
+from gpea_demo.signatures import Category, Sentiment, Urgency
+
+
+URGENCY_LABELS: List[str] = list(get_args(Urgency))
+SENTIMENT_LABELS: List[str] = list(get_args(Sentiment))
+CATEGORY_LABELS: List[str] = list(get_args(Category))
+
+_URGENCY_INDEX = {label: i for i, label in enumerate(URGENCY_LABELS)}
+_SENTIMENT_INDEX = {label: i for i, label in enumerate(SENTIMENT_LABELS)}
+_CATEGORY_INDEX = {label: i for i, label in enumerate(CATEGORY_LABELS)}
+
+# 不在标签集合里的预测（格式错误、大小写不同等）编码为 -1，和任何 gold 都不相等
+INVALID = -1
+
+
+def parse_gold(answer: str) -> Dict[str, Any]:
+    return json.loads(answer)
+
+
+def gold_of(example) -> Dict[str, Any]:
+    """
+    example 的 gold 标签。数据集加载时已经把 answer 解析到 example["gold"]（见
+    dataset_cache.TicketDataset.example），只有手工构造的 example 才在这里现场解析。
+    返回值可能是 example 持有的同一个对象，不要修改
+    """
+    gold = example.get("gold")
+    return gold if gold is not None else parse_gold(example["answer"])
+
+
+def encode_urgency(value: Any) -> int:
+    return _URGENCY_INDEX.get(value, INVALID) if isinstance(value, str) else INVALID
+
+
+def encode_sentiment(value: Any) -> int:
+    return _SENTIMENT_INDEX.get(value, INVALID) if isinstance(value, str) else INVALID
+
+
+@dataclass
+class LabelArrays:
+    """
+    一组样本的标签：urgency / sentiment 是标签下标（int8，无效为 -1），
+    categories 是 (n, len(CATEGORY_LABELS)) 的布尔矩阵。
+    """
+
+    urgency: np.ndarray
+    sentiment: np.ndarray
+    categories: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.urgency)
+
+    def __getitem__(self, index) -> "LabelArrays":
+        return LabelArrays(
+            self.urgency[index], self.sentiment[index], self.categories[index]
+        )
+
+    @classmethod
+    def from_gold(cls, answers: Sequence[Dict[str, Any]]) -> "LabelArrays":
+        """answers 是解析后的 gold（见 gold_of）；gold 中缺少的类别按 False 处理"""
+        n = len(answers)
+        urgency = np.empty(n, dtype=np.int8)
+        sentiment = np.empty(n, dtype=np.int8)
+        categories = np.zeros((n, len(CATEGORY_LABELS)), dtype=bool)
+        for i, gold in enumerate(answers):
+            urgency[i] = encode_urgency(gold["urgency"])
+            sentiment[i] = encode_sentiment(gold["sentiment"])
+            for label, value in gold["categories"].items():
+                if value:
+                    categories[i, _CATEGORY_INDEX[label]] = True
+        return cls(urgency, sentiment, categories)
+
+    @classmethod
+    def from_examples(cls, examples) -> "LabelArrays":
+        return cls.from_gold([gold_of(example) for example in examples])
+
+    @classmethod
+    def from_predictions(cls, predictions) -> "LabelArrays":
+        """缺少字段的预测（例如调用失败）所有字段都记为无效"""
+        n = len(predictions)
+        urgency = np.full(n, INVALID, dtype=np.int8)
+        sentiment = np.full(n, INVALID, dtype=np.int8)
+        categories = np.zeros((n, len(CATEGORY_LABELS)), dtype=bool)
+        for i, prediction in enumerate(predictions):
+            urgency[i] = encode_urgency(prediction.get("urgency"))
+            sentiment[i] = encode_sentiment(prediction.get("sentiment"))
+            # 直接写入第 i 行，不为每条预测单独分配向量
+            for value in prediction.get("categories") or ():
+                index = _CATEGORY_INDEX.get(value)
+                if index is not None:
+                    categories[i, index] = True
+        return cls(urgency, sentiment, categories)
@@ -1,4 +1,15 @@
-import json
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from gpea_demo.labels import (
+    CATEGORY_LABELS,
+    SENTIMENT_LABELS,
+    URGENCY_LABELS,
+    LabelArrays,
+    gold_of,
+)
 
 
 def score_urgency(gold_urgency, pred_urgency):
@@ -37,8 +48,8 @@ def metric(example, pred, trace=None, pred_name=None, pred_trace=None):
     Computes a score based on agreement between prediction and gold standard for categories, sentiment, and urgency.
     Returns the score (float).
     """
-    # Parse gold standard from example
-    gold = json.loads(example["answer"])
+    # Gold standard, parsed when the dataset was loaded
+    gold = gold_of(example)
 
     # Compute scores for all modules
     score_urgency_val = score_urgency(gold["urgency"], pred.urgency)
@@ -49,3 +60,113 @@ def metric(example, pred, trace=None, pred_name=None, pred_trace=None):
     total = (score_urgency_val + score_sentiment_val + score_categories_val) / 3
 
     return total
+
+
+@dataclass
+class BatchScores:
+    """
+    batch_metric 的结果：每条样本的各项分数，以及每个字段的混淆矩阵。
+
+    - urgency_confusion / sentiment_confusion：行是 gold，列是预测，最后一列是无效预测
+    - categories_confusion：(类别数, 2, 2)，[gold, pred] 为 [[TN, FP], [FN, TP]]
+    """
+
+    urgency: np.ndarray
+    sentiment: np.ndarray
+    categories: np.ndarray
+    total: np.ndarray
+    failed: np.ndarray
+    urgency_confusion: np.ndarray
+    sentiment_confusion: np.ndarray
+    categories_confusion: np.ndarray
+
+    @property
+    def score(self) -> float:
+        return float(self.total.mean()) if len(self.total) else 0.0
+
+    def field_accuracy(self) -> Dict[str, float]:
+        """各字段的平均分，不计调用失败的样本"""
+        ok = ~self.failed
+        return {
+            field: float(getattr(self, field)[ok].mean()) if ok.any() else 0.0
+            for field in ("urgency", "sentiment", "categories")
+        }
+
+    def confusion_tables(self) -> Dict[str, dict]:
+        """带标签名的混淆矩阵，便于打印或写成 JSON"""
+        return {
+            "urgency": _label_table(self.urgency_confusion, URGENCY_LABELS),
+            "sentiment": _label_table(self.sentiment_confusion, SENTIMENT_LABELS),
+            "categories": {
+                label: dict(zip(["tn", "fp", "fn", "tp"], cell.ravel().tolist()))
+                for label, cell in zip(CATEGORY_LABELS, self.categories_confusion)
+            },
+        }
+
+
+def _label_table(matrix: np.ndarray, labels: List[str]) -> dict:
+    columns = labels + ["invalid"]
+    return {
+        gold: dict(zip(columns, row.tolist())) for gold, row in zip(labels, matrix)
+    }
+
+
+def _confusion(gold: np.ndarray, pred: np.ndarray, n_labels: int) -> np.ndarray:
+    # 无效预测 (-1) 放到最后一列
+    pred = np.where(pred < 0, n_labels, pred)
+    matrix = np.zeros((n_labels, n_labels + 1), dtype=np.int64)
+    np.add.at(matrix, (gold.astype(np.intp), pred.astype(np.intp)), 1)
+    return matrix
+
+
+def batch_metric(
+    gold: LabelArrays, predictions, failed: Optional[np.ndarray] = None
+) -> BatchScores:
+    """
+    一次性给整组预测打分，结果与逐条调用 metric 相同。
+
+    gold 通常在加载数据集时预先算好（TicketSplit.labels() 或 LabelArrays.from_examples）；
+    predictions 可以是 dspy.Prediction 列表或 LabelArrays。failed 标记调用失败的样本
+    （总分记 0），传入 Prediction 列表时缺少任一字段的预测自动视为失败。
+
+    传入 Prediction 列表时要先逐条编码，耗时与逐条调用 metric 相当；只有 predictions
+    已经是 LabelArrays（例如同一组预测重复打分）时才比逐条调用快。
+    """
+    if not isinstance(predictions, LabelArrays):
+        if failed is None:
+            failed = np.array(
+                [
+                    not all(hasattr(p, f) for f in ("urgency", "sentiment", "categories"))
+                    for p in predictions
+                ],
+                dtype=bool,
+            )
+        predictions = LabelArrays.from_predictions(predictions)
+    if failed is None:
+        failed = np.zeros(len(gold), dtype=bool)
+
+    urgency = (gold.urgency == predictions.urgency).astype(float)
+    sentiment = (gold.sentiment == predictions.sentiment).astype(float)
+    categories = (gold.categories == predictions.categories).mean(axis=1)
+    total = np.where(failed, 0.0, (urgency + sentiment + categories) / 3)
+
+    g, p = gold.categories, predictions.categories
+    categories_confusion = np.stack(
+        [
+            np.stack([(~g & ~p).sum(axis=0), (~g & p).sum(axis=0)], axis=-1),
+            np.stack([(g & ~p).sum(axis=0), (g & p).sum(axis=0)], axis=-1),
+        ],
+        axis=1,
+    )
+    return BatchScores(
+        urgency=urgency,
+        sentiment=sentiment,
+        categories=categories,
+        total=total,
+        failed=failed,
+        urgency_confusion=_confusion(gold.urgency, predictions.urgency, len(URGENCY_LABELS)),
+        sentiment_confusion=_confusion(
+            gold.sentiment, predictions.sentiment, len(SENTIMENT_LABELS)
+        ),
+        categories_confusion=categories_confusion,
+    )
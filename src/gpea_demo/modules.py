@@ -0,0 +1,119 @@
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import dspy
+
+from gpea_demo.eval_store import stored
+from gpea_demo.signatures import (
+    FacilitySupportAnalyzerCategories,
+    FacilitySupportAnalyzerFused,
+    FacilitySupportAnalyzerSentiment,
+    FacilitySupportAnalyzerUrgency,
+)
+
+
+_submodule_pool: Optional[ThreadPoolExecutor] = None
+_submodule_pool_lock = threading.Lock()
+
+
+def _get_submodule_pool() -> ThreadPoolExecutor:
+    # 模块会被 GEPA 深拷贝，线程池不能放在实例上
+    global _submodule_pool
+    with _submodule_pool_lock:
+        if _submodule_pool is None:
+            _submodule_pool = ThreadPoolExecutor(
+                max_workers=32, thread_name_prefix="gpea-submodule"
+            )
+        return _submodule_pool
+
+
+class FacilitySupportAnalyzerMM(dspy.Module):
+    def __init__(self, concurrent: bool = False, max_concurrency: int = 16):
+        self.urgency_module = dspy.ChainOfThought(FacilitySupportAnalyzerUrgency)
+        self.sentiment_module = dspy.ChainOfThought(FacilitySupportAnalyzerSentiment)
+        self.categories_module = dspy.ChainOfThought(FacilitySupportAnalyzerCategories)
+        # concurrent=True 时同步的 forward（dspy.Evaluate、GEPA 使用的路径）也并发执行三个子模块
+        self.concurrent = concurrent
+        self.max_concurrency = max_concurrency
+
+    def _submodules(self):
+        return [self.urgency_module, self.sentiment_module, self.categories_module]
+
+    @staticmethod
+    def _combine(urgency, sentiment, categories):
+        return dspy.Prediction(
+            urgency=urgency.urgency,
+            sentiment=sentiment.sentiment,
+            categories=categories.categories,
+        )
+
+    @stored
+    def forward(self, message: str):
+        if not self.concurrent:
+            urgency = self.urgency_module(message=message)
+            sentiment = self.sentiment_module(message=message)
+            categories = self.categories_module(message=message)
+            return self._combine(urgency, sentiment, categories)
+
+        # 两个子模块交给线程池，当前线程执行第三个；每个任务带上当前的 dspy 上下文（lm、trace 等）
+        pool = _get_submodule_pool()
+        first, *rest = self._submodules()
+        futures = [
+            pool.submit(contextvars.copy_context().run, module, message=message)
+            for module in rest
+        ]
+        results = [first(message=message)] + [future.result() for future in futures]
+        return self._combine(*results)
+
+    async def aforward(self, message: str, semaphore: Optional[asyncio.Semaphore] = None):
+        """三个子模块并发执行，单条消息的耗时等于最慢的一次调用"""
+
+        async def run(module):
+            if semaphore is None:
+                return await module.acall(message=message)
+            async with semaphore:
+                return await module.acall(message=message)
+
+        results = await asyncio.gather(*(run(module) for module in self._submodules()))
+        return self._combine(*results)
+
+    async def aforward_batch(
+        self, messages: List[str], max_concurrency: Optional[int] = None
+    ) -> List[dspy.Prediction]:
+        # 所有消息的所有子模块共用一个并发上限
+        semaphore = asyncio.Semaphore(max_concurrency or self.max_concurrency)
+        return await asyncio.gather(
+            *(self.acall(message=message, semaphore=semaphore) for message in messages)
+        )
+
+    def forward_batch(
+        self, messages: List[str], max_concurrency: Optional[int] = None
+    ) -> List[dspy.Prediction]:
+        return asyncio.run(self.aforward_batch(messages, max_concurrency))
+
+
+class FacilitySupportAnalyzerFusedMM(dspy.Module):
+    """
+    FacilitySupportAnalyzerMM 的单次调用版本：urgency、sentiment、categories 在同一个
+    ChainOfThought 里一起预测，每条消息只发送一次。输出字段与 MM 版本相同，
+    metric / metric_with_feedback 可以直接复用。
+    """
+
+    def __init__(self):
+        self.fused_module = dspy.ChainOfThought(FacilitySupportAnalyzerFused)
+
+    @stored
+    def forward(self, message: str):
+        result = self.fused_module(message=message)
+
+        return dspy.Prediction(
+            urgency=result.urgency,
+            sentiment=result.sentiment,
+            categories=result.categories,
+        )
+
+
+
@@ -1,6 +1,7 @@
-import json
 import dspy
 
+from gpea_demo.labels import gold_of
+
 
 def feedback_urgency(gold_urgency, pred_urgency):
     """
@@ -66,8 +67,8 @@ def metric_with_feedback(example, pred, trace=None, pred_name=None, pred_trace=N
     Optionally provides feedback text for a specific predictor module, using the same comparison logic as the score.
     Returns a dspy.Prediction with score (float) and feedback (str).
     """
-    # Parse gold standard from example
-    gold = json.loads(example["answer"])
+    # Gold standard, parsed when the dataset was loaded
+    gold = gold_of(example)
 
     # Compute feedback and scores for all modules
     fb_urgency, score_urgency = feedback_urgency(gold["urgency"], pred.urgency)
@@ -92,5 +93,12 @@ def metric_with_feedback(example, pred, trace=None, pred_name=None, pred_trace=N
         feedback = fb_sentiment
     elif pred_name == "categories_module.predict":
         feedback = fb_categories
+    elif pred_name == "fused_module.predict":
+        # 单次调用的版本里三个字段由同一个 predictor 输出，按字段分段给出反馈
+        feedback = (
+            f"Urgency: {fb_urgency}\n\n"
+            f"Sentiment: {fb_sentiment}\n\n"
+            f"Categories: {fb_categories}"
+        )
 
     return dspy.Prediction(score=total, feedback=feedback)
@@ -1,63 +1,88 @@
+import argparse
+import logging
+import os
+
 import dspy
 
-from lib.custom_lm.lms import Lm_Glm
+from lib.custom_lm.cache import with_cache
+from lib.custom_lm.lms import Glm_Limiter, Lm_Glm_Limited, Ollama_Limiter
+from lib.custom_lm.rate_limit import RateLimitedLM
+from lib.custom_lm.scripted import RecordingLM
+from gpea_demo.checkpoint import GEPACheckpointer, run_dir_for
+from gpea_demo.eval_store import get_eval_store, use_eval_store
 from gpea_demo.init_dataset import init_dataset
 from gpea_demo.metrics import metric
+from gpea_demo.modules import FacilitySupportAnalyzerFusedMM, FacilitySupportAnalyzerMM
 from gpea_demo.predictions import metric_with_feedback
-from gpea_demo.signatures import (
-    FacilitySupportAnalyzerCategories,
-    FacilitySupportAnalyzerSentiment,
-    FacilitySupportAnalyzerUrgency,
-)
-from lib.dspy_utils import init_dspy
+from lib.dspy_utils import create_lm, init_dspy
 from dspy import GEPA
 
 
-class FacilitySupportAnalyzerMM(dspy.Module):
-    def __init__(self):
-        self.urgency_module = dspy.ChainOfThought(FacilitySupportAnalyzerUrgency)
-        self.sentiment_module = dspy.ChainOfThought(FacilitySupportAnalyzerSentiment)
-        self.categories_module = dspy.ChainOfThought(FacilitySupportAnalyzerCategories)
-
-    def forward(self, message: str):
-        urgency = self.urgency_module(message=message)
-        sentiment = self.sentiment_module(message=message)
-        categories = self.categories_module(message=message)
-
-        return dspy.Prediction(
-            urgency=urgency.urgency,
-            sentiment=sentiment.sentiment,
-            categories=categories.categories,
-        )
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Optimize the facility support analyzer with GEPA")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="continue the most recent GEPA run (or the one named by GPEA_RUN) instead of starting a new one",
+    )
+    return parser.parse_args(argv)
 
 
-def main():
-    init_dspy()
+def main(argv=None):
+    args = parse_args(argv)
+    # Evaluate 32 线程 + GEPA 8 线程共用同一个 Ollama 限流器
+    init_dspy(RateLimitedLM(create_lm(), Ollama_Limiter), namespace="gpea_demo")
+    # 录下每次回复，之后可以用 python -m gpea_demo.benchmark --replay 离线回放
+    if os.getenv("GPEA_RECORD_LM"):
+        dspy.configure(lm=RecordingLM(dspy.settings.lm, os.environ["GPEA_RECORD_LM"]))
     train_set, val_set, test_set = init_dataset()
-    program = FacilitySupportAnalyzerMM()
+    # GPEA_PROGRAM=fused 时每条消息只调用一次 LM，对比结果见 gpea_demo.ab_test
+    if os.getenv("GPEA_PROGRAM") == "fused":
+        program = FacilitySupportAnalyzerFusedMM()
+    else:
+        program = FacilitySupportAnalyzerMM(concurrent=True)
+    # 已经评估过的 (程序指纹, 样本) 直接复用预测和分数，中断后重跑也能接着之前的进度
+    store = get_eval_store()
+    eval_metric, gepa_metric = metric, metric_with_feedback
+    if store is not None:
+        eval_metric = store.wrap_metric(metric)
+        gepa_metric = store.wrap_metric(metric_with_feedback)
     evaluate = dspy.Evaluate(
         devset=test_set,
-        metric=metric,
+        metric=eval_metric,
         num_threads=32,
         display_table=True,
         display_progress=True,
     )
     # evaluate(program)
-    reflect_lm = Lm_Glm
+    reflect_lm = with_cache(Lm_Glm_Limited, "gpea_demo.reflection")
+    # We will use a light budget for this tutorial. However, we typically recommend using auto="heavy" for optimized performance!
+    budget = {"auto": "light"}
+    # 每轮写检查点到 GPEA_RUNS_DIR 下的运行目录；默认每次新建，设置 GPEA_RUN 或加 --resume
+    # 时从中断处继续（初始程序、验证集或 metric 变了会拒绝恢复，预算可以调大）
+    checkpointer = GEPACheckpointer(run_dir_for(resume=args.resume), program).prepare(
+        val_set, gepa_metric, budget
+    )
     optimizer = GEPA(
-        metric=metric_with_feedback,
-        auto="light",  # <-- We will use a light budget for this tutorial. However, we typically recommend using auto="heavy" for optimized performance!
+        metric=gepa_metric,
+        **budget,
         num_threads=8,
         track_stats=True,
         use_merge=False,
-        reflection_lm=reflect_lm,
+        **checkpointer.gepa_options(reflect_lm),
     )
-    optimized_program = optimizer.compile(
-        program,
-        trainset=train_set,
-        valset=val_set,
-    )
-    evaluate(optimized_program)
+    with use_eval_store(store):
+        optimized_program = optimizer.compile(
+            program,
+            trainset=train_set,
+            valset=val_set,
+        )
+        logging.info(f"Best program saved to {checkpointer.export(optimized_program)}")
+        evaluate(optimized_program)
+    if store is not None:
+        logging.info(f"Evaluation store: {store.summary()}")
+    logging.info(f"Ollama limiter: {Ollama_Limiter.snapshot()}")
+    logging.info(f"GLM limiter: {Glm_Limiter.snapshot()}")
 
 
 if __name__ == "__main__":
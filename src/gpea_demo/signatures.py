@@ -2,13 +2,29 @@ import dspy
 from typing import List, Literal
 
 
+Urgency = Literal["low", "medium", "high"]
+Sentiment = Literal["positive", "neutral", "negative"]
+Category = Literal[
+    "emergency_repair_services",
+    "routine_maintenance_requests",
+    "quality_and_safety_concerns",
+    "specialized_cleaning_services",
+    "general_inquiries",
+    "sustainability_and_environmental_practices",
+    "training_and_support_requests",
+    "cleaning_services_scheduling",
+    "customer_feedback_and_complaints",
+    "facility_management_issues",
+]
+
+
 class FacilitySupportAnalyzerUrgency(dspy.Signature):
     """
     Read the provided message and determine the urgency.
     """
 
     message: str = dspy.InputField()
-    urgency: Literal["low", "medium", "high"] = dspy.OutputField()
+    urgency: Urgency = dspy.OutputField()
 
 
 class FacilitySupportAnalyzerSentiment(dspy.Signature):
@@ -17,7 +33,7 @@ class FacilitySupportAnalyzerSentiment(dspy.Signature):
     """
 
     message: str = dspy.InputField()
-    sentiment: Literal["positive", "neutral", "negative"] = dspy.OutputField()
+    sentiment: Sentiment = dspy.OutputField()
 
 
 class FacilitySupportAnalyzerCategories(dspy.Signature):
@@ -26,17 +42,15 @@ class FacilitySupportAnalyzerCategories(dspy.Signature):
     """
 
     message: str = dspy.InputField()
-    categories: List[
-        Literal[
-            "emergency_repair_services",
-            "routine_maintenance_requests",
-            "quality_and_safety_concerns",
-            "specialized_cleaning_services",
-            "general_inquiries",
-            "sustainability_and_environmental_practices",
-            "training_and_support_requests",
-            "cleaning_services_scheduling",
-            "customer_feedback_and_complaints",
-            "facility_management_issues",
-        ]
-    ] = dspy.OutputField()
+    categories: List[Category] = dspy.OutputField()
+
+
+class FacilitySupportAnalyzerFused(dspy.Signature):
+    """
+    Read the provided message and determine its urgency, its sentiment and the set of categories applicable to the message.
+    """
+
+    message: str = dspy.InputField()
+    urgency: Urgency = dspy.OutputField()
+    sentiment: Sentiment = dspy.OutputField()
+    categories: List[Category] = dspy.OutputField()
@@ -5,7 +5,7 @@ import asyncio
 import dspy
 from lib.custom_lm.lms import Lm_Glm
 from lib import dspy_utils
-from fastmcp import Client, FastMCP
+from fastmcp import FastMCP
 
 from lib.utils import parse_args
 
@@ -17,7 +17,7 @@ class DSPyAssistantService(dspy.Signature):
     process_result: str = dspy.OutputField(desc=("使用中文回答"))
 
 
-client = Client("http://127.0.0.1:8999/mcp")
+client = dspy_utils.create_client("http://127.0.0.1:8999/mcp")
 
 
 def run():
@@ -32,13 +32,10 @@ async def run_async():
 
 
 async def resolve_user_request(user_request: str):
-    dspy_utils.init_dspy(Lm_Glm)
+    dspy_utils.init_dspy(Lm_Glm, namespace="hotboard_assist")
     async with client:
-        tools = await client.list_tools()
-        logging.info(f"Available tools: {tools}")
-        dspy_tools = []
-        for tool in tools:
-            dspy_tools.append(dspy.Tool.from_mcp_tool(client.session, tool))
+        dspy_tools = await dspy_utils.list_tools(client)
+        logging.info(f"Available tools: {[tool.name for tool in dspy_tools]}")
 
         # Create the agent
         react = dspy.ReAct(DSPyAssistantService, tools=dspy_tools)
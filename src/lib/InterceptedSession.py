@@ -1,11 +1,21 @@
-import requests
-from typing import Callable, Optional
+import asyncio
+import atexit
+import importlib.util
+import inspect
+import threading
+import weakref
+from typing import Callable, Iterable, List, Optional
 
 from lib.Intercepters import auth_interceptor, log_response
+from lib.http_cache import get_http_cache
+from lib.http_retry import GITHUB_BUDGET, RetryInterceptor
 
 
 class InterceptedSession:
     def __init__(self):
+        # requests 在第一次创建 session 时才导入
+        import requests
+
         self.session = requests.Session()
         self.request_interceptors = []
         self.response_interceptors = []
@@ -36,6 +46,10 @@ class InterceptedSession:
         response = self._apply_response_interceptors(response)
         return response
 
+    def send(self, prepared):
+        """直接重发一个已构造好的请求（不经过拦截器），供重试拦截器使用"""
+        return self.session.send(prepared)
+
     def get(self, url, **kwargs):
         return self.request("GET", url, **kwargs)
 
@@ -49,11 +63,195 @@ class InterceptedSession:
         return self.request("DELETE", url, **kwargs)
 
 
-def get_intercepted_session() -> InterceptedSession:
+class AsyncInterceptedSession:
+    """
+    InterceptedSession 的异步版本，基于 httpx.AsyncClient（连接池 + HTTP/2 keep-alive）。
+
+    拦截器 API 与同步版本相同，拦截器既可以是普通函数也可以是 async 函数。
+    max_concurrency 限制每个事件循环里同时在途的请求数；httpx client 按事件循环惰性创建，
+    所以同一个 session 可以在多个线程各自的事件循环中共用。
+
+    同步代码用 run_sync() 代替 asyncio.run()：协程在 session 自己的长期事件循环中执行，
+    连接池跨调用保持，进程退出时关闭。自己管理事件循环的调用方在循环结束前应
+    await aclose()（或使用 async with），否则该循环的连接池不会被关闭。
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        max_concurrency: int = 10,
+        http2: bool = True,
+        timeout: float = 30.0,
+    ):
+        self.request_interceptors = []
+        self.response_interceptors = []
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.max_concurrency = max_concurrency
+        # httpx 的 HTTP/2 支持需要 h2，没有安装时退回 HTTP/1.1 keep-alive
+        self.http2 = http2 and importlib.util.find_spec("h2") is not None
+        self.timeout = timeout
+        # 事件循环 -> (httpx.AsyncClient, Semaphore)
+        self._pools = weakref.WeakKeyDictionary()
+        self._pools_lock = threading.Lock()
+        # run_sync 使用的后台事件循环，第一次调用时启动
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def add_request_interceptor(self, func: Callable):
+        """添加请求拦截器，func 接收 (method, url, **kwargs) 并返回修改后的 kwargs，可以是 async 函数"""
+        self.request_interceptors.append(func)
+
+    def add_response_interceptor(self, func: Callable):
+        """添加响应拦截器，func 接收 response 并可返回修改后的 response，可以是 async 函数"""
+        self.response_interceptors.append(func)
+
+    def _pool(self):
+        loop = asyncio.get_running_loop()
+        with self._pools_lock:
+            pool = self._pools.get(loop)
+            if pool is None:
+                import httpx
+
+                client = httpx.AsyncClient(
+                    http2=self.http2,
+                    timeout=self.timeout,
+                    limits=httpx.Limits(
+                        max_connections=self.max_connections,
+                        max_keepalive_connections=self.max_keepalive_connections,
+                        keepalive_expiry=self.keepalive_expiry,
+                    ),
+                )
+                pool = self._pools[loop] = (client, asyncio.Semaphore(self.max_concurrency))
+            return pool
+
+    def _ensure_client(self):
+        return self._pool()[0]
+
+    async def _apply_request_interceptors(self, method, url, **kwargs):
+        for interceptor in self.request_interceptors:
+            result = interceptor(method=method, url=url, **kwargs)
+            if inspect.isawaitable(result):
+                result = await result
+            kwargs = result or kwargs
+        return kwargs
+
+    async def _apply_response_interceptors(self, response):
+        for interceptor in self.response_interceptors:
+            result = interceptor(response)
+            if inspect.isawaitable(result):
+                result = await result
+            if result is not None:
+                response = result
+        return response
+
+    async def request(self, method, url, **kwargs):
+        client, semaphore = self._pool()
+        kwargs = await self._apply_request_interceptors(method, url, **kwargs)
+        async with semaphore:
+            response = await client.request(method, url, **kwargs)
+        response = await self._apply_response_interceptors(response)
+        return response
+
+    async def send(self, request):
+        """直接重发一个已构造好的请求（不经过拦截器），供重试拦截器使用"""
+        client, semaphore = self._pool()
+        async with semaphore:
+            return await client.send(request)
+
+    async def get(self, url, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+    async def put(self, url, **kwargs):
+        return await self.request("PUT", url, **kwargs)
+
+    async def delete(self, url, **kwargs):
+        return await self.request("DELETE", url, **kwargs)
+
+    async def get_many(self, urls: Iterable[str], **kwargs) -> List:
+        """并发 GET 多个 URL，按输入顺序返回 response；并发度受 max_concurrency 限制"""
+        return await asyncio.gather(*(self.get(url, **kwargs) for url in urls))
+
+    async def aclose(self):
+        """关闭当前事件循环的连接池"""
+        with self._pools_lock:
+            pool = self._pools.pop(asyncio.get_running_loop(), None)
+        if pool is not None:
+            await pool[0].aclose()
+
+    def run_sync(self, coro):
+        """
+        在后台事件循环中运行 coro 并阻塞等待结果。可以从任意线程调用，
+        包括正在运行事件循环的线程（该线程会被阻塞到 coro 完成）。
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self._background_loop()).result()
+
+    def _background_loop(self) -> asyncio.AbstractEventLoop:
+        with self._pools_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=loop.run_forever, name="intercepted-session", daemon=True
+                ).start()
+                self._loop = loop
+                atexit.register(self._close_background_loop)
+            return self._loop
+
+    def _close_background_loop(self):
+        loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self.aclose(), loop).result(timeout=5)
+        except Exception:
+            pass
+        loop.call_soon_threadsafe(loop.stop)
+
+    async def __aenter__(self):
+        self._ensure_client()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+
+def get_intercepted_session(use_cache: bool = True) -> InterceptedSession:
+    """use_cache=False 用于流式下载等不适合整体缓存的请求"""
     client = InterceptedSession()
+    http_cache = get_http_cache() if use_cache else None
+    # request interceptors
+    client.add_request_interceptor(auth_interceptor)
+    if http_cache is not None:
+        # 放在 auth 之后，缓存 key 才能区分不同 token
+        client.add_request_interceptor(http_cache.request_interceptor)
+    # 节流是最后一个请求拦截器，重试是第一个响应拦截器，后面的拦截器只看到最终响应
+    RetryInterceptor(GITHUB_BUDGET).install(client, is_async=False)
+
+    # response interceptors
+    client.add_response_interceptor(log_response)
+    if http_cache is not None:
+        client.add_response_interceptor(http_cache.response_interceptor)
+    return client
+
+
+def get_async_intercepted_session(**kwargs) -> AsyncInterceptedSession:
+    client = AsyncInterceptedSession(**kwargs)
+    http_cache = get_http_cache()
     # request interceptors
     client.add_request_interceptor(auth_interceptor)
+    if http_cache is not None:
+        # 放在 auth 之后，缓存 key 才能区分不同 token
+        client.add_request_interceptor(http_cache.request_interceptor)
+    # 节流是最后一个请求拦截器，重试是第一个响应拦截器，后面的拦截器只看到最终响应
+    RetryInterceptor(GITHUB_BUDGET).install(client, is_async=True)
 
     # response interceptors
     client.add_response_interceptor(log_response)
+    if http_cache is not None:
+        client.add_response_interceptor(http_cache.response_interceptor)
     return client
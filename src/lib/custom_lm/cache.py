@@ -0,0 +1,329 @@
+import atexit
+import hashlib
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import dspy
+
+from lib.custom_lm.wrapper import LMWrapper
+
+
+DEFAULT_CACHE_PATH = Path.home() / ".cache" / "dspy-demo" / "lm_cache.sqlite3"
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# 命中时的访问时间按批写入：攒够这么多条或者距上次写入超过这么多秒
+ACCESS_FLUSH_SIZE = 256
+ACCESS_FLUSH_INTERVAL = 30.0
+
+# 不影响生成结果的参数，不参与缓存 key
+_IGNORED_PARAMS = {"cache", "api_key", "api_base", "base_url", "ollama_base_url"}
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    expired: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def _canonical(value: Any) -> Any:
+    if hasattr(value, "model_dump"):
+        return _canonical(value.model_dump())
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def cache_key(model: str, messages, params: Dict[str, Any]) -> str:
+    """model + 规范化后的 messages + 采样参数 -> sha256"""
+    params = {k: v for k, v in params.items() if k not in _IGNORED_PARAMS}
+    payload = json.dumps(
+        {"model": model, "messages": _canonical(messages), "params": _canonical(params)},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    基于 SQLite 的 LM 响应缓存，多个入口（进程）共享同一个文件。
+
+    - 每条记录属于一个 namespace（通常是入口名），统计和清理按 namespace 进行
+    - ttl 秒后过期；总大小超过 max_bytes 时按最近访问时间淘汰
+    """
+
+    def __init__(
+        self,
+        path: Path = DEFAULT_CACHE_PATH,
+        ttl: Optional[float] = DEFAULT_TTL,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats: Dict[str, CacheStats] = {}
+        # 尚未写入的访问时间 (namespace, key) -> accessed
+        self._pending_access: Dict[Tuple[str, str], float] = {}
+        self._last_flush = time.time()
+        # 缓存文件的总大小，第一次写入时扫描一次，之后随写入/删除增减
+        self._total_size: Optional[int] = None
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(
+            str(self.path), check_same_thread=False, timeout=30
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                model TEXT NOT NULL,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)"
+        )
+        self._conn.commit()
+
+    def stats(self, namespace: str) -> CacheStats:
+        with self._lock:
+            return self._stats.setdefault(namespace, CacheStats())
+
+    def get(self, namespace: str, key: str) -> Any:
+        now = time.time()
+        stats = self.stats(namespace)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created, size FROM responses WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            ).fetchone()
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE namespace = ? AND key = ?",
+                    (namespace, key),
+                )
+                self._conn.commit()
+                self._pending_access.pop((namespace, key), None)
+                if self._total_size is not None:
+                    self._total_size -= row[2]
+                stats.expired += 1
+                row = None
+            if row is None:
+                stats.misses += 1
+                return None
+            # 访问时间先记在内存里，攒够一批或者超过间隔再一次性写入，命中时不用每次提交
+            self._pending_access[(namespace, key)] = now
+            if (
+                len(self._pending_access) >= ACCESS_FLUSH_SIZE
+                or now - self._last_flush >= ACCESS_FLUSH_INTERVAL
+            ):
+                self._flush_access()
+                self._conn.commit()
+            stats.hits += 1
+        return pickle.loads(row[0])
+
+    def put(self, namespace: str, key: str, model: str, value: Any):
+        blob = pickle.dumps(value)
+        now = time.time()
+        stats = self.stats(namespace)
+        with self._lock:
+            old = self._conn.execute(
+                "SELECT size FROM responses WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (namespace, key, model, blob, len(blob), now, now),
+            )
+            self._pending_access.pop((namespace, key), None)
+            if self._total_size is not None:
+                self._total_size += len(blob) - (old[0] if old else 0)
+            stats.stores += 1
+            stats.evictions += self._evict()
+            self._conn.commit()
+
+    def flush(self):
+        """把内存中的访问时间写入数据库"""
+        with self._lock:
+            self._flush_access()
+            self._conn.commit()
+
+    def _flush_access(self):
+        if self._pending_access:
+            self._conn.executemany(
+                "UPDATE responses SET accessed = ? WHERE namespace = ? AND key = ?",
+                [(t, ns, key) for (ns, key), t in self._pending_access.items()],
+            )
+            self._pending_access.clear()
+        self._last_flush = time.time()
+
+    def _scan_size(self) -> int:
+        return self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+
+    def _evict(self) -> int:
+        if self._total_size is None:
+            self._total_size = self._scan_size()
+        if self._total_size <= self.max_bytes:
+            return 0
+        # 运行中的总量只统计本进程的写入；超出上限时重新扫描一次，把其他进程的写入也算进去
+        total = self._total_size = self._scan_size()
+        if total <= self.max_bytes:
+            return 0
+        # 淘汰按访问时间排序，先把内存里的访问时间写进去
+        self._flush_access()
+        evicted = 0
+        while total > self.max_bytes:
+            row = self._conn.execute(
+                "SELECT namespace, key, size FROM responses ORDER BY accessed LIMIT 1"
+            ).fetchone()
+            if row is None:
+                break
+            self._conn.execute(
+                "DELETE FROM responses WHERE namespace = ? AND key = ?", row[:2]
+            )
+            total -= row[2]
+            evicted += 1
+        self._total_size = total
+        return evicted
+
+    def purge_expired(self) -> int:
+        if self.ttl is None:
+            return 0
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,)
+            )
+            self._conn.commit()
+            self._total_size = None
+            return cur.rowcount
+
+    def clear(self, namespace: Optional[str] = None) -> int:
+        with self._lock:
+            if namespace is None:
+                cur = self._conn.execute("DELETE FROM responses")
+            else:
+                cur = self._conn.execute(
+                    "DELETE FROM responses WHERE namespace = ?", (namespace,)
+                )
+            self._conn.commit()
+            self._pending_access.clear()
+            self._total_size = None
+            return cur.rowcount
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT namespace, COUNT(*), SUM(size) FROM responses GROUP BY namespace"
+            ).fetchall()
+            sizes = {ns: (count, size) for ns, count, size in rows}
+            result = {}
+            for ns in set(sizes) | set(self._stats):
+                count, size = sizes.get(ns, (0, 0))
+                stats = self._stats.get(ns, CacheStats())
+                result[ns] = {
+                    **asdict(stats),
+                    "hit_rate": stats.hit_rate,
+                    "entries": count,
+                    "bytes": size,
+                }
+            return result
+
+
+class CachedLM(LMWrapper):
+    """在 ResponseCache 中查找响应，未命中时才调用内层 LM。"""
+
+    def __init__(self, lm: dspy.BaseLM, cache: ResponseCache, namespace: str):
+        super().__init__(lm)
+        self.response_cache = cache
+        self.namespace = namespace
+
+    def _key(self, prompt, messages, kwargs) -> str:
+        messages = messages or [{"role": "user", "content": prompt}]
+        return cache_key(self.lm.model, messages, {**self.lm.kwargs, **kwargs})
+
+    def forward(self, prompt=None, messages=None, **kwargs):
+        if kwargs.get("cache") is False:
+            return super().forward(prompt=prompt, messages=messages, **kwargs)
+        key = self._key(prompt, messages, kwargs)
+        response = self.response_cache.get(self.namespace, key)
+        if response is None:
+            response = super().forward(prompt=prompt, messages=messages, **kwargs)
+            self.response_cache.put(self.namespace, key, self.lm.model, response)
+        return response
+
+    async def aforward(self, prompt=None, messages=None, **kwargs):
+        if kwargs.get("cache") is False:
+            return await super().aforward(prompt=prompt, messages=messages, **kwargs)
+        key = self._key(prompt, messages, kwargs)
+        response = self.response_cache.get(self.namespace, key)
+        if response is None:
+            response = await super().aforward(
+                prompt=prompt, messages=messages, **kwargs
+            )
+            self.response_cache.put(self.namespace, key, self.lm.model, response)
+        return response
+
+
+_shared_cache: Optional[ResponseCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """进程内共享的缓存实例，路径/TTL/容量可以通过环境变量调整"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = ResponseCache(
+                path=Path(os.getenv("LM_CACHE_PATH", DEFAULT_CACHE_PATH)),
+                ttl=float(os.getenv("LM_CACHE_TTL", DEFAULT_TTL)),
+                max_bytes=int(os.getenv("LM_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+            )
+            atexit.register(_log_summary, _shared_cache)
+        return _shared_cache
+
+
+def _log_summary(cache: ResponseCache):
+    cache.flush()
+    for namespace, stats in cache.summary().items():
+        if stats["hits"] or stats["misses"]:
+            logging.info(f"LM cache [{namespace}]: {stats}")
+
+
+def with_cache(lm: dspy.BaseLM, namespace: str) -> dspy.BaseLM:
+    """给 LM 套上共享磁盘缓存；设置 LM_CACHE=0 时原样返回"""
+    if os.getenv("LM_CACHE", "1") == "0":
+        return lm
+    if isinstance(lm, CachedLM):
+        lm = lm.lm
+    logging.info(f"Using LM response cache for namespace '{namespace}'")
+    return CachedLM(lm, get_response_cache(), namespace)
@@ -0,0 +1,102 @@
+import asyncio
+import concurrent.futures
+import threading
+from typing import Dict
+
+import dspy
+
+from lib.custom_lm.cache import cache_key
+from lib.custom_lm.wrapper import LMWrapper
+
+
+# leader 被取消（或被 KeyboardInterrupt 等打断）时交给等待者的标记，收到的等待者重新竞选 leader
+_LEADER_ABORTED = object()
+
+
+class CoalescingLM(LMWrapper):
+    """
+    single-flight：同一时刻完全相同的请求只调用一次内层 LM，其余调用等待同一个 future。
+
+    future 是 concurrent.futures.Future，线程用 result() 等待，协程用 wrap_future 等待，
+    所以线程和 asyncio 之间也能互相合并。saved_calls 记录省下的调用次数。
+    """
+
+    def __init__(self, lm: dspy.BaseLM):
+        super().__init__(lm)
+        self.saved_calls = 0
+        self._in_flight: Dict[str, concurrent.futures.Future] = {}
+        self._lock = threading.Lock()
+
+    def _join(self, prompt, messages, kwargs):
+        """返回 (key, future, 是否由当前调用负责真正执行)"""
+        messages = messages or [{"role": "user", "content": prompt}]
+        key = cache_key(self.lm.model, messages, {**self.lm.kwargs, **kwargs})
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.saved_calls += 1
+                return key, future, False
+            future = concurrent.futures.Future()
+            self._in_flight[key] = future
+            return key, future, True
+
+    def _settle(self, key, future, response=None, error=None):
+        with self._lock:
+            self._in_flight.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(response)
+
+    def _retry(self):
+        # 等待者重新排队，上一次合并不算省下的调用
+        with self._lock:
+            self.saved_calls -= 1
+
+    def forward(self, prompt=None, messages=None, **kwargs):
+        if kwargs.get("cache") is False:
+            return super().forward(prompt=prompt, messages=messages, **kwargs)
+        while True:
+            key, future, leader = self._join(prompt, messages, kwargs)
+            if leader:
+                break
+            response = future.result()
+            if response is not _LEADER_ABORTED:
+                return response
+            self._retry()
+        try:
+            response = super().forward(prompt=prompt, messages=messages, **kwargs)
+        except Exception as e:
+            self._settle(key, future, error=e)
+            raise
+        except BaseException:
+            self._settle(key, future, response=_LEADER_ABORTED)
+            raise
+        self._settle(key, future, response=response)
+        return response
+
+    async def aforward(self, prompt=None, messages=None, **kwargs):
+        if kwargs.get("cache") is False:
+            return await super().aforward(prompt=prompt, messages=messages, **kwargs)
+        while True:
+            key, future, leader = self._join(prompt, messages, kwargs)
+            if leader:
+                break
+            # shield：等待者自己被取消时不能取消共享的 future
+            response = await asyncio.shield(asyncio.wrap_future(future))
+            if response is not _LEADER_ABORTED:
+                return response
+            self._retry()
+        try:
+            response = await super().aforward(
+                prompt=prompt, messages=messages, **kwargs
+            )
+        except Exception as e:
+            self._settle(key, future, error=e)
+            raise
+        except BaseException:
+            # leader 被取消不代表请求本身失败：唤醒等待者，由其中一个重新发起
+            self._settle(key, future, response=_LEADER_ABORTED)
+            raise
+        self._settle(key, future, response=response)
+        return response
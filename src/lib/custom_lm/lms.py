@@ -1,15 +1,91 @@
 # glm4_dspy.py
+#
+# LM 与限流器都在第一次访问时才创建（PEP 562 模块级 __getattr__），
+# `from lib.custom_lm.lms import Lm_Glm` 的写法不变，但只 import 本模块不会加载 dspy/litellm。
 
-import dspy
+import threading
+from typing import Any, Callable, Dict
 
 
-Lm_Glm = dspy.LM(
-    model="zai/glm-4.6V",
-)
+def _lm_glm():
+    import dspy
 
+    return dspy.LM(
+        model="zai/glm-4.6V",
+    )
 
-Lm_Ollama_Qwen3_4b = dspy.LM(
-    model="ollama/qwen3:4b",
-    temperature=0.1,
-    ollama_base_url="http://192.168.50.185:11434",
-)
+
+def _lm_ollama_qwen3_4b():
+    import dspy
+
+    return dspy.LM(
+        model="ollama/qwen3:4b",
+        temperature=0.1,
+        ollama_base_url="http://192.168.50.185:11434",
+    )
+
+
+def _lm_router():
+    from lib.custom_lm.router import RoutedLM
+
+    # 本地 Ollama 与托管 GLM 之间按延迟/健康度自动选择
+    return RoutedLM([__getattr__("Lm_Ollama_Qwen3_4b"), __getattr__("Lm_Glm")])
+
+
+# 同一后端的所有调用（线程、协程、多个模块）共享一份额度，避免触发限流后的重试风暴
+def _glm_limiter():
+    from lib.custom_lm.rate_limit import RateLimiter
+
+    return RateLimiter(
+        requests_per_sec=5, tokens_per_min=200_000, max_in_flight=8, burst=10
+    )
+
+
+def _ollama_limiter():
+    from lib.custom_lm.rate_limit import RateLimiter
+
+    return RateLimiter(max_in_flight=4)
+
+
+def _lm_glm_limited():
+    from lib.custom_lm.rate_limit import RateLimitedLM
+
+    return RateLimitedLM(__getattr__("Lm_Glm"), __getattr__("Glm_Limiter"))
+
+
+def _lm_ollama_qwen3_4b_limited():
+    from lib.custom_lm.rate_limit import RateLimitedLM
+
+    return RateLimitedLM(
+        __getattr__("Lm_Ollama_Qwen3_4b"), __getattr__("Ollama_Limiter")
+    )
+
+
+_FACTORIES: Dict[str, Callable[[], Any]] = {
+    "Lm_Glm": _lm_glm,
+    "Lm_Ollama_Qwen3_4b": _lm_ollama_qwen3_4b,
+    "Lm_Router": _lm_router,
+    "Glm_Limiter": _glm_limiter,
+    "Ollama_Limiter": _ollama_limiter,
+    "Lm_Glm_Limited": _lm_glm_limited,
+    "Lm_Ollama_Qwen3_4b_Limited": _lm_ollama_qwen3_4b_limited,
+}
+
+
+_lock = threading.RLock()
+
+
+def __getattr__(name: str):
+    factory = _FACTORIES.get(name)
+    if factory is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    # 存回模块全局，之后的访问不再经过 __getattr__，所有调用方拿到同一个对象
+    with _lock:
+        value = globals().get(name)
+        if value is None:
+            value = globals()[name] = factory()
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_FACTORIES))
@@ -0,0 +1,222 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Any, Deque, Dict, Optional, Tuple
+
+import dspy
+
+from lib.custom_lm.wrapper import LMWrapper
+
+
+@dataclass
+class LimiterStats:
+    requests: int = 0
+    queued: int = 0
+    max_queued: int = 0
+    in_flight: int = 0
+    max_in_flight: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+    tokens: int = 0
+
+    @property
+    def mean_wait(self) -> float:
+        return self.total_wait / self.requests if self.requests else 0.0
+
+
+class TokenBucket:
+    """
+    容量为 capacity、每秒补充 rate 的令牌桶；rate 为 None 表示不限。
+    capacity 默认等于 rate，但至少为 1：否则 rate < 1 时每个请求只扣掉不到一个令牌，
+    实际放行的速率会超过 rate。
+    """
+
+    def __init__(self, rate: Optional[float], capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate or 0.0)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        """预占 amount 个令牌（允许透支），返回需要等待的秒数"""
+        if self.rate is None:
+            return 0.0
+        now = time.monotonic()
+        self._refill(now)
+        # 超过桶容量的单次请求按容量计，避免永远等不到
+        self.level -= min(amount, self.capacity)
+        if self.level >= 0:
+            return 0.0
+        return -self.level / self.rate
+
+    def refund(self, amount: float):
+        """实际消耗少于预估时退还令牌，多于预估时补扣"""
+        if self.rate is None:
+            return
+        self._refill(time.monotonic())
+        self.level = min(self.capacity, self.level + amount)
+
+
+class RateLimiter:
+    """
+    requests/sec、tokens/min 两个令牌桶加一个最大并发数，线程和 asyncio 任务共享同一份额度。
+
+    tokens/min 在发请求前按 prompt 长度估算预占，返回后按 usage 多退少补。
+    """
+
+    def __init__(
+        self,
+        requests_per_sec: Optional[float] = None,
+        tokens_per_min: Optional[float] = None,
+        max_in_flight: Optional[int] = None,
+        burst: Optional[float] = None,
+    ):
+        self.request_bucket = TokenBucket(requests_per_sec, burst)
+        self.token_bucket = TokenBucket(
+            tokens_per_min / 60 if tokens_per_min else None, tokens_per_min
+        )
+        self.max_in_flight = max_in_flight
+        self.stats = LimiterStats()
+        self._lock = threading.Lock()
+        self._slot_free = threading.Condition(self._lock)
+        self._async_waiters: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+
+    def _reserve(self, tokens: int) -> float:
+        with self._lock:
+            self.stats.queued += 1
+            self.stats.max_queued = max(self.stats.max_queued, self.stats.queued)
+            return max(
+                self.request_bucket.reserve(1), self.token_bucket.reserve(tokens)
+            )
+
+    def _has_slot(self) -> bool:
+        return self.max_in_flight is None or self.stats.in_flight < self.max_in_flight
+
+    def _enter(self, waited: float, tokens: int):
+        stats = self.stats
+        stats.in_flight += 1
+        stats.max_in_flight = max(stats.max_in_flight, stats.in_flight)
+        stats.requests += 1
+        stats.tokens += tokens
+        stats.total_wait += waited
+        stats.max_wait = max(stats.max_wait, waited)
+
+    def _dequeue(self):
+        with self._lock:
+            self.stats.queued -= 1
+
+    def acquire(self, tokens: int = 0):
+        start = time.monotonic()
+        delay = self._reserve(tokens)
+        try:
+            if delay:
+                time.sleep(delay)
+            with self._slot_free:
+                self._slot_free.wait_for(self._has_slot)
+                self._enter(time.monotonic() - start, tokens)
+        finally:
+            self._dequeue()
+
+    async def aacquire(self, tokens: int = 0):
+        start = time.monotonic()
+        delay = self._reserve(tokens)
+        try:
+            if delay:
+                await asyncio.sleep(delay)
+            loop = asyncio.get_running_loop()
+            while True:
+                with self._lock:
+                    if self._has_slot():
+                        self._enter(time.monotonic() - start, tokens)
+                        return
+                    # 线程和协程共用一把锁；协程在自己的事件循环上等一个 future，
+                    # release() 从任意线程唤醒，不阻塞事件循环
+                    waiter = (loop, loop.create_future())
+                    self._async_waiters.append(waiter)
+                try:
+                    await waiter[1]
+                except asyncio.CancelledError:
+                    with self._lock:
+                        if waiter in self._async_waiters:
+                            self._async_waiters.remove(waiter)
+                        else:
+                            # 已经被选中唤醒，把这次唤醒让给下一个等待者
+                            self._wake_async_waiter()
+                    raise
+        finally:
+            self._dequeue()
+
+    def _wake_async_waiter(self):
+        # 调用方持有 self._lock
+        if self._async_waiters:
+            loop, future = self._async_waiters.popleft()
+            loop.call_soon_threadsafe(_set_done, future)
+
+    def release(self, estimated_tokens: int = 0, actual_tokens: Optional[int] = None):
+        with self._slot_free:
+            self.stats.in_flight -= 1
+            if actual_tokens is not None:
+                self.token_bucket.refund(estimated_tokens - actual_tokens)
+                self.stats.tokens += actual_tokens - estimated_tokens
+            # 各唤醒一个线程和一个协程，没抢到槽位的一方继续等待
+            self._slot_free.notify()
+            self._wake_async_waiter()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**asdict(self.stats), "mean_wait": self.stats.mean_wait}
+
+
+def _set_done(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+def estimate_tokens(prompt, messages, kwargs) -> int:
+    """粗略估计一次请求的 token 数：输入按 4 字符 1 token，加上 max_tokens"""
+    messages = messages or [{"role": "user", "content": prompt or ""}]
+    chars = sum(len(str(m.get("content") or "")) for m in messages)
+    return chars // 4 + int(kwargs.get("max_tokens") or 0)
+
+
+def _usage_tokens(response) -> Optional[int]:
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return None
+    return getattr(usage, "total_tokens", None) or dict(usage).get("total_tokens")
+
+
+class RateLimitedLM(LMWrapper):
+    """调用内层 LM 之前先从 RateLimiter 取得额度；多个 LM 可以共享同一个 limiter。"""
+
+    def __init__(self, lm: dspy.BaseLM, limiter: RateLimiter):
+        super().__init__(lm)
+        self.limiter = limiter
+
+    def forward(self, prompt=None, messages=None, **kwargs):
+        estimated = estimate_tokens(prompt, messages, {**self.lm.kwargs, **kwargs})
+        self.limiter.acquire(estimated)
+        response = None
+        try:
+            response = super().forward(prompt=prompt, messages=messages, **kwargs)
+            return response
+        finally:
+            self.limiter.release(estimated, _usage_tokens(response))
+
+    async def aforward(self, prompt=None, messages=None, **kwargs):
+        estimated = estimate_tokens(prompt, messages, {**self.lm.kwargs, **kwargs})
+        await self.limiter.aacquire(estimated)
+        response = None
+        try:
+            response = await super().aforward(
+                prompt=prompt, messages=messages, **kwargs
+            )
+            return response
+        finally:
+            self.limiter.release(estimated, _usage_tokens(response))
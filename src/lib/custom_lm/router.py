@@ -0,0 +1,340 @@
+import asyncio
+import concurrent.futures
+import copy
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Type, Union
+
+import dspy
+
+
+SignatureSpec = Union[str, Type[dspy.Signature]]
+
+
+@dataclass
+class BackendState:
+    """单个后端的滚动统计：最近 window 次调用的延迟和成败，以及当前排队数"""
+
+    lm: dspy.BaseLM
+    window: int = 50
+    latencies: deque = field(default_factory=deque)
+    outcomes: deque = field(default_factory=deque)
+    in_flight: int = 0
+    cooldown_until: float = 0.0
+
+    @property
+    def name(self) -> str:
+        return self.lm.model
+
+    def mean_latency(self, default: float) -> float:
+        if not self.latencies:
+            return default
+        return sum(self.latencies) / len(self.latencies)
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def record(self, ok: bool, latency: float):
+        self.outcomes.append(ok)
+        if len(self.outcomes) > self.window:
+            self.outcomes.popleft()
+        if ok:
+            self.latencies.append(latency)
+            if len(self.latencies) > self.window:
+                self.latencies.popleft()
+
+    def snapshot(self, default_latency: float) -> Dict[str, Any]:
+        return {
+            "mean_latency": self.mean_latency(default_latency),
+            "error_rate": self.error_rate,
+            "in_flight": self.in_flight,
+            "calls": len(self.outcomes),
+            "cooling_down": self.cooldown_until > time.monotonic(),
+        }
+
+
+@dataclass
+class _Rule:
+    inputs: frozenset
+    outputs: frozenset
+    backend: Optional[str] = None
+    hedge_after: Optional[float] = None
+
+    def matches(self, signature) -> bool:
+        return self.inputs <= set(signature.input_fields) and self.outputs <= set(
+            signature.output_fields
+        )
+
+
+def _fields(signature: SignatureSpec):
+    if isinstance(signature, str):
+        signature = dspy.Signature(signature)
+    return frozenset(signature.input_fields), frozenset(signature.output_fields)
+
+
+def _current_signature():
+    """当前正在调用 LM 的 Predict 的 signature（由 Module.__call__ 维护的调用栈得到）"""
+    for module in reversed(dspy.settings.caller_modules or []):
+        signature = getattr(module, "signature", None)
+        if signature is not None:
+            return signature
+    return None
+
+
+class RoutedLM(dspy.BaseLM):
+    """
+    在多个后端 LM 之间按延迟路由，可用在任何接受 dspy.LM 的地方。
+
+    每次调用选择健康后端中 平均延迟 * (1 + 排队数) 最小的一个；错误率超过
+    max_error_rate 的后端进入 cooldown。hedge_after 秒内没有返回时，会向次优后端
+    再发一次同样的请求，取先返回的结果；任何请求失败时按优先级继续尝试下一个后端。pin()/hedge() 可以针对某个 signature
+    固定后端或开启对冲。
+    """
+
+    def __init__(
+        self,
+        backends: Sequence[dspy.BaseLM],
+        hedge_after: Optional[float] = None,
+        max_error_rate: float = 0.5,
+        min_samples: int = 3,
+        cooldown: float = 30.0,
+        window: int = 50,
+        default_latency: float = 1.0,
+    ):
+        if not backends:
+            raise ValueError("RoutedLM requires at least one backend")
+        primary = backends[0]
+        super().__init__(
+            model=primary.model, model_type=primary.model_type, cache=primary.cache
+        )
+        self.kwargs = dict(primary.kwargs)
+        self.backends = [BackendState(lm, window=window) for lm in backends]
+        self.hedge_after = hedge_after
+        self.max_error_rate = max_error_rate
+        self.min_samples = min_samples
+        self.cooldown = cooldown
+        self.default_latency = default_latency
+        self.rules: List[_Rule] = []
+        self._call_kwargs: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(4, 2 * len(backends)), thread_name_prefix="lm-router"
+        )
+
+    def pin(self, signature: SignatureSpec, backend: str):
+        """匹配 signature 的调用始终发往 backend（按 model 名）"""
+        if backend not in {state.name for state in self.backends}:
+            raise ValueError(f"Unknown backend: {backend}")
+        inputs, outputs = _fields(signature)
+        self.rules.append(_Rule(inputs, outputs, backend=backend))
+
+    def hedge(self, signature: SignatureSpec, after: float):
+        """匹配 signature 的调用在 after 秒未返回时向第二个后端发出对冲请求"""
+        inputs, outputs = _fields(signature)
+        self.rules.append(_Rule(inputs, outputs, hedge_after=after))
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                state.name: state.snapshot(self.default_latency)
+                for state in self.backends
+            }
+
+    def _plan(self):
+        """返回 (按优先级排序的后端列表, 对冲等待时间)"""
+        signature = _current_signature()
+        pinned, hedge_after = None, self.hedge_after
+        if signature is not None:
+            for rule in self.rules:
+                if not rule.matches(signature):
+                    continue
+                if pinned is None and rule.backend is not None:
+                    pinned = rule.backend
+                if rule.hedge_after is not None:
+                    hedge_after = rule.hedge_after
+
+        now = time.monotonic()
+        with self._lock:
+            ranked = sorted(
+                self.backends,
+                key=lambda s: (s.cooldown_until > now, self._score(s)),
+            )
+        if pinned is not None:
+            ranked = [s for s in ranked if s.name == pinned]
+        return ranked, hedge_after
+
+    def _score(self, state: BackendState) -> float:
+        if state.latencies:
+            return state.mean_latency(self.default_latency) * (1 + state.in_flight)
+        # 还没有样本的后端空闲时优先尝试，之后按默认延迟和排队数估计
+        return self.default_latency * state.in_flight
+
+    def _start(self, state: BackendState) -> float:
+        with self._lock:
+            state.in_flight += 1
+        return time.monotonic()
+
+    def _finish(self, state: BackendState, start: float, ok: Optional[bool]):
+        with self._lock:
+            state.in_flight -= 1
+            if ok is None:
+                return
+            state.record(ok, time.monotonic() - start)
+            if (
+                not ok
+                and len(state.outcomes) >= self.min_samples
+                and state.error_rate > self.max_error_rate
+            ):
+                state.cooldown_until = time.monotonic() + self.cooldown
+                logging.warning(
+                    f"LM backend {state.name} unhealthy "
+                    f"(error rate {state.error_rate:.0%}), cooling down"
+                )
+
+    def _call(self, state: BackendState, prompt, messages, kwargs):
+        start = self._start(state)
+        try:
+            response = state.lm.forward(prompt=prompt, messages=messages, **kwargs)
+        except Exception:
+            self._finish(state, start, ok=False)
+            raise
+        self._finish(state, start, ok=True)
+        return response
+
+    async def _acall(self, state: BackendState, prompt, messages, kwargs):
+        start = self._start(state)
+        try:
+            response = await state.lm.aforward(
+                prompt=prompt, messages=messages, **kwargs
+            )
+        except asyncio.CancelledError:
+            # 对冲中落败被取消的请求不计入统计
+            self._finish(state, start, ok=None)
+            raise
+        except Exception:
+            self._finish(state, start, ok=False)
+            raise
+        self._finish(state, start, ok=True)
+        return response
+
+    def forward(self, prompt=None, messages=None, **kwargs):
+        kwargs = {**self._call_kwargs, **kwargs}
+        ranked, hedge_after = self._plan()
+        if hedge_after is not None and len(ranked) > 1:
+            return self._hedged(ranked, hedge_after, prompt, messages, kwargs)
+
+        last_error = None
+        for state in ranked:
+            try:
+                return self._call(state, prompt, messages, kwargs)
+            except Exception as e:
+                logging.warning(f"LM backend {state.name} failed: {e}")
+                last_error = e
+        raise last_error
+
+    async def aforward(self, prompt=None, messages=None, **kwargs):
+        kwargs = {**self._call_kwargs, **kwargs}
+        ranked, hedge_after = self._plan()
+        if hedge_after is not None and len(ranked) > 1:
+            return await self._ahedged(ranked, hedge_after, prompt, messages, kwargs)
+
+        last_error = None
+        for state in ranked:
+            try:
+                return await self._acall(state, prompt, messages, kwargs)
+            except Exception as e:
+                logging.warning(f"LM backend {state.name} failed: {e}")
+                last_error = e
+        raise last_error
+
+    def _hedged(self, ranked, hedge_after, prompt, messages, kwargs):
+        # 首选后端超过 hedge_after 仍未返回时，向下一个后端再发一份（只对冲一次）；
+        # 请求失败时与非对冲路径一样，立即换列表中的下一个后端
+        remaining = iter(ranked)
+        pending: Dict[concurrent.futures.Future, BackendState] = {}
+        hedged, last_error = False, None
+
+        def launch() -> bool:
+            state = next(remaining, None)
+            if state is not None:
+                future = self._executor.submit(self._call, state, prompt, messages, kwargs)
+                pending[future] = state
+            return state is not None
+
+        launch()
+        while pending:
+            done, _ = concurrent.futures.wait(
+                pending,
+                timeout=None if hedged else hedge_after,
+                return_when=concurrent.futures.FIRST_COMPLETED,
+            )
+            if not done:
+                launch()
+                hedged = True
+                continue
+            # 先成功的结果胜出；落后的线程无法取消，只是结果被丢弃
+            for future in done:
+                state = pending.pop(future)
+                try:
+                    return future.result()
+                except Exception as e:
+                    logging.warning(f"LM backend {state.name} failed: {e}")
+                    last_error = e
+            if not pending:
+                launch()
+        raise last_error
+
+    async def _ahedged(self, ranked, hedge_after, prompt, messages, kwargs):
+        remaining = iter(ranked)
+        pending: Dict[asyncio.Future, BackendState] = {}
+        hedged, last_error = False, None
+
+        def launch() -> bool:
+            state = next(remaining, None)
+            if state is not None:
+                task = asyncio.ensure_future(self._acall(state, prompt, messages, kwargs))
+                pending[task] = state
+            return state is not None
+
+        launch()
+        try:
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending,
+                    timeout=None if hedged else hedge_after,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    launch()
+                    hedged = True
+                    continue
+                for task in done:
+                    state = pending.pop(task)
+                    try:
+                        return task.result()
+                    except Exception as e:
+                        logging.warning(f"LM backend {state.name} failed: {e}")
+                        last_error = e
+                if not pending:
+                    launch()
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def copy(self, **kwargs):
+        # 副本共享后端及其统计，只是额外带上调用参数（如 rollout_id、temperature）
+        new_instance = copy.copy(self)
+        new_instance._call_kwargs = {**self._call_kwargs, **kwargs}
+        new_instance.kwargs = {**self.kwargs, **kwargs}
+        new_instance.history = []
+        return new_instance
+
+    def __deepcopy__(self, memo):
+        return self.copy()
@@ -0,0 +1,296 @@
+import asyncio
+import copy
+import json
+import math
+import random
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+import dspy
+from litellm import ModelResponse
+
+from lib.custom_lm.cache import cache_key
+from lib.custom_lm.wrapper import LMWrapper
+
+
+Messages = List[Dict[str, Any]]
+# 返回 {output_field: value}，或者直接返回完整的回复文本（例如 GEPA 反思用的 ``` 块）
+Script = Callable[[Messages], Union[Dict[str, Any], str]]
+Latency = Union[float, Callable[[], float]]
+
+_OUTPUT_FIELDS_BLOCK = re.compile(
+    r"Your output fields are:\n(.*?)\nAll interactions", re.DOTALL
+)
+_FIELD_NAME = re.compile(r"^\d+\. `(\w+)`", re.MULTILINE)
+
+
+def requested_fields(messages: Messages) -> List[str]:
+    """从 ChatAdapter 生成的 system message 中解析本次调用需要输出的字段名"""
+    for message in messages:
+        if message.get("role") != "system":
+            continue
+        match = _OUTPUT_FIELDS_BLOCK.search(message.get("content") or "")
+        if match:
+            return _FIELD_NAME.findall(match.group(1))
+    return []
+
+
+def input_value(messages: Messages, field: str) -> Optional[str]:
+    """读取最后一条 user message 中某个输入字段的取值"""
+    content = messages[-1].get("content") or ""
+    pattern = re.compile(
+        rf"\[\[ ## {re.escape(field)} ## \]\]\n(.*?)(?=\n\n\[\[ ## |\n\nRespond with|\Z)",
+        re.DOTALL,
+    )
+    match = pattern.search(content)
+    return match.group(1) if match else None
+
+
+def format_fields(fields: Dict[str, Any]) -> str:
+    """按 ChatAdapter 的格式拼接输出字段，非字符串值序列化为 JSON"""
+    parts = []
+    for name, value in fields.items():
+        if not isinstance(value, str):
+            value = json.dumps(value, ensure_ascii=False)
+        parts.append(f"[[ ## {name} ## ]]\n{value}")
+    parts.append("[[ ## completed ## ]]")
+    return "\n\n".join(parts)
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class _SeededDistribution:
+    """线程安全的可复现延迟分布；同一个 seed 下调用序列得到的延迟序列相同"""
+
+    def __init__(self, sample: Callable[[random.Random], float], seed: int):
+        self._sample = sample
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def __call__(self) -> float:
+        with self._lock:
+            return max(0.0, self._sample(self._rng))
+
+
+def gaussian_latency(mean: float, jitter: float = 0.2, seed: int = 0) -> Callable[[], float]:
+    """均值 mean 秒，标准差 mean * jitter，截断到非负"""
+    return _SeededDistribution(lambda rng: rng.gauss(mean, mean * jitter), seed)
+
+
+def lognormal_latency(median: float, sigma: float = 0.5, seed: int = 0) -> Callable[[], float]:
+    """中位数 median 秒的对数正态分布，sigma 越大长尾越重，接近真实 LM 后端"""
+    return _SeededDistribution(lambda rng: rng.lognormvariate(math.log(median), sigma), seed)
+
+
+def empirical_latency(samples: Sequence[float], seed: int = 0) -> Callable[[], float]:
+    """从实测的延迟样本中有放回地抽样"""
+    samples = list(samples)
+    return _SeededDistribution(lambda rng: rng.choice(samples), seed)
+
+
+def parse_latency(spec: str, seed: int = 0) -> Latency:
+    """
+    命令行里的延迟写法：
+    "0.05"、"gauss:0.05,0.2"、"lognormal:0.8,0.5"、"empirical:latencies.txt"（每行一个秒数）
+    """
+    kind, _, args = spec.partition(":")
+    if not args:
+        return float(kind)
+    if kind == "empirical":
+        return empirical_latency(
+            [float(line) for line in Path(args).read_text().split() if line], seed
+        )
+    values = [float(v) for v in args.split(",")]
+    if kind == "gauss":
+        return gaussian_latency(*values, seed=seed)
+    if kind == "lognormal":
+        return lognormal_latency(*values, seed=seed)
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class ScriptedLM(dspy.BaseLM):
+    """
+    不访问网络的假 LM：由 script 根据 messages 决定输出字段，用于压测和离线评估。
+
+    script 接收完整的 messages，返回 {output_field: value}（也可以直接返回回复文本）；
+    latency 可以是固定秒数，也可以是每次调用返回秒数的函数（见 gaussian_latency、
+    lognormal_latency 等），用来模拟真实后端的延迟分布。
+
+    calls / busy / peak_in_flight 记录调用次数、累计等待时间和最大并发，
+    压测时用来计算线程利用率。
+    """
+
+    def __init__(
+        self,
+        script: Script,
+        latency: Latency = 0.0,
+        model: str = "scripted/fake",
+    ):
+        super().__init__(model=model, cache=False)
+        self.script = script
+        self.latency = latency
+        self.calls = 0
+        self.busy = 0.0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+
+    def __deepcopy__(self, memo):
+        # lm.copy() 会 deepcopy；锁不能被复制，副本与原对象共享 script 和锁
+        new_instance = copy.copy(self)
+        new_instance.kwargs = dict(self.kwargs)
+        new_instance.history = []
+        return new_instance
+
+    def _delay(self) -> float:
+        return self.latency() if callable(self.latency) else self.latency
+
+    def _enter(self):
+        with self._lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        return time.perf_counter()
+
+    def _exit(self, start: float):
+        with self._lock:
+            self.in_flight -= 1
+            self.busy += time.perf_counter() - start
+
+    def reset_stats(self):
+        with self._lock:
+            self.calls = 0
+            self.busy = 0.0
+            self.peak_in_flight = self.in_flight
+
+    def content(self, messages: Messages) -> str:
+        result = self.script(messages)
+        return result if isinstance(result, str) else format_fields(result)
+
+    def _respond(self, prompt, messages) -> ModelResponse:
+        messages = messages or [{"role": "user", "content": prompt}]
+        with self._lock:
+            self.calls += 1
+        content = self.content(messages)
+        prompt_tokens = sum(_estimate_tokens(m.get("content") or "") for m in messages)
+        completion_tokens = _estimate_tokens(content)
+        return ModelResponse(
+            model=self.model,
+            choices=[
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": content},
+                }
+            ],
+            usage={
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        )
+
+    def forward(self, prompt=None, messages=None, **kwargs):
+        start = self._enter()
+        try:
+            time.sleep(self._delay())
+            return self._respond(prompt, messages)
+        finally:
+            self._exit(start)
+
+    async def aforward(self, prompt=None, messages=None, **kwargs):
+        start = self._enter()
+        try:
+            await asyncio.sleep(self._delay())
+            return self._respond(prompt, messages)
+        finally:
+            self._exit(start)
+
+
+def recording_key(messages: Messages) -> str:
+    # 与 LM 响应缓存相同的规范化方式，只看 messages，不区分模型和采样参数
+    return cache_key("recorded", messages, {})
+
+
+class ReplayLM(ScriptedLM):
+    """
+    按 messages 回放录制下来的回复（RecordingLM 写出的 JSONL），延迟仍由 latency 模拟。
+    没有录到的调用交给 fallback script；没有 fallback 时抛出 KeyError。
+    """
+
+    def __init__(
+        self,
+        recordings: Union[str, Path, Dict[str, str]],
+        latency: Latency = 0.0,
+        fallback: Optional[Script] = None,
+        model: str = "scripted/replay",
+    ):
+        super().__init__(fallback or self._missing, latency=latency, model=model)
+        if not isinstance(recordings, dict):
+            recordings = load_recordings(recordings)
+        self.recordings = recordings
+        self.replayed = 0
+
+    @staticmethod
+    def _missing(messages: Messages):
+        raise KeyError(f"No recorded completion for {recording_key(messages)}")
+
+    def content(self, messages: Messages) -> str:
+        recorded = self.recordings.get(recording_key(messages))
+        if recorded is None:
+            return super().content(messages)
+        with self._lock:
+            self.replayed += 1
+        return recorded
+
+
+def load_recordings(path: Union[str, Path]) -> Dict[str, str]:
+    recordings = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                recordings[entry["key"]] = entry["content"]
+    return recordings
+
+
+def _response_text(response) -> Optional[str]:
+    try:
+        return response.choices[0].message.content
+    except (AttributeError, IndexError, KeyError, TypeError):
+        return None
+
+
+class RecordingLM(LMWrapper):
+    """把真实 LM 的每次回复按 messages 追加到 JSONL，供 ReplayLM 离线回放"""
+
+    def __init__(self, lm: dspy.BaseLM, path: Union[str, Path]):
+        super().__init__(lm)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._write_lock = threading.Lock()
+
+    def _record(self, prompt, messages, response):
+        content = _response_text(response)
+        if content is None:
+            return response
+        messages = messages or [{"role": "user", "content": prompt}]
+        line = json.dumps(
+            {"key": recording_key(messages), "content": content}, ensure_ascii=False
+        )
+        with self._write_lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+        return response
+
+    def forward(self, prompt=None, messages=None, **kwargs):
+        response = super().forward(prompt=prompt, messages=messages, **kwargs)
+        return self._record(prompt, messages, response)
+
+    async def aforward(self, prompt=None, messages=None, **kwargs):
+        response = await super().aforward(prompt=prompt, messages=messages, **kwargs)
+        return self._record(prompt, messages, response)
+
@@ -0,0 +1,34 @@
+import copy
+
+import dspy
+
+
+class LMWrapper(dspy.BaseLM):
+    """
+    包装另一个 LM，默认把 forward/aforward 原样转发给它。
+
+    缓存、限流等策略继承这个类，只改写 forward/aforward；包装后的对象可以用在任何
+    接受 dspy.LM 的地方（dspy.configure、set_lm、GEPA 的 reflection_lm 等）。
+    """
+
+    def __init__(self, lm: dspy.BaseLM):
+        super().__init__(model=lm.model, model_type=lm.model_type, cache=lm.cache)
+        self.lm = lm
+        self.kwargs = lm.kwargs
+
+    def forward(self, prompt=None, messages=None, **kwargs):
+        return self.lm.forward(prompt=prompt, messages=messages, **kwargs)
+
+    async def aforward(self, prompt=None, messages=None, **kwargs):
+        return await self.lm.aforward(prompt=prompt, messages=messages, **kwargs)
+
+    def copy(self, **kwargs):
+        # 只复制内层 LM，缓存/限流器等共享状态保持同一份
+        new_instance = copy.copy(self)
+        new_instance.lm = self.lm.copy(**kwargs)
+        new_instance.kwargs = new_instance.lm.kwargs
+        new_instance.history = []
+        return new_instance
+
+    def __deepcopy__(self, memo):
+        return self.copy()
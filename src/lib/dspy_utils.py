@@ -1,7 +1,18 @@
-from typing import List
+import contextvars
+import os
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
 import dspy
 import logging
-from fastmcp import Client
+
+if TYPE_CHECKING:
+    # fastmcp/mcp 导入较重，只在真正创建 client 时加载
+    from fastmcp import Client
+    from mcp import ClientSession
+
+from lib.custom_lm.cache import with_cache
+from lib.custom_lm.coalesce import CoalescingLM
 
 
 logging.basicConfig(level=logging.INFO)
@@ -16,9 +27,16 @@ def create_lm(model: str = "ollama/qwen2.5:3b-instruct") -> dspy.LM:
     return lm
 
 
-def init_dspy(lm=None):
+def wrap_lm(lm: dspy.BaseLM, namespace: str) -> dspy.BaseLM:
+    # 所有入口共享同一个磁盘缓存，按入口名区分 namespace；
+    # 缓存未命中且同时在途的相同请求再由 CoalescingLM 合并成一次调用
+    return with_cache(CoalescingLM(lm), namespace)
+
+
+def init_dspy(lm=None, namespace: str = "default"):
     if lm is None:
         lm = create_lm()
+    lm = wrap_lm(lm, namespace)
     logging.info("Initializing dspy with local Ollama LLM...")
     logging.info("Configuring dspy...")
     dspy.configure(lm=lm, logging=True)
@@ -35,17 +53,143 @@ def init_dspy(lm=None):
     logging.info("dspy configuration complete.")
 
 
-async def list_tools(client: Client) -> List[dspy.Tool]:
-    dspy_tools: List[dspy.Tool] = []
-    tools = await client.list_tools()
-    for tool in tools:
-        logging.info(f"Found tool: {tool.name} - {tool.description}")
-        dspy_tools.append(dspy.Tool.from_mcp_tool(client.session, tool))
-    return dspy_tools
+# MCP tool catalog: 按 server 缓存工具列表和转换好的 dspy.Tool，避免每个请求都 list_tools + 转换
+TOOL_CATALOG_TTL = float(os.getenv("MCP_TOOL_CATALOG_TTL", 300))
+
+
+@dataclass
+class _CatalogEntry:
+    tools: List[dspy.Tool]
+    fetched_at: float
+
+
+_tool_catalog: Dict[str, _CatalogEntry] = {}
+# 当前请求使用的 session（server key -> session）；create_task 会复制 context，并发请求互不干扰
+_live_sessions: contextvars.ContextVar[Dict[str, "ClientSession"]] = (
+    contextvars.ContextVar("mcp_live_sessions")
+)
+# 没有 context 可用时（例如在其他线程里同步调用工具）退回到最近一次绑定的 session；
+# 同时记下检查 session 是否仍然连接的函数，已经关闭的 session 不再返回
+_last_sessions: Dict[str, Tuple["ClientSession", Optional[Callable[[], bool]]]] = {}
+
+
+def _drop_last_session(server: str, session: "ClientSession"):
+    entry = _last_sessions.get(server)
+    if entry is not None and entry[0] is session:
+        del _last_sessions[server]
+
+
+def _last_session(server: str) -> Optional["ClientSession"]:
+    entry = _last_sessions.get(server)
+    if entry is None:
+        return None
+    session, is_live = entry
+    if is_live is not None and not is_live():
+        _drop_last_session(server, session)
+        return None
+    return session
+
+
+class _LiveSession:
+    """转换后的 dspy.Tool 持有这个代理而不是某个具体 session，调用时再解析到当前 session"""
+
+    def __init__(self, server: str):
+        self.server = server
+
+    async def call_tool(self, name, arguments=None):
+        import anyio
+
+        session = _live_sessions.get({}).get(self.server) or _last_session(self.server)
+        if session is None:
+            raise RuntimeError(
+                f"No live MCP session for {self.server}; "
+                "call its tools inside the `async with client` block that listed them"
+            )
+        try:
+            return await session.call_tool(name, arguments=arguments)
+        except (anyio.ClosedResourceError, anyio.BrokenResourceError) as e:
+            # session 所在的 Client 上下文已经退出
+            _drop_last_session(self.server, session)
+            raise RuntimeError(f"No live MCP session for {self.server}: the session was closed") from e
+
+
+def server_key(client: "Client") -> str:
+    transport = client.transport
+    return str(getattr(transport, "url", None) or repr(transport))
+
+
+def invalidate_tool_catalog(server: Optional[str] = None):
+    if server is None:
+        _tool_catalog.clear()
+    else:
+        _tool_catalog.pop(server, None)
+
+
+class ToolCatalogHandler:
+    """收到 tools/list_changed 通知时让对应 server 的工具缓存失效"""
+
+    def __init__(self, server: str):
+        self.server = server
+
+    async def __call__(self, message):
+        import mcp.types
+
+        if isinstance(message, mcp.types.ServerNotification) and isinstance(
+            message.root, mcp.types.ToolListChangedNotification
+        ):
+            logging.info(f"Tool list changed on {self.server}")
+            invalidate_tool_catalog(self.server)
+
+
+def create_client(url: str) -> "Client":
+    from fastmcp import Client
+
+    return Client(url, message_handler=ToolCatalogHandler(url))
+
+
+def bind_session(
+    server: str, session: "ClientSession", is_live: Optional[Callable[[], bool]] = None
+):
+    sessions = dict(_live_sessions.get({}))
+    sessions[server] = session
+    _live_sessions.set(sessions)
+    _last_sessions[server] = (session, is_live)
+
+
+async def list_session_tools(
+    session: "ClientSession",
+    server: str,
+    ttl: Optional[float] = None,
+    is_live: Optional[Callable[[], bool]] = None,
+) -> List[dspy.Tool]:
+    """list_tools 的 mcp.ClientSession 版本，server 作为缓存 key"""
+    ttl = TOOL_CATALOG_TTL if ttl is None else ttl
+    bind_session(server, session, is_live)
+    entry = _tool_catalog.get(server)
+    if entry is None or time.monotonic() - entry.fetched_at > ttl:
+        result = await session.list_tools()
+        proxy = _LiveSession(server)
+        tools = []
+        for tool in result.tools:
+            logging.info(f"Found tool: {tool.name} - {tool.description}")
+            tools.append(dspy.Tool.from_mcp_tool(proxy, tool))
+        entry = _CatalogEntry(tools=tools, fetched_at=time.monotonic())
+        _tool_catalog[server] = entry
+    return list(entry.tools)
+
+
+async def list_tools(client: "Client", ttl: Optional[float] = None) -> List[dspy.Tool]:
+    session = client.session
+    # client 断开或重连后，这个 session 就不能再作为后备使用
+    return await list_session_tools(
+        session,
+        server_key(client),
+        ttl,
+        is_live=lambda: client.is_connected() and client.session is session,
+    )
 
 
 def load_env_variable():
-    import os
     from dotenv import load_dotenv
 
     load_dotenv()
@@ -0,0 +1,280 @@
+import atexit
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+DEFAULT_HTTP_CACHE_PATH = Path.home() / ".cache" / "dspy-demo" / "http_cache.sqlite3"
+DEFAULT_HTTP_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# 重放 304 时带回的响应头，其余头以本次 304 响应为准
+_STORED_HEADERS = ("content-type", "etag", "last-modified")
+# 缓存的是解码后的 body，这些头不能随重放的响应带出去
+_BODY_HEADERS = {"content-length", "content-encoding", "transfer-encoding"}
+
+
+@dataclass
+class HttpCacheStats:
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    bytes_saved: int = 0
+    bytes_downloaded: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def _header(headers, name: str) -> Optional[str]:
+    # requests 和 httpx 的 headers 都是大小写不敏感的
+    return headers.get(name) if headers is not None else None
+
+
+def _prepared_url(method: str, url, params=None) -> str:
+    """
+    按 requests 的规则规范化 URL（合并 params、转义），请求拦截器看到的原始 url + params
+    和响应里已经准备好的 request.url 才能得到同一个 key
+    """
+    import requests
+
+    return requests.Request(method.upper(), str(url), params=params).prepare().url
+
+
+def _request_key(method: str, url, headers) -> str:
+    """method + url + 认证信息 -> sha256；不同 token 看到的内容可能不同，不能共用条目"""
+    auth = _header(headers, "Authorization") or ""
+    payload = f"{method.upper()} {url} {hashlib.sha256(auth.encode()).hexdigest()}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _replay(response, body: bytes, headers: Dict[str, str]):
+    """用缓存的 body 构造一个 200 响应，类型与原响应（requests/httpx）一致"""
+    merged = {
+        name: value
+        for name, value in {**dict(response.headers), **headers}.items()
+        if name.lower() not in _BODY_HEADERS
+    }
+    if type(response).__module__.startswith("httpx"):
+        import httpx
+
+        return httpx.Response(
+            200, headers=merged, content=body, request=response.request
+        )
+
+    import requests
+
+    replayed = requests.Response()
+    replayed.status_code = 200
+    replayed._content = body
+    replayed.headers = requests.structures.CaseInsensitiveDict(merged)
+    replayed.url = response.url
+    replayed.request = response.request
+    replayed.encoding = response.encoding
+    replayed.reason = "OK"
+    return replayed
+
+
+class ConditionalCache:
+    """
+    基于 ETag/Last-Modified 的条件请求缓存，以一对拦截器的形式挂到
+    InterceptedSession / AsyncInterceptedSession 上。
+
+    - request_interceptor：已缓存的 GET 请求带上 If-None-Match / If-Modified-Since
+    - response_interceptor：200 时保存 body 和校验头，304 时用缓存内容重放成 200
+
+    GitHub 的 304 响应不计入 rate limit，内容没变时几乎不产生下行流量。
+    总大小超过 max_bytes 时按最近一次保存/重新验证的时间淘汰。
+    """
+
+    def __init__(
+        self,
+        path: Path = DEFAULT_HTTP_CACHE_PATH,
+        max_bytes: int = DEFAULT_HTTP_CACHE_MAX_BYTES,
+    ):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.stats = HttpCacheStats()
+        self._lock = threading.Lock()
+        # 与 ResponseCache 相同：第一次写入时扫描一次总大小，之后随写入/淘汰增减
+        self._total_size: Optional[int] = None
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(
+            str(self.path), check_same_thread=False, timeout=30
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS http_responses (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                updated REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS http_responses_updated ON http_responses (updated)"
+        )
+        self._conn.commit()
+
+    def _lookup(self, key: str):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT etag, last_modified, headers, body FROM http_responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+
+    def request_interceptor(self, method, url, **kwargs):
+        if method.upper() != "GET":
+            return kwargs
+        headers = kwargs.setdefault("headers", {})
+        url = _prepared_url(method, url, kwargs.get("params"))
+        row = self._lookup(_request_key(method, url, headers))
+        if row is None:
+            return kwargs
+        etag, last_modified = row[0], row[1]
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        return kwargs
+
+    def response_interceptor(self, response):
+        request = response.request
+        if request is None or request.method.upper() != "GET":
+            return response
+        url = _prepared_url(request.method, request.url)
+        key = _request_key(request.method, url, request.headers)
+
+        if response.status_code == 304:
+            row = self._lookup(key)
+            if row is None:
+                return response
+            body = row[3]
+            with self._lock:
+                # 重新验证过的条目最后才淘汰
+                self._conn.execute(
+                    "UPDATE http_responses SET updated = ? WHERE key = ?", (time.time(), key)
+                )
+                self._conn.commit()
+                self.stats.hits += 1
+                self.stats.bytes_saved += len(body)
+            return _replay(response, body, json.loads(row[2]))
+
+        with self._lock:
+            self.stats.misses += 1
+            self.stats.bytes_downloaded += len(response.content)
+        if response.status_code != 200:
+            return response
+        etag = _header(response.headers, "ETag")
+        last_modified = _header(response.headers, "Last-Modified")
+        if etag or last_modified:
+            self._store(key, url, etag, last_modified, response)
+        return response
+
+    def _store(self, key, url, etag, last_modified, response):
+        headers = {
+            name: response.headers[name]
+            for name in _STORED_HEADERS
+            if _header(response.headers, name) is not None
+        }
+        body = response.content
+        with self._lock:
+            old = self._conn.execute(
+                "SELECT size FROM http_responses WHERE key = ?", (key,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO http_responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, url, etag, last_modified, json.dumps(headers), body, len(body), time.time()),
+            )
+            if self._total_size is not None:
+                self._total_size += len(body) - (old[0] if old else 0)
+            self.stats.stores += 1
+            self.stats.evictions += self._evict()
+            self._conn.commit()
+
+    def _scan_size(self) -> int:
+        return self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM http_responses"
+        ).fetchone()[0]
+
+    def _evict(self) -> int:
+        if self._total_size is None:
+            self._total_size = self._scan_size()
+        if self._total_size <= self.max_bytes:
+            return 0
+        # 其他进程也可能写入同一个文件，超出上限时重新扫描一次
+        total = self._total_size = self._scan_size()
+        evicted = 0
+        while total > self.max_bytes:
+            row = self._conn.execute(
+                "SELECT key, size FROM http_responses ORDER BY updated LIMIT 1"
+            ).fetchone()
+            if row is None:
+                break
+            self._conn.execute("DELETE FROM http_responses WHERE key = ?", (row[0],))
+            total -= row[1]
+            evicted += 1
+        self._total_size = total
+        return evicted
+
+    def clear(self) -> int:
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM http_responses")
+            self._conn.commit()
+            self._total_size = None
+            return cur.rowcount
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            count, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM http_responses"
+            ).fetchone()
+            return {
+                **asdict(self.stats),
+                "hit_rate": self.stats.hit_rate,
+                "entries": count,
+                "bytes": size,
+            }
+
+
+_shared_cache: Optional[ConditionalCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_http_cache() -> Optional[ConditionalCache]:
+    """
+    进程内共享的 HTTP 缓存；HTTP_CACHE=0 时返回 None，
+    路径和容量可以用 HTTP_CACHE_PATH / HTTP_CACHE_MAX_BYTES 调整
+    """
+    global _shared_cache
+    if os.getenv("HTTP_CACHE", "1") == "0":
+        return None
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = ConditionalCache(
+                Path(os.getenv("HTTP_CACHE_PATH", DEFAULT_HTTP_CACHE_PATH)),
+                max_bytes=int(os.getenv("HTTP_CACHE_MAX_BYTES", DEFAULT_HTTP_CACHE_MAX_BYTES)),
+            )
+            atexit.register(_log_summary, _shared_cache)
+        return _shared_cache
+
+
+def _log_summary(cache: ConditionalCache):
+    summary = cache.summary()
+    if summary["hits"] or summary["misses"]:
+        logging.info(f"HTTP cache: {summary}")
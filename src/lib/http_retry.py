@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional
+
+
+_TRANSIENT_STATUS = {500, 502, 503, 504}
+
+
+@dataclass
+class BudgetStats:
+    requests: int = 0
+    paced: int = 0
+    total_wait: float = 0.0
+    retries: int = 0
+    rate_limited: int = 0
+    gave_up: int = 0
+
+
+def _int_header(headers, name: str) -> Optional[int]:
+    value = headers.get(name)
+    try:
+        return int(float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+class RateLimitBudget:
+    """
+    按 X-RateLimit-Remaining / X-RateLimit-Reset / Retry-After 维护的共享请求额度。
+
+    同一个 budget 可以挂到多个 session 上，线程和协程共用：
+    - 剩余额度低于 pace_below 时，把剩余请求均匀摊到重置时间之前
+    - 额度用完或收到 Retry-After 时，所有调用方一起暂停到允许的时间点
+    """
+
+    def __init__(self, pace_below: int = 500, reserve: int = 0):
+        self.pace_below = pace_below
+        self.reserve = reserve
+        self.remaining: Optional[int] = None
+        self.reset_at: Optional[float] = None
+        self.blocked_until = 0.0
+        self.stats = BudgetStats()
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def reserve_slot(self) -> float:
+        """占用一次请求额度，返回发请求前需要等待的秒数"""
+        with self._lock:
+            now = time.time()
+            wait = max(0.0, self.blocked_until - now)
+            if self.remaining is not None and self.reset_at is not None:
+                until_reset = max(0.0, self.reset_at - now)
+                if self.remaining <= self.reserve:
+                    wait = max(wait, until_reset)
+                elif self.remaining < self.pace_below:
+                    start = max(now + wait, self._next_slot)
+                    self._next_slot = start + until_reset / self.remaining
+                    wait = start - now
+                self.remaining -= 1
+            self.stats.requests += 1
+            if wait > 0:
+                self.stats.paced += 1
+                self.stats.total_wait += wait
+            return wait
+
+    def update(self, headers):
+        remaining = _int_header(headers, "X-RateLimit-Remaining")
+        reset_at = _int_header(headers, "X-RateLimit-Reset")
+        with self._lock:
+            if remaining is not None and reset_at is not None:
+                # 并发响应可能乱序到达，同一窗口内以最小的 remaining 为准
+                if reset_at == self.reset_at and self.remaining is not None:
+                    remaining = min(remaining, self.remaining)
+                self.remaining, self.reset_at = remaining, float(reset_at)
+
+    def block_for(self, seconds: float):
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.time() + seconds)
+
+    def record_retry(self, delay: float, rate_limited: bool):
+        """记一次重试；被限流时所有调用方一起暂停 delay 秒"""
+        with self._lock:
+            if rate_limited:
+                self.stats.rate_limited += 1
+                self.blocked_until = max(self.blocked_until, time.time() + delay)
+            self.stats.retries += 1
+
+    def record_gave_up(self):
+        with self._lock:
+            self.stats.gave_up += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **asdict(self.stats),
+                "remaining": self.remaining,
+                "reset_at": self.reset_at,
+            }
+
+
+class RetryInterceptor:
+    """
+    限流 + 重试拦截器。
+
+    请求拦截器在发请求前按 budget 节流；响应拦截器在 429、限流导致的 403 和 5xx 时
+    等待 Retry-After / 额度重置时间，或按带抖动的指数退避重发同一个请求。
+    需要 session.send 来重发，所以用 install(session) 挂载。
+    """
+
+    def __init__(
+        self,
+        budget: RateLimitBudget,
+        max_retries: int = 5,
+        backoff_base: float = 1.0,
+        backoff_cap: float = 60.0,
+    ):
+        self.budget = budget
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+
+    def install(self, session, is_async: bool = False):
+        if is_async:
+            session.add_request_interceptor(self.arequest_interceptor)
+            session.add_response_interceptor(
+                lambda response: self.aresponse_interceptor(session, response)
+            )
+        else:
+            session.add_request_interceptor(self.request_interceptor)
+            session.add_response_interceptor(
+                lambda response: self.response_interceptor(session, response)
+            )
+        return session
+
+    def _is_rate_limited(self, response) -> bool:
+        if response.status_code == 429:
+            return True
+        headers = response.headers
+        return response.status_code == 403 and (
+            headers.get("X-RateLimit-Remaining") == "0"
+            or headers.get("Retry-After") is not None
+        )
+
+    def _retry_delay(self, response, attempt: int) -> Optional[float]:
+        """不需要重试时返回 None"""
+        self.budget.update(response.headers)
+        rate_limited = self._is_rate_limited(response)
+        if not rate_limited and response.status_code not in _TRANSIENT_STATUS:
+            return None
+        if attempt >= self.max_retries:
+            self.budget.record_gave_up()
+            return None
+
+        headers = response.headers
+        retry_after = _int_header(headers, "Retry-After")
+        reset_at = _int_header(headers, "X-RateLimit-Reset")
+        if retry_after is not None:
+            delay = float(retry_after)
+        elif rate_limited and reset_at is not None:
+            delay = max(0.0, reset_at - time.time()) + 1
+        else:
+            # full jitter
+            delay = random.uniform(
+                0, min(self.backoff_cap, self.backoff_base * 2**attempt)
+            )
+        self.budget.record_retry(delay, rate_limited)
+        logging.warning(
+            f"HTTP {response.status_code} for {response.request.url}, "
+            f"retry {attempt + 1}/{self.max_retries} in {delay:.1f}s"
+        )
+        return delay
+
+    def request_interceptor(self, method, url, **kwargs):
+        wait = self.budget.reserve_slot()
+        if wait:
+            time.sleep(wait)
+        return kwargs
+
+    async def arequest_interceptor(self, method, url, **kwargs):
+        wait = self.budget.reserve_slot()
+        if wait:
+            await asyncio.sleep(wait)
+        return kwargs
+
+    def response_interceptor(self, session, response):
+        attempt = 0
+        while (delay := self._retry_delay(response, attempt)) is not None:
+            time.sleep(max(delay, self.budget.reserve_slot()))
+            response = session.send(response.request)
+            attempt += 1
+        return response
+
+    async def aresponse_interceptor(self, session, response):
+        attempt = 0
+        while (delay := self._retry_delay(response, attempt)) is not None:
+            await asyncio.sleep(max(delay, self.budget.reserve_slot()))
+            response = await session.send(response.request)
+            attempt += 1
+        return response
+
+
+# GitHub REST API 的额度按 token 计算，本进程内所有 GitHub session 共用一份
+GITHUB_BUDGET = RateLimitBudget()
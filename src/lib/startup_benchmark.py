@@ -0,0 +1,124 @@
+"""
+Startup-time budget for the console scripts.
+
+Imports each `[project.scripts]` entry module in a fresh interpreter with
+`-X importtime` and checks the cumulative import time against a budget, so a
+stray top-level `import dspy` in a CLI module shows up as a failure.
+
+Only the project's own imports count against the budget: modules that a bare
+`python -c pass` also loads (site, encodings, ...) are reported separately as
+interpreter start-up, and each script is measured `--repeat` times and the
+median is used.
+
+    python -m lib.startup_benchmark            # from src/
+    python -m lib.startup_benchmark --repeat 5 --script assist
+"""
+
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+import tomllib
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+SRC_DIR = Path(__file__).resolve().parents[1]
+PYPROJECT = SRC_DIR.parent / "pyproject.toml"
+
+# 单位 ms；瘦客户端只应加载标准库，agentd 本来就要预热所有依赖
+DEFAULT_BUDGET_MS = 150.0
+BUDGETS_MS: Dict[str, float] = {
+    "agentd": 15_000.0,
+}
+
+_IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)")
+
+
+def load_scripts(pyproject: Path = PYPROJECT) -> Dict[str, str]:
+    """返回 {script 名: 入口模块}"""
+    with open(pyproject, "rb") as f:
+        scripts = tomllib.load(f)["project"]["scripts"]
+    return {name: target.split(":")[0] for name, target in scripts.items()}
+
+
+def _top_level_imports(code: str) -> Dict[str, int]:
+    """在新进程里执行 code，返回 {顶层 import 的模块: 累计耗时 us}"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=SRC_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{code} failed:\n{proc.stderr[-2000:]}")
+    rows = {}
+    for line in proc.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        # 缩进为 1 个空格的是顶层 import，其累计时间已包含所有子 import
+        if match and len(match.group(3)) == 1:
+            rows[match.group(4)] = int(match.group(2))
+    return rows
+
+
+def baseline_modules() -> Set[str]:
+    """`python -c pass` 也会加载的模块（site、encodings 等解释器启动开销）"""
+    return set(_top_level_imports("pass"))
+
+
+def import_time_ms(module: str, baseline: Set[str]) -> Tuple[float, float]:
+    """
+    import module 一次，返回 (项目自身的 import 耗时, 解释器启动的 import 耗时)。
+    前者只累加不在 baseline 中的顶层 import，与 site 等启动开销的波动无关。
+    """
+    rows = _top_level_imports(f"import {module}")
+    own = sum(us for name, us in rows.items() if name not in baseline)
+    startup = sum(us for name, us in rows.items() if name in baseline)
+    return own / 1000, startup / 1000
+
+
+def measure(scripts: Dict[str, str], repeat: int) -> List[dict]:
+    baseline = baseline_modules()
+    rows = []
+    for name, module in scripts.items():
+        runs = [import_time_ms(module, baseline) for _ in range(repeat)]
+        own = statistics.median(run[0] for run in runs)
+        budget = BUDGETS_MS.get(name, DEFAULT_BUDGET_MS)
+        rows.append(
+            {
+                "script": name,
+                "module": module,
+                "ms": own,
+                "startup_ms": statistics.median(run[1] for run in runs),
+                "budget": budget,
+                "ok": own <= budget,
+            }
+        )
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="取中位数")
+    parser.add_argument(
+        "--script", action="append", help="只测指定的 script，可重复"
+    )
+    args = parser.parse_args(argv)
+
+    scripts = load_scripts()
+    if args.script:
+        scripts = {name: scripts[name] for name in args.script}
+    rows = measure(scripts, args.repeat)
+
+    print(f"{'script':<10} {'module':<24} {'import ms':>10} {'budget':>10} {'startup ms':>11}")
+    for row in rows:
+        flag = "" if row["ok"] else "  OVER BUDGET"
+        print(
+            f"{row['script']:<10} {row['module']:<24} "
+            f"{row['ms']:>10.1f} {row['budget']:>10.0f} {row['startup_ms']:>11.1f}{flag}"
+        )
+    return 0 if all(row["ok"] for row in rows) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,41 +1,163 @@
+import asyncio
+from typing import Optional
+
 import dspy
 
 from llms_txt.Signatures import AnalyzeCodeStructure, AnalyzeRepository, GenerateLLMsTxt
+from llms_txt.incremental import RunMemo, significant_tree, stage_key
+from llms_txt.tree_digest import TreeDigest
 
 
 class RepositoryAnalyzer(dspy.Module):
-    def __init__(self):
+    def __init__(self, max_tree_paths: int = 2000):
         super().__init__()
+        # 超过 max_tree_paths 的 file_tree 先压缩成目录摘要，再交给后面的分析阶段
+        self.tree_digest = TreeDigest(max_paths=max_tree_paths)
         self.analyze_repo = dspy.ChainOfThought(AnalyzeRepository)
         self.analyze_structure = dspy.ChainOfThought(AnalyzeCodeStructure)
         self.generate_llms_txt = dspy.ChainOfThought(GenerateLLMsTxt)
         self.generate_examples = dspy.ChainOfThought("repo_info -> usage_examples")
 
-    def forward(self, repo_url, file_tree, readme_content, package_files):
+    # ---- 增量运行：memo 中 key 相同的阶段直接复用上次的输出，inputs 只在需要时才构造 ----
+
+    def _run(self, memo: Optional[RunMemo], name: str, key: str, module, inputs):
+        cached = memo.lookup(name, key) if memo is not None else None
+        if cached is not None:
+            return cached
+        prediction = module(**inputs())
+        if memo is not None:
+            memo.record(name, key, prediction)
+        return prediction
+
+    async def _arun(self, memo: Optional[RunMemo], name: str, key: str, module, inputs):
+        cached = memo.lookup(name, key) if memo is not None else None
+        if cached is not None:
+            return cached
+        prediction = await module.acall(**await inputs())
+        if memo is not None:
+            memo.record(name, key, prediction)
+        return prediction
+
+    def forward(self, repo_url, file_tree, readme_content, package_files, memo=None):
+        tree = significant_tree(file_tree)
+        digest = []
+
+        def tree_input():
+            # 只有需要重新计算的分析阶段才生成目录摘要
+            if not digest:
+                digest.append(self.tree_digest(file_tree=file_tree).digest)
+            return digest[0]
+
         # Analyze repository purpose and concepts
-        repo_analysis = self.analyze_repo(
-            repo_url=repo_url, file_tree=file_tree, readme_content=readme_content
+        repo_analysis = self._run(
+            memo,
+            "analyze_repo",
+            stage_key(self.analyze_repo, repo_url, tree, readme_content),
+            self.analyze_repo,
+            lambda: dict(
+                repo_url=repo_url, file_tree=tree_input(), readme_content=readme_content
+            ),
         )
 
         # Analyze code structure
-        structure_analysis = self.analyze_structure(
-            file_tree=file_tree, package_files=package_files
+        structure_analysis = self._run(
+            memo,
+            "analyze_structure",
+            stage_key(self.analyze_structure, tree, package_files),
+            self.analyze_structure,
+            lambda: dict(file_tree=tree_input(), package_files=package_files),
         )
 
         # Generate usage examples
-        usage_examples = self.generate_examples(
-            repo_info=f"Purpose: {repo_analysis.project_purpose}\nConcepts: {repo_analysis.key_concepts}"
+        repo_info = _repo_info(repo_analysis)
+        usage_examples = self._run(
+            memo,
+            "generate_examples",
+            stage_key(self.generate_examples, repo_info),
+            self.generate_examples,
+            lambda: dict(repo_info=repo_info),
         )
 
         # Generate final llms.txt
-        llms_txt = self.generate_llms_txt(
-            project_purpose=repo_analysis.project_purpose,
-            key_concepts=repo_analysis.key_concepts,
-            architecture_overview=repo_analysis.architecture_overview,
-            important_directories=structure_analysis.important_directories,
-            entry_points=structure_analysis.entry_points,
-            development_info=structure_analysis.development_info,
-            usage_examples=usage_examples.usage_examples,
+        inputs = _llms_txt_inputs(repo_analysis, structure_analysis, usage_examples)
+        llms_txt = self._run(
+            memo,
+            "generate_llms_txt",
+            stage_key(self.generate_llms_txt, inputs),
+            self.generate_llms_txt,
+            lambda: inputs,
+        )
+
+        return dspy.Prediction(
+            llms_txt_content=llms_txt.llms_txt_content,
+            analysis=repo_analysis,
+            structure=structure_analysis,
+        )
+
+    async def aforward(
+        self, repo_url, file_tree, readme_content, package_files, memo=None
+    ):
+        """
+        与 forward 相同的流水线，但互不依赖的阶段并发执行：
+        analyze_repo -> generate_examples 与 analyze_structure 同时进行，
+        generate_llms_txt 等两条分支都完成后再执行。
+        """
+        tree = significant_tree(file_tree)
+        digest = []
+
+        async def tree_input():
+            if not digest:
+                digest.append(
+                    asyncio.ensure_future(self.tree_digest.acall(file_tree=file_tree))
+                )
+            return (await digest[0]).digest
+
+        async def analyze_and_generate_examples():
+            async def inputs():
+                return dict(
+                    repo_url=repo_url,
+                    file_tree=await tree_input(),
+                    readme_content=readme_content,
+                )
+
+            repo_analysis = await self._arun(
+                memo,
+                "analyze_repo",
+                stage_key(self.analyze_repo, repo_url, tree, readme_content),
+                self.analyze_repo,
+                inputs,
+            )
+            repo_info = _repo_info(repo_analysis)
+            usage_examples = await self._arun(
+                memo,
+                "generate_examples",
+                stage_key(self.generate_examples, repo_info),
+                self.generate_examples,
+                _ready(repo_info=repo_info),
+            )
+            return repo_analysis, usage_examples
+
+        async def structure_inputs():
+            return dict(file_tree=await tree_input(), package_files=package_files)
+
+        (repo_analysis, usage_examples), structure_analysis = await asyncio.gather(
+            analyze_and_generate_examples(),
+            self._arun(
+                memo,
+                "analyze_structure",
+                stage_key(self.analyze_structure, tree, package_files),
+                self.analyze_structure,
+                structure_inputs,
+            ),
+        )
+
+        inputs = _llms_txt_inputs(repo_analysis, structure_analysis, usage_examples)
+        llms_txt = await self._arun(
+            memo,
+            "generate_llms_txt",
+            stage_key(self.generate_llms_txt, inputs),
+            self.generate_llms_txt,
+            _ready(**inputs),
         )
 
         return dspy.Prediction(
@@ -43,3 +165,26 @@ class RepositoryAnalyzer(dspy.Module):
             analysis=repo_analysis,
             structure=structure_analysis,
         )
+
+
+def _ready(**inputs):
+    async def get():
+        return inputs
+
+    return get
+
+
+def _repo_info(repo_analysis) -> str:
+    return f"Purpose: {repo_analysis.project_purpose}\nConcepts: {repo_analysis.key_concepts}"
+
+
+def _llms_txt_inputs(repo_analysis, structure_analysis, usage_examples) -> dict:
+    return dict(
+        project_purpose=repo_analysis.project_purpose,
+        key_concepts=repo_analysis.key_concepts,
+        architecture_overview=repo_analysis.architecture_overview,
+        important_directories=structure_analysis.important_directories,
+        entry_points=structure_analysis.entry_points,
+        development_info=structure_analysis.development_info,
+        usage_examples=usage_examples.usage_examples,
+    )
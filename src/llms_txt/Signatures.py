@@ -51,3 +51,16 @@ class GenerateLLMsTxt(dspy.Signature):
     llms_txt_content: str = dspy.OutputField(
         desc="Complete llms.txt file content following the standard format"
     )
+
+
+class SummarizeDirectory(dspy.Signature):
+    """Summarize what a directory of a repository contains and what it is for."""
+
+    directory: str = dspy.InputField(desc="Directory path relative to the repository root")
+    contents: str = dspy.InputField(
+        desc="Files in the directory, or summaries of its subdirectories"
+    )
+
+    summary: str = dspy.OutputField(
+        desc="One or two sentences on the directory's purpose and notable files"
+    )
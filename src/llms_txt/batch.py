@@ -0,0 +1,171 @@
+"""
+Batch llms.txt generation for many repositories.
+
+    python -m llms_txt.batch repos.txt --out llms_out --workers 4
+
+The manifest has one GitHub URL or local checkout path per line (`#` starts a
+comment), or is a JSON list of them. All workers share the GLM rate limiter, the
+LM response cache, the HTTP cache and the GitHub rate-limit budget. Every finished
+repo is appended to `<out>/report.jsonl`, and repos already reported as ok are
+skipped on the next run unless `--force` is given.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List
+
+from lib.custom_lm.lms import Glm_Limiter, Lm_Glm_Limited
+from lib.dspy_utils import init_dspy
+from lib.http_cache import get_http_cache
+from lib.http_retry import GITHUB_BUDGET
+from llms_txt.RepoAnalyzer import RepositoryAnalyzer
+from llms_txt.script import generate
+
+
+REPORT_NAME = "report.jsonl"
+
+
+def load_manifest(path: Path) -> List[str]:
+    text = Path(path).read_text(encoding="utf-8")
+    if path.suffix == ".json":
+        return [str(repo) for repo in json.loads(text)]
+    repos = []
+    for line in text.splitlines():
+        line = line.split("#", 1)[0].strip()
+        if line:
+            repos.append(line)
+    return repos
+
+
+def output_path(out_dir: Path, repo: str) -> Path:
+    owner, name = repo.rstrip("/").split("/")[-2:]
+    return out_dir / f"{owner}__{name}" / "llms.txt"
+
+
+def write_atomic(path: Path, content: str):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def completed(out_dir: Path) -> Dict[str, dict]:
+    """report.jsonl 中最近一次成功且输出文件仍存在的仓库"""
+    done = {}
+    try:
+        lines = (out_dir / REPORT_NAME).read_text(encoding="utf-8").splitlines()
+    except OSError:
+        return done
+    for number, line in enumerate(lines, 1):
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            # 上一次运行在写报告时被中断，最后一行可能不完整
+            entry = None
+        # 能解析但不是这里写出的记录（非 dict 或缺少 repo/status）同样跳过
+        if not isinstance(entry, dict) or not entry.get("repo") or "status" not in entry:
+            logging.warning(f"Skipping unreadable line {number} of {out_dir / REPORT_NAME}")
+            continue
+        output = entry.get("output")
+        if entry["status"] == "ok" and output and Path(output).exists():
+            done[entry["repo"]] = entry
+        else:
+            done.pop(entry["repo"], None)
+    return done
+
+
+class BatchRunner:
+    def __init__(self, out_dir: Path, workers: int = 4, mode=None):
+        self.out_dir = Path(out_dir)
+        self.workers = workers
+        self.mode = mode
+        self.analyzer = RepositoryAnalyzer()
+        self._report_lock = threading.Lock()
+
+    def _report(self, entry: dict):
+        with self._report_lock:
+            self.out_dir.mkdir(parents=True, exist_ok=True)
+            with open(self.out_dir / REPORT_NAME, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def run_one(self, repo: str) -> dict:
+        start = time.monotonic()
+        entry = {"repo": repo, "output": None}
+        try:
+            # manifest 里格式不对的条目在这里就会出错，记为 failed 而不是中断整个批次
+            out_path = output_path(self.out_dir, repo)
+            entry["output"] = str(out_path)
+            result = generate(repo, self.analyzer, self.mode)
+            write_atomic(out_path, result.llms_txt_content)
+            entry["status"] = "ok"
+        except Exception as e:
+            logging.error(f"{repo} failed: {e}")
+            logging.debug(traceback.format_exc())
+            entry["status"] = "failed"
+            entry["error"] = f"{type(e).__name__}: {e}"
+        entry["seconds"] = round(time.monotonic() - start, 2)
+        self._report(entry)
+        return entry
+
+    def run(self, repos: List[str], force: bool = False) -> List[dict]:
+        done = {} if force else completed(self.out_dir)
+        pending = [repo for repo in dict.fromkeys(repos) if repo not in done]
+        if done:
+            print(f"Skipping {len(repos) - len(pending)} repos already done")
+
+        results = [{**done[repo], "status": "skipped"} for repo in repos if repo in done]
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [pool.submit(self.run_one, repo) for repo in pending]
+            for future in as_completed(futures):
+                entry = future.result()
+                results.append(entry)
+                print(f"[{len(results)}/{len(repos)}] {entry['status']:<7} {entry['seconds']:>7.1f}s  {entry['repo']}")
+        return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Generate llms.txt for many repositories")
+    parser.add_argument("manifest", type=Path)
+    parser.add_argument("--out", type=Path, default=Path("llms_out"))
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--mode", default=None, help="auto | tarball | snapshot")
+    parser.add_argument("--force", action="store_true", help="ignore report.jsonl and redo all")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level)
+
+    # 所有 worker 共用一个 GLM 限流器，线程里只读取主线程的 dspy 配置
+    init_dspy(Lm_Glm_Limited, namespace="llms_txt")
+    runner = BatchRunner(args.out, workers=args.workers, mode=args.mode)
+
+    start = time.monotonic()
+    results = runner.run(load_manifest(args.manifest), force=args.force)
+    failed = [entry for entry in results if entry["status"] == "failed"]
+
+    print(f"\nFinished {len(results)} repos in {time.monotonic() - start:.1f}s, {len(failed)} failed")
+    for entry in failed:
+        print(f"  {entry['repo']}: {entry['error']}")
+    print(f"LM limiter: {Glm_Limiter.snapshot()}")
+    print(f"GitHub budget: {GITHUB_BUDGET.snapshot()}")
+    http_cache = get_http_cache()
+    if http_cache is not None:
+        print(f"HTTP cache: {http_cache.summary()}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
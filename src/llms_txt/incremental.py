@@ -0,0 +1,142 @@
+import fnmatch
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import dspy
+
+
+RUNS_DIR = Path(
+    os.getenv("LLMS_TXT_RUNS_DIR", Path.home() / ".cache" / "dspy-demo" / "llms_txt_runs")
+)
+
+# 只改动这些路径时不影响项目定位/结构分析的结论，不参与 analyze_* 的输入 key
+INCIDENTAL_PATTERNS = [
+    "tests/*",
+    "test/*",
+    "*/tests/*",
+    "*/test/*",
+    "test_*",
+    "*/test_*",
+    "*_test.*",
+    "docs/*",
+    "examples/*",
+    ".github/*",
+    "*.lock",
+]
+
+
+def is_incidental(path: str) -> bool:
+    return any(fnmatch.fnmatch(path, pattern) for pattern in INCIDENTAL_PATTERNS)
+
+
+def significant_tree(file_tree: str) -> str:
+    return "\n".join(
+        path for path in file_tree.splitlines() if path and not is_incidental(path)
+    )
+
+
+def module_fingerprint(module: dspy.Module) -> List[List[Any]]:
+    """module 中每个 predictor 的 (名字, 模型, 指令)；换模型或改指令后旧的输出不再复用"""
+    default_lm = dspy.settings.lm
+    return [
+        [name, getattr(predictor.lm or default_lm, "model", None), predictor.signature.instructions]
+        for name, predictor in module.named_predictors()
+    ]
+
+
+def stage_key(module: dspy.Module, *parts: Any) -> str:
+    """执行该阶段的 module（模型 + 指令）和它的输入 -> sha256"""
+    payload = json.dumps(
+        [module_fingerprint(module), *parts], sort_keys=True, ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def diff_trees(old: str, new: str) -> Dict[str, List[str]]:
+    old_paths, new_paths = set(old.splitlines()), set(new.splitlines())
+    return {
+        "added": sorted(new_paths - old_paths),
+        "removed": sorted(old_paths - new_paths),
+    }
+
+
+class RunMemo:
+    """
+    上一次运行的各阶段输出，按仓库保存为一个 JSON 文件。
+
+    每个阶段记录 {key, outputs}，key 由该阶段的输入算出（文件树部分忽略测试、文档等
+    INCIDENTAL_PATTERNS）；新一轮运行时 key 相同的阶段直接复用上次的输出。
+    """
+
+    def __init__(self, path: Path, data: Optional[Dict[str, Any]] = None):
+        self.path = Path(path)
+        self.data = data or {"sha": None, "file_tree": "", "stages": {}}
+        self.reused: List[str] = []
+        self.recomputed: List[str] = []
+
+    @classmethod
+    def load(cls, repo_url: str) -> "RunMemo":
+        name = "__".join(repo_url.rstrip("/").split("/")[-2:]) + ".json"
+        path = RUNS_DIR / name
+        try:
+            return cls(path, json.loads(path.read_text(encoding="utf-8")))
+        except (OSError, ValueError):
+            return cls(path)
+
+    @property
+    def sha(self) -> Optional[str]:
+        return self.data.get("sha")
+
+    def lookup(self, stage: str, key: str) -> Optional[dspy.Prediction]:
+        entry = self.data["stages"].get(stage)
+        if entry is None or entry["key"] != key:
+            self.recomputed.append(stage)
+            return None
+        self.reused.append(stage)
+        return dspy.Prediction(**entry["outputs"])
+
+    def record(self, stage: str, key: str, prediction: dspy.Prediction):
+        self.data["stages"][stage] = {"key": key, "outputs": prediction.toDict()}
+
+    def replay(self, fingerprint: str) -> Optional[dspy.Prediction]:
+        """
+        同一个 commit、所有阶段都已记录且 fingerprint（整个 analyzer 的 stage_key）
+        与上次相同时，直接用上次的结果
+        """
+        stages = self.data["stages"]
+        if self.data.get("fingerprint") != fingerprint:
+            return None
+        if not {"analyze_repo", "analyze_structure", "generate_llms_txt"} <= set(stages):
+            return None
+        self.reused = list(stages)
+        return dspy.Prediction(
+            llms_txt_content=stages["generate_llms_txt"]["outputs"]["llms_txt_content"],
+            analysis=dspy.Prediction(**stages["analyze_repo"]["outputs"]),
+            structure=dspy.Prediction(**stages["analyze_structure"]["outputs"]),
+        )
+
+    def log_diff(self, file_tree: str):
+        diff = diff_trees(self.data.get("file_tree", ""), file_tree)
+        significant = [
+            path for path in diff["added"] + diff["removed"] if not is_incidental(path)
+        ]
+        logging.info(
+            f"Tree diff since {self.sha}: +{len(diff['added'])} -{len(diff['removed'])} "
+            f"({len(significant)} significant)"
+        )
+
+    def save(self, sha: Optional[str], file_tree: str, fingerprint: str):
+        self.data["sha"] = sha
+        self.data["file_tree"] = file_tree
+        self.data["fingerprint"] = fingerprint
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # 先写临时文件再替换，避免中途退出留下半个 JSON
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
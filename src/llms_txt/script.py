@@ -1,33 +1,67 @@
+import asyncio
+import os
 from pathlib import Path
 from lib.custom_lm.lms import Lm_Glm
 from lib.dspy_utils import init_dspy
+from lib.http_cache import get_http_cache
 
 from llms_txt.RepoAnalyzer import RepositoryAnalyzer
+from llms_txt.incremental import RunMemo, stage_key
+from llms_txt.snapshot import current_commit_sha
 from llms_txt.utils import gather_repository_info
 
 
-def main():
-    init_dspy(Lm_Glm)
-
-    # Initialize our analyzer
-    analyzer = RepositoryAnalyzer()
+def generate(repo_url, analyzer: RepositoryAnalyzer, mode=None):
+    """为一个仓库生成 llms.txt，返回 analyzer 的 Prediction；script 和 batch 共用"""
+    # 上一次运行的各阶段输出；LLMS_TXT_INCREMENTAL=0 时每次都全部重新生成
+    memo, sha, fingerprint = None, None, None
+    if os.getenv("LLMS_TXT_INCREMENTAL", "1") != "0":
+        memo = RunMemo.load(repo_url)
+        sha = current_commit_sha(repo_url)
+        fingerprint = stage_key(analyzer)
+        result = memo.replay(fingerprint) if sha and sha == memo.sha else None
+        if result is not None:
+            print(f"{repo_url} unchanged at {sha}, reusing previous llms.txt")
+            return result
 
     # Gather DSPy repository information
-    repo_url = "https://github.com/ChinYoung/gracias"
-    file_tree, readme_content, package_files = gather_repository_info(repo_url)
+    # LLMS_TXT_MODE=snapshot 下载一次 tarball；repo_url 也可以是本地 checkout 路径
+    mode = mode or os.getenv("LLMS_TXT_MODE", "auto")
+    file_tree, readme_content, package_files = gather_repository_info(repo_url, mode=mode)
+    if memo is not None:
+        memo.log_diff(file_tree)
 
     # Generate llms.txt
-    result = analyzer(
-        repo_url=repo_url,
-        file_tree=file_tree,
-        readme_content=readme_content,
-        package_files=package_files,
+    # 独立的分析阶段并发执行，见 RepositoryAnalyzer.aforward
+    result = asyncio.run(
+        analyzer.acall(
+            repo_url=repo_url,
+            file_tree=file_tree,
+            readme_content=readme_content,
+            package_files=package_files,
+            memo=memo,
+        )
     )
+    if memo is not None:
+        memo.save(sha, file_tree, fingerprint)
+        print(f"{repo_url} reused stages: {memo.reused}, recomputed: {memo.recomputed}")
+    return result
+
+
+def main(repo_url="https://github.com/ChinYoung/gracias", mode=None):
+    init_dspy(Lm_Glm, namespace="llms_txt")
+
+    # Initialize our analyzer
+    analyzer = RepositoryAnalyzer()
+    result = generate(repo_url, analyzer, mode)
 
     # Save result to local file
     out_path = Path(__file__).resolve().parent / "llms.txt"
     out_path.write_text(str(result), encoding="utf-8")
     print(f"Wrote llms.txt to {out_path}")
+    http_cache = get_http_cache()
+    if http_cache is not None:
+        print(f"HTTP cache: {http_cache.summary()}")
     return result
 
 
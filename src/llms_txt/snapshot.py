@@ -0,0 +1,157 @@
+"""
+Local repository snapshots for llms_txt.
+
+A snapshot is a plain directory of files plus a `paths.txt` manifest. It comes either
+from one streamed tarball download, cached by commit SHA, or from a local checkout.
+README and the package files are read straight from disk, so a snapshot needs no
+per-file API calls and works offline against a local clone.
+"""
+
+import os
+import shutil
+import subprocess
+import tarfile
+import tempfile
+from pathlib import Path, PurePosixPath
+from typing import Iterable, List, Optional
+
+from llms_txt.utils import _find_readme, _repo_api, get_download_client, select_key_files
+
+
+SNAPSHOT_DIR = Path(
+    os.getenv(
+        "LLMS_TXT_SNAPSHOT_DIR", Path.home() / ".cache" / "dspy-demo" / "llms_txt_snapshots"
+    )
+)
+# 写在最后，存在即表示快照已完整解压
+_MANIFEST = "paths.txt"
+
+
+class RepoSnapshot:
+    def __init__(self, root: Path, sha: Optional[str], paths: List[str]):
+        self.root = Path(root)
+        self.sha = sha
+        self.paths = sorted(paths)
+
+    def file_tree(self) -> str:
+        return "\n".join(self.paths)
+
+    def read(self, path: str) -> str:
+        try:
+            return (self.root / path).read_text(encoding="utf-8", errors="replace")
+        except OSError:
+            return f"Could not fetch {path}"
+
+    def gather(self, key_files: Optional[List[str]] = None):
+        """返回与 gather_repository_info 相同的 (file_tree, readme_content, package_files)"""
+        readme_content = self.read(_find_readme(self.paths))
+        package_files = [
+            f"=== {path} ===\n{self.read(path)}"
+            for path in select_key_files(self.paths, key_files)
+        ]
+        return self.file_tree(), readme_content, "\n\n".join(package_files)
+
+
+def resolve_commit_sha(repo_url: str, ref: str = "main") -> str:
+    response = get_download_client().get(
+        f"{_repo_api(repo_url)}/commits/{ref}",
+        headers={"Accept": "application/vnd.github.sha"},
+    )
+    if response.status_code != 200:
+        raise Exception(f"Failed to resolve {ref} of {repo_url}: {response.status_code}")
+    return response.text.strip()
+
+
+def _safe_path(name: str) -> Optional[str]:
+    """去掉 tarball 顶层目录（owner-repo-<sha>/），拒绝绝对路径和 .."""
+    parts = PurePosixPath(name).parts[1:]
+    if not parts or ".." in parts or PurePosixPath(name).is_absolute():
+        return None
+    return "/".join(parts)
+
+
+def _load(root: Path, sha: Optional[str]) -> RepoSnapshot:
+    paths = (root / _MANIFEST).read_text(encoding="utf-8").splitlines()
+    return RepoSnapshot(root / "files", sha, paths)
+
+
+def download_snapshot(repo_url: str, ref: str = "main") -> RepoSnapshot:
+    """下载一次 tarball 并流式解压到 SNAPSHOT_DIR/<owner>/<repo>/<sha>，已存在时直接复用"""
+    sha = resolve_commit_sha(repo_url, ref)
+    owner, repo = repo_url.rstrip("/").split("/")[-2:]
+    root = SNAPSHOT_DIR / owner / repo / sha
+    if (root / _MANIFEST).exists():
+        return _load(root, sha)
+
+    response = get_download_client().get(
+        f"{_repo_api(repo_url)}/tarball/{sha}", stream=True
+    )
+    if response.status_code != 200:
+        raise Exception(f"Failed to fetch repository tarball: {response.status_code}")
+
+    root.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(dir=root.parent, prefix=f".{sha}-"))
+    try:
+        paths = []
+        with response, tarfile.open(fileobj=response.raw, mode="r|gz") as archive:
+            for member in archive:
+                path = _safe_path(member.name)
+                if path is None or not member.isfile():
+                    continue
+                target = staging / "files" / path
+                target.parent.mkdir(parents=True, exist_ok=True)
+                with archive.extractfile(member) as src, open(target, "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+                paths.append(path)
+        (staging / _MANIFEST).write_text("\n".join(sorted(paths)), encoding="utf-8")
+        # 另一个进程可能已经解压了同一个 commit，以先完成的为准
+        try:
+            staging.rename(root)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return _load(root, sha)
+
+
+def _git(path: Path, *args: str) -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "-C", str(path), *args], capture_output=True, text=True, check=True
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _walk(path: Path) -> Iterable[str]:
+    for dirpath, dirnames, filenames in os.walk(path):
+        dirnames[:] = [d for d in dirnames if d != ".git"]
+        for filename in filenames:
+            yield (Path(dirpath) / filename).relative_to(path).as_posix()
+
+
+def local_snapshot(path) -> RepoSnapshot:
+    """直接使用本地 checkout；是 git 仓库时按 git ls-files 列文件，SHA 取 HEAD"""
+    path = Path(path).resolve()
+    listed = _git(path, "ls-files", "-z")
+    paths = listed.split("\0")[:-1] if listed is not None else list(_walk(path))
+    sha = (_git(path, "rev-parse", "HEAD") or "").strip() or None
+    return RepoSnapshot(path, sha, paths)
+
+
+def open_snapshot(source: str, ref: str = "main") -> RepoSnapshot:
+    """source 是本地目录时用本地 checkout，否则当作 GitHub URL 下载 tarball"""
+    if os.path.isdir(source):
+        return local_snapshot(source)
+    return download_snapshot(source, ref)
+
+
+def current_commit_sha(source: str, ref: str = "main") -> Optional[str]:
+    """source 当前的 commit SHA；拿不到时返回 None"""
+    if os.path.isdir(source):
+        return (_git(Path(source), "rev-parse", "HEAD") or "").strip() or None
+    try:
+        return resolve_commit_sha(source, ref)
+    except Exception:
+        return None
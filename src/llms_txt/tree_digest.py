@@ -0,0 +1,248 @@
+import asyncio
+import hashlib
+import os
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import dspy
+
+from llms_txt.Signatures import SummarizeDirectory
+
+
+CACHE_NAMESPACE = "llms_txt.tree"
+
+
+def subtree_hash(paths: List[str]) -> str:
+    return hashlib.sha256("\n".join(sorted(paths)).encode("utf-8")).hexdigest()
+
+
+def _parent(directory: str) -> str:
+    return directory.rsplit("/", 1)[0] if "/" in directory else "."
+
+
+def partition(paths: List[str], chunk_paths: int) -> Dict[str, List[str]]:
+    """
+    按目录把路径切成若干块，每块最多 chunk_paths 个文件：
+    目录里的文件总数不超过 chunk_paths 时整个子树作为一块，否则拆到子目录；
+    目录下直接的文件和放得下的小子目录按名字顺序装箱，凑满 chunk_paths 再成块
+    （多块时命名为 part），只有超过 chunk_paths 的子目录才继续递归拆分。
+    根目录的文件不在结果里。
+    """
+    units: Dict[str, List[str]] = {}
+
+    def split(directory: str, files: List[str]):
+        if len(files) <= chunk_paths:
+            units[directory] = files
+            return
+        prefix = len(directory) + 1
+        direct, children = [], defaultdict(list)
+        for path in files:
+            head, sep, _ = path[prefix:].partition("/")
+            if sep:
+                children[f"{directory}/{head}"].append(path)
+            else:
+                direct.append(path)
+
+        bins: List[List[str]] = []
+
+        def place(group: List[str]):
+            if not bins or len(bins[-1]) + len(group) > chunk_paths:
+                bins.append([])
+            bins[-1].extend(group)
+
+        for i in range(0, len(direct), chunk_paths):
+            place(direct[i : i + chunk_paths])
+        for child in sorted(children):
+            if len(children[child]) > chunk_paths:
+                split(child, children[child])
+            else:
+                place(children[child])
+        for i, group in enumerate(bins):
+            units[directory if i == 0 else f"{directory} (part {i + 1})"] = group
+
+    top = defaultdict(list)
+    for path in paths:
+        head, sep, _ = path.partition("/")
+        if sep:
+            top[head].append(path)
+    for directory, files in top.items():
+        split(directory, files)
+    return units
+
+
+class TreeDigest(dspy.Module):
+    """
+    把很大的 file_tree 压缩成有上限的目录摘要（map-reduce）。
+
+    - map：按目录切块，每块调用一次 SummarizeDirectory，块之间并发
+    - reduce：摘要总长仍超过 max_digest_chars 时，把同一父目录下的摘要再合并总结一次
+    - 每块的摘要按子树 hash + 模型 + 指令缓存，没有变化的目录不会重复总结
+
+    路径数不超过 max_paths 时原样返回 file_tree，不产生任何 LM 调用。
+    """
+
+    def __init__(
+        self,
+        max_paths: int = 2000,
+        chunk_paths: int = 200,
+        max_digest_chars: int = 20_000,
+        num_threads: int = 8,
+        cache=None,
+    ):
+        super().__init__()
+        self.max_paths = max_paths
+        self.chunk_paths = chunk_paths
+        self.max_digest_chars = max_digest_chars
+        self.num_threads = num_threads
+        self.summarize = dspy.Predict(SummarizeDirectory)
+        if cache is None and os.getenv("LM_CACHE", "1") != "0":
+            from lib.custom_lm.cache import get_response_cache
+
+            cache = get_response_cache()
+        self.cache = cache
+
+    # ---- 缓存 ----
+
+    def _model(self) -> str:
+        lm = self.summarize.lm or dspy.settings.lm
+        return getattr(lm, "model", None) or "tree_digest"
+
+    def _cache_key(self, key: str) -> str:
+        # 子树 hash 之外还要区分模型和 SummarizeDirectory 的指令，换了任何一个都重新总结
+        instructions = self.summarize.signature.instructions
+        payload = "\x1f".join([key, self._model(), instructions])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _cached(self, key: str) -> Optional[str]:
+        if self.cache is None:
+            return None
+        return self.cache.get(CACHE_NAMESPACE, self._cache_key(key))
+
+    def _store(self, key: str, summary: str):
+        if self.cache is not None:
+            self.cache.put(CACHE_NAMESPACE, self._cache_key(key), self._model(), summary)
+
+    # ---- 构造每一轮的输入 ----
+
+    def _map_jobs(self, units: Dict[str, List[str]]):
+        """返回 [(directory, key, contents)]"""
+        return [
+            (directory, subtree_hash(files), "\n".join(files))
+            for directory, files in units.items()
+        ]
+
+    def _reduce_jobs(self, summaries: Dict[str, tuple]):
+        """把同一父目录下的多个摘要合并成一个任务；summaries: {directory: (key, summary)}"""
+        groups = defaultdict(list)
+        for directory, item in summaries.items():
+            groups[_parent(directory.split(" (part ")[0])].append((directory, item))
+        merged = {
+            parent
+            for parent, children in groups.items()
+            if len(children) > 1 and parent != "."
+        }
+        jobs, kept = [], {}
+        for parent, children in groups.items():
+            if parent not in merged:
+                # 父目录自己的摘要（目录下直接的文件）会并入父目录这一轮的总结
+                kept.update((d, item) for d, item in children if d not in merged)
+                continue
+            if parent in summaries:
+                children = [(f"{parent} (files)", summaries[parent]), *children]
+            key = subtree_hash([item[0] for _, item in children])
+            contents = "\n".join(f"{child}/: {item[1]}" for child, item in children)
+            jobs.append((parent, key, contents))
+        return jobs, kept
+
+    def _digest(self, root_files: List[str], summaries: Dict[str, tuple]) -> str:
+        lines = list(root_files)
+        lines += [f"{directory}/: {item[1]}" for directory, item in sorted(summaries.items())]
+        digest = "\n".join(lines)
+        if len(digest) > self.max_digest_chars:
+            digest = digest[: self.max_digest_chars] + "\n... (truncated)"
+        return digest
+
+    def _too_long(self, root_files, summaries) -> bool:
+        size = sum(len(f) + 1 for f in root_files)
+        size += sum(len(d) + len(item[1]) + 4 for d, item in summaries.items())
+        return size > self.max_digest_chars
+
+    # ---- 执行 ----
+
+    def _run_sync(self, jobs) -> Dict[str, tuple]:
+        results, pending = {}, []
+        for directory, key, contents in jobs:
+            cached = self._cached(key)
+            if cached is not None:
+                results[directory] = (key, cached)
+            else:
+                pending.append((directory, key, contents))
+        if pending:
+            examples = [
+                dspy.Example(directory=directory, contents=contents).with_inputs(
+                    "directory", "contents"
+                )
+                for directory, _, contents in pending
+            ]
+            predictions = self.summarize.batch(
+                examples, num_threads=self.num_threads, disable_progress_bar=True
+            )
+            for (directory, key, _), prediction in zip(pending, predictions):
+                results[directory] = (key, self._finish(key, prediction))
+        return results
+
+    async def _run_async(self, jobs) -> Dict[str, tuple]:
+        semaphore = asyncio.Semaphore(self.num_threads)
+
+        async def run(directory, key, contents):
+            cached = self._cached(key)
+            if cached is not None:
+                return directory, (key, cached)
+            async with semaphore:
+                prediction = await self.summarize.acall(
+                    directory=directory, contents=contents
+                )
+            return directory, (key, self._finish(key, prediction))
+
+        return dict(await asyncio.gather(*(run(*job) for job in jobs)))
+
+    def _finish(self, key: str, prediction) -> str:
+        summary = " ".join(str(getattr(prediction, "summary", "") or "").split())
+        if summary:
+            self._store(key, summary)
+        return summary
+
+    def _split(self, file_tree: str):
+        paths = [line for line in file_tree.splitlines() if line]
+        root_files = [path for path in paths if "/" not in path]
+        return paths, root_files
+
+    def forward(self, file_tree: str):
+        paths, root_files = self._split(file_tree)
+        if len(paths) <= self.max_paths:
+            return dspy.Prediction(digest=file_tree, summarized=False)
+        summaries = self._run_sync(self._map_jobs(partition(paths, self.chunk_paths)))
+        while self._too_long(root_files, summaries):
+            jobs, kept = self._reduce_jobs(summaries)
+            if not jobs:
+                break
+            summaries = {**kept, **self._run_sync(jobs)}
+        return dspy.Prediction(
+            digest=self._digest(root_files, summaries), summarized=True
+        )
+
+    async def aforward(self, file_tree: str):
+        paths, root_files = self._split(file_tree)
+        if len(paths) <= self.max_paths:
+            return dspy.Prediction(digest=file_tree, summarized=False)
+        summaries = await self._run_async(
+            self._map_jobs(partition(paths, self.chunk_paths))
+        )
+        while self._too_long(root_files, summaries):
+            jobs, kept = self._reduce_jobs(summaries)
+            if not jobs:
+                break
+            summaries = {**kept, **await self._run_async(jobs)}
+        return dspy.Prediction(
+            digest=self._digest(root_files, summaries), summarized=True
+        )
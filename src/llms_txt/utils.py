@@ -1,37 +1,87 @@
-import requests
-import os
+import asyncio
 import base64
-from lib.InterceptedSession import get_intercepted_session
+import fnmatch
+import logging
+import os
+import tarfile
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+from lib.InterceptedSession import (
+    AsyncInterceptedSession,
+    InterceptedSession,
+    get_async_intercepted_session,
+    get_intercepted_session,
+)
 
-client = get_intercepted_session()
 
+@lru_cache(maxsize=None)
+def get_client() -> InterceptedSession:
+    """第一次请求 GitHub 时才创建 session"""
+    return get_intercepted_session()
 
-def get_github_file_tree(repo_url):
-    """Get repository file structure from GitHub API."""
+
+@lru_cache(maxsize=None)
+def get_download_client() -> InterceptedSession:
+    """下载 tarball 专用：不经过 HTTP 缓存（归档不写进 SQLite），配合 stream=True 不整体读入内存"""
+    return get_intercepted_session(use_cache=False)
+
+
+@lru_cache(maxsize=None)
+def get_async_client() -> AsyncInterceptedSession:
+    """异步版本的 GitHub session；同步入口通过 run_sync 在它的后台事件循环中执行，连接池跨调用复用"""
+    return get_async_intercepted_session()
+
+
+def _run_sync(coro, async_name: str):
+    """
+    同步入口共用：协程在 session 的后台事件循环（另一个线程）中执行，所以在已运行的
+    事件循环里调用也不会抛 RuntimeError，但会阻塞那个循环，异步调用方应该直接 await
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        pass
+    else:
+        logging.warning(
+            f"{async_name[1:]} called from a running event loop blocks it; "
+            f"await {async_name} instead"
+        )
+    return get_async_client().run_sync(coro)
+
+
+def _repo_api(repo_url):
     # Extract owner/repo from URL
     parts = repo_url.rstrip("/").split("/")
     owner, repo = parts[-2], parts[-1]
+    return f"https://api.github.com/repos/{owner}/{repo}"
+
+
+def _tree_url(repo_url):
+    return f"{_repo_api(repo_url)}/git/trees/main?recursive=1"
+
 
-    api_url = f"https://api.github.com/repos/{owner}/{repo}/git/trees/main?recursive=1"
-    response = client.get(api_url)
+def _content_url(repo_url, file_path):
+    return f"{_repo_api(repo_url)}/contents/{file_path}"
 
+
+def _tree_blobs(response) -> Dict[str, str]:
+    """tree 响应 -> {path: blob sha}"""
     if response.status_code == 200:
         tree_data = response.json()
-        file_paths = [
-            item["path"] for item in tree_data["tree"] if item["type"] == "blob"
-        ]
-        return "\n".join(sorted(file_paths))
+        return {
+            item["path"]: item["sha"]
+            for item in tree_data["tree"]
+            if item["type"] == "blob"
+        }
     else:
         raise Exception(f"Failed to fetch repository tree: {response.status_code}")
 
 
-def get_github_file_content(repo_url, file_path):
-    parts = repo_url.rstrip("/").split("/")
-    owner, repo = parts[-2], parts[-1]
+def _parse_tree(response):
+    return "\n".join(sorted(_tree_blobs(response)))
 
-    api_url = f"https://api.github.com/repos/{owner}/{repo}/contents/{file_path}"
-    response = client.get(api_url)
 
+def _parse_content(response, file_path):
     if response.status_code == 200:
         content = base64.b64decode(response.json()["content"]).decode("utf-8")
         return content
@@ -39,21 +89,144 @@ def get_github_file_content(repo_url, file_path):
         return f"Could not fetch {file_path}"
 
 
-def gather_repository_info(repo_url):
-    """Gather all necessary repository information."""
-    file_tree = get_github_file_tree(repo_url)
-    readme_content = get_github_file_content(repo_url, "README.md")
+def get_github_file_tree(repo_url):
+    """Get repository file structure from GitHub API."""
+    return _parse_tree(get_client().get(_tree_url(repo_url)))
+
+
+def get_github_file_content(repo_url, file_path):
+    return _parse_content(get_client().get(_content_url(repo_url, file_path)), file_path)
+
+
+async def aget_github_file_tree(repo_url):
+    return _parse_tree(await get_async_client().get(_tree_url(repo_url)))
+
+
+async def aget_github_file_content(repo_url, file_path):
+    response = await get_async_client().get(_content_url(repo_url, file_path))
+    return _parse_content(response, file_path)
 
-    # Get key package files
-    package_files = []
-    for file_path in ["pyproject.toml", "setup.py", "requirements.txt", "package.json"]:
-        try:
-            content = get_github_file_content(repo_url, file_path)
-            if "Could not fetch" not in content:
-                package_files.append(f"=== {file_path} ===\n{content}")
-        except:
-            continue
 
+async def aget_github_files(repo_url, file_paths: List[str]) -> Dict[str, str]:
+    """并发获取多个文件，返回 {path: content}；并发度由 AsyncInterceptedSession 限制"""
+    contents = await asyncio.gather(
+        *(aget_github_file_content(repo_url, path) for path in file_paths)
+    )
+    return dict(zip(file_paths, contents))
+
+
+def get_github_files(repo_url, file_paths: List[str]) -> Dict[str, str]:
+    """aget_github_files 的同步入口"""
+    return _run_sync(aget_github_files(repo_url, file_paths), "aget_github_files")
+
+
+PACKAGE_FILES = ["pyproject.toml", "setup.py", "requirements.txt", "package.json"]
+# 需要的文件超过这个数量时改为下载一次 tarball
+TARBALL_THRESHOLD = 20
+
+
+def select_key_files(paths: Iterable[str], patterns: Optional[List[str]] = None) -> List[str]:
+    """从 tree 中挑出要读取的文件：默认的包描述文件，加上 patterns（fnmatch）匹配到的文件"""
+    paths = list(paths)
+    selected = [path for path in PACKAGE_FILES if path in paths]
+    for pattern in patterns or []:
+        selected += [
+            path for path in paths if fnmatch.fnmatch(path, pattern) and path not in selected
+        ]
+    return selected
+
+
+def _find_readme(paths: Iterable[str]) -> str:
+    paths = list(paths)
+    if "README.md" in paths:
+        return "README.md"
+    readmes = [path for path in paths if "/" not in path and path.lower().startswith("readme")]
+    return readmes[0] if readmes else "README.md"
+
+
+def _decode_blob(response, file_path):
+    if response.status_code == 200:
+        return base64.b64decode(response.json()["content"]).decode("utf-8", errors="replace")
+    return f"Could not fetch {file_path}"
+
+
+async def aget_github_blobs(repo_url, blobs: Dict[str, str]) -> Dict[str, str]:
+    """按 blob sha 并发获取文件；blob 内容不可变，配合 ETag 缓存后重复运行几乎不传输数据"""
+    client = get_async_client()
+    responses = await asyncio.gather(
+        *(client.get(f"{_repo_api(repo_url)}/git/blobs/{sha}") for sha in blobs.values())
+    )
+    return {
+        path: _decode_blob(response, path)
+        for path, response in zip(blobs, responses)
+    }
+
+
+def _get_github_tarball_files(repo_url, file_paths: List[str]) -> Dict[str, str]:
+    response = get_download_client().get(
+        f"{_repo_api(repo_url)}/tarball/main", stream=True
+    )
+    if response.status_code != 200:
+        response.close()
+        raise Exception(f"Failed to fetch repository tarball: {response.status_code}")
+    wanted = set(file_paths)
+    files = {path: f"Could not fetch {path}" for path in file_paths}
+    # 流式解压：边下载边读成员，只保留 file_paths 的内容
+    with response, tarfile.open(fileobj=response.raw, mode="r|gz") as archive:
+        for member in archive:
+            # 成员路径形如 owner-repo-<sha>/path/to/file
+            path = member.name.split("/", 1)[-1]
+            if member.isfile() and path in wanted:
+                files[path] = archive.extractfile(member).read().decode("utf-8", errors="replace")
+    return files
+
+
+async def aget_github_tarball_files(repo_url, file_paths: List[str]) -> Dict[str, str]:
+    """下载一次 main 分支的 tarball，从中取出 file_paths；同步的流式下载放在线程里，不阻塞事件循环"""
+    return await asyncio.to_thread(_get_github_tarball_files, repo_url, file_paths)
+
+
+async def agather_repository_info(repo_url, key_files: Optional[List[str]] = None, mode: str = "auto"):
+    """
+    并发版本的 gather_repository_info。
+
+    先取一次 tree，再按 tree 里的 blob sha 并发拉取 README 和 key files；
+    mode="tarball" 或文件数超过 TARBALL_THRESHOLD 时改为下载一次 tarball。
+    key_files 是额外的 fnmatch 模式，例如 ["src/*/__init__.py", "docs/*.md"]。
+    """
+    response = await get_async_client().get(_tree_url(repo_url))
+    blobs = _tree_blobs(response)
+    file_tree = "\n".join(sorted(blobs))
+
+    readme = _find_readme(blobs)
+    selected = select_key_files(blobs, key_files)
+    wanted = [path for path in [readme, *selected] if path in blobs]
+    if mode == "tarball" or (mode == "auto" and len(wanted) > TARBALL_THRESHOLD):
+        files = await aget_github_tarball_files(repo_url, wanted)
+    else:
+        files = await aget_github_blobs(repo_url, {path: blobs[path] for path in wanted})
+
+    readme_content = files.get(readme, f"Could not fetch {readme}")
+    package_files = [
+        f"=== {path} ===\n{files[path]}"
+        for path in selected
+        if "Could not fetch" not in files[path]
+    ]
     package_files_content = "\n\n".join(package_files)
 
     return file_tree, readme_content, package_files_content
+
+
+def gather_repository_info(repo_url, key_files: Optional[List[str]] = None, mode: str = "auto"):
+    """Gather all necessary repository information.
+
+    mode="snapshot" 或 repo_url 是本地目录时从本地快照读取（见 llms_txt.snapshot）。
+    异步代码里请使用 agather_repository_info。
+    """
+    if mode == "snapshot" or os.path.isdir(repo_url):
+        from llms_txt.snapshot import open_snapshot
+
+        return open_snapshot(repo_url).gather(key_files)
+    return _run_sync(
+        agather_repository_info(repo_url, key_files, mode), "agather_repository_info"
+    )
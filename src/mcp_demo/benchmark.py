@@ -0,0 +1,269 @@
+"""
+Load generator for the airline agent stack.
+
+Drives many concurrent requests through the ReAct agent in `dspy_tools` against
+`mcp_server.py`, with a scripted fake LM so no network is needed.
+
+    cd src && python -m mcp_demo.benchmark --requests 200 --concurrency 16
+"""
+
+import argparse
+import asyncio
+import contextvars
+import logging
+import math
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import dspy
+from mcp import ClientSession
+from mcp.client.stdio import stdio_client
+
+from lib.custom_lm.scripted import ScriptedLM, requested_fields
+from mcp_demo.dspy_tools import run_with_session, server_params
+
+
+USER_PROFILE = {"user_id": "1", "name": "Adam", "email": "adam@gmail.com"}
+FLIGHT = {
+    "flight_id": "DA123",
+    "origin": "SFO",
+    "destination": "JFK",
+    "date_time": {"year": 2025, "month": 9, "day": 1, "hour": 1},
+    "duration": 3,
+    "price": 200,
+}
+
+# 预设的订票流程：每一步是 ReAct 的一次 (tool_name, tool_args) 决策
+BOOKING_SCRIPT = [
+    ("get_user_info", {"name": "Adam"}),
+    (
+        "fetch_flight_info",
+        {
+            "date": {"year": 2025, "month": 9, "day": 1, "hour": 1},
+            "origin": "SFO",
+            "destination": "JFK",
+        },
+    ),
+    ("book_itinerary", {"flight": FLIGHT, "user_profile": USER_PROFILE}),
+    ("finish", {}),
+]
+
+USER_REQUEST = (
+    "please help me book a flight from SFO to JFK on 09/01/2025, my name is Adam"
+)
+
+
+@dataclass
+class RequestStats:
+    latency: float = 0.0
+    lm_time: float = 0.0
+    lm_calls: int = 0
+    mcp_time: float = 0.0
+    tool_calls: int = 0
+    handshake_time: float = 0.0
+    error: Optional[str] = None
+
+
+@dataclass
+class BenchmarkReport:
+    mode: str
+    requests: int
+    concurrency: int
+    wall_time: float
+    stats: List[RequestStats] = field(default_factory=list)
+
+    def summary(self) -> Dict[str, float]:
+        ok = [s for s in self.stats if s.error is None]
+        latencies = [s.latency for s in ok]
+        tool_calls = sum(s.tool_calls for s in ok)
+        return {
+            "ok": len(ok),
+            "errors": len(self.stats) - len(ok),
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "tool_calls_per_request": tool_calls / len(ok) if ok else 0.0,
+            "lm_time_per_request": _mean([s.lm_time for s in ok]),
+            "mcp_time_per_request": _mean([s.mcp_time for s in ok]),
+            "mcp_rtt": sum(s.mcp_time for s in ok) / tool_calls if tool_calls else 0.0,
+            "handshake_per_request": _mean([s.handshake_time for s in ok]),
+            "requests_per_sec": len(ok) / self.wall_time if self.wall_time else 0.0,
+            "server_tool_calls_per_sec": (
+                tool_calls / self.wall_time if self.wall_time else 0.0
+            ),
+        }
+
+    def format(self) -> str:
+        s = self.summary()
+        lines = [
+            f"mode={self.mode} requests={self.requests} concurrency={self.concurrency} "
+            f"wall={self.wall_time:.2f}s ok={s['ok']} errors={s['errors']}",
+            f"latency  p50={s['p50'] * 1000:.1f}ms p95={s['p95'] * 1000:.1f}ms "
+            f"p99={s['p99'] * 1000:.1f}ms",
+            f"per request: tool_calls={s['tool_calls_per_request']:.2f} "
+            f"lm={s['lm_time_per_request'] * 1000:.1f}ms "
+            f"mcp={s['mcp_time_per_request'] * 1000:.1f}ms "
+            f"handshake={s['handshake_per_request'] * 1000:.1f}ms",
+            f"mcp round-trip={s['mcp_rtt'] * 1000:.2f}ms/call",
+            f"throughput: {s['requests_per_sec']:.1f} req/s, "
+            f"server {s['server_tool_calls_per_sec']:.1f} tool calls/s",
+        ]
+        errors = {s.error for s in self.stats if s.error}
+        for err in sorted(errors)[:5]:
+            lines.append(f"error: {err}")
+        return "\n".join(lines)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile, 0.0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def _mean(values: List[float]) -> float:
+    return sum(values) / len(values) if values else 0.0
+
+
+_current: contextvars.ContextVar[RequestStats] = contextvars.ContextVar(
+    "benchmark_request_stats"
+)
+
+
+def booking_script(messages) -> Dict[str, object]:
+    """Replay BOOKING_SCRIPT, picking the step from the observations seen so far."""
+    fields = requested_fields(messages)
+    if "next_tool_name" not in fields:
+        return {
+            "reasoning": "The itinerary has been booked.",
+            "process_result": "Your flight DA123 from SFO to JFK is booked.",
+        }
+    # trajectory 里嵌套了 [[ ## observation_i ## ]] 字段，直接在整条 user message 上计数
+    trajectory = messages[-1].get("content") or ""
+    step = min(trajectory.count("[[ ## observation_"), len(BOOKING_SCRIPT) - 1)
+    tool_name, tool_args = BOOKING_SCRIPT[step]
+    return {
+        "next_thought": f"Next I should call {tool_name}.",
+        "next_tool_name": tool_name,
+        "next_tool_args": tool_args,
+    }
+
+
+class TimedScriptedLM(ScriptedLM):
+    async def aforward(self, prompt=None, messages=None, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await super().aforward(prompt=prompt, messages=messages, **kwargs)
+        finally:
+            stats = _current.get(None)
+            if stats is not None:
+                stats.lm_time += time.perf_counter() - start
+                stats.lm_calls += 1
+
+
+class TimedClientSession(ClientSession):
+    async def call_tool(self, name, arguments=None, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await super().call_tool(name, arguments, *args, **kwargs)
+        finally:
+            stats = _current.get(None)
+            if stats is not None:
+                stats.mcp_time += time.perf_counter() - start
+                stats.tool_calls += 1
+
+
+async def _run_one(session: Optional[ClientSession]) -> RequestStats:
+    stats = RequestStats()
+    _current.set(stats)
+    start = time.perf_counter()
+    try:
+        if session is None:
+            # 与 dspy_tools.run 相同：每个请求拉起一个独立的 server 进程
+            async with stdio_client(server_params) as (read, write):
+                async with TimedClientSession(read, write) as own_session:
+                    await own_session.initialize()
+                    stats.handshake_time = time.perf_counter() - start
+                    await run_with_session(own_session, USER_REQUEST)
+        else:
+            await run_with_session(session, USER_REQUEST)
+    except Exception as e:
+        stats.error = f"{type(e).__name__}: {e}"
+    stats.latency = time.perf_counter() - start
+    return stats
+
+
+async def run_benchmark(
+    requests: int, concurrency: int, mode: str = "shared"
+) -> BenchmarkReport:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(session):
+        async with semaphore:
+            return await _run_one(session)
+
+    async def drive(session):
+        start = time.perf_counter()
+        # create_task 会复制 context，每个请求拿到自己的 RequestStats
+        tasks = [asyncio.create_task(bounded(session)) for _ in range(requests)]
+        stats = await asyncio.gather(*tasks)
+        return stats, time.perf_counter() - start
+
+    if mode == "shared":
+        async with stdio_client(server_params) as (read, write):
+            async with TimedClientSession(read, write) as session:
+                await session.initialize()
+                stats, wall = await drive(session)
+    else:
+        stats, wall = await drive(None)
+    return BenchmarkReport(mode, requests, concurrency, wall, list(stats))
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the airline ReAct agent against mcp_server.py"
+    )
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument(
+        "--mode",
+        default="shared",
+        choices=["shared", "spawn"],
+        help="shared: one MCP session for all requests; spawn: one server per request",
+    )
+    parser.add_argument(
+        "--lm-latency",
+        type=float,
+        default=0.05,
+        help="Mean fake LM latency in seconds",
+    )
+    parser.add_argument(
+        "--lm-jitter",
+        type=float,
+        default=0.2,
+        help="Relative jitter of the fake LM latency",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    rng = random.Random(args.seed)
+
+    def latency() -> float:
+        return max(0.0, rng.gauss(args.lm_latency, args.lm_latency * args.lm_jitter))
+
+    dspy.configure(lm=TimedScriptedLM(booking_script, latency=latency))
+    report = asyncio.run(run_benchmark(args.requests, args.concurrency, args.mode))
+    print(report.format())
+    return report
+
+
+if __name__ == "__main__":
+    main()
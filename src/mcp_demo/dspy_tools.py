@@ -3,12 +3,15 @@ from mcp.client.stdio import stdio_client
 import dspy
 import logging
 
+from lib.dspy_utils import list_session_tools
+
 
 server_params = StdioServerParameters(
     command="python",
     args=["./mcp_demo/mcp_server.py"],
     env=None,
 )
+SERVER_KEY = " ".join([server_params.command, *server_params.args])
 
 
 class DSPyAirlineCustomerService(dspy.Signature):
@@ -29,19 +32,18 @@ async def run(user_request):
         async with ClientSession(read, write) as session:
             # Initialize the connection
             await session.initialize()
-            # List available tools
-            tools = await session.list_tools()
+            return await run_with_session(session, user_request)
+
 
-            # Convert MCP tools to DSPy tools
-            dspy_tools = []
-            for tool in tools.tools:
-                dspy_tools.append(dspy.Tool.from_mcp_tool(session, tool))
+async def run_with_session(session: ClientSession, user_request: str):
+    # List available tools (cached per server, rebound to this session)
+    dspy_tools = await list_session_tools(session, SERVER_KEY)
 
-            # Create the agent
-            react = dspy.ReAct(DSPyAirlineCustomerService, tools=dspy_tools)
+    # Create the agent
+    react = dspy.ReAct(DSPyAirlineCustomerService, tools=dspy_tools)
 
-            res = await react.acall(user_request=user_request)
-            return res
+    res = await react.acall(user_request=user_request)
+    return res
 
 
 async def resolve_user_request(user_request: str):
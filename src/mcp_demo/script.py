@@ -5,7 +5,7 @@ from mcp_demo.dspy_tools import resolve_user_request
 
 
 if __name__ == "__main__":
-    init_dspy(Lm_Glm)
+    init_dspy(Lm_Glm, namespace="mcp_demo")
     user_request = (
         "please help me book a flight from SFO to JFK on 09/01/2025, my name is Adam"
     )
@@ -5,19 +5,9 @@ import os
 import shutil
 from pathlib import Path
 from dotenv import load_dotenv
-from mem0 import Memory
-import dspy
-import litellm
-
-
-from lib.custom_lm.lms import Lm_Glm, Lm_Ollama_Qwen3_4b
-from mem.memory_tools import MemoryReActAgent
 
 # Embedder/LLM endpoints and a dedicated persist dir per embedder
 PERSIST_DIR = Path.home() / ".mem0_qwen3_4b"
-lm = Lm_Glm
-litellm.drop_params = True
-logging.basicConfig(level=logging.DEBUG)
 
 
 config = {
@@ -49,13 +39,23 @@ config = {
 
 def run_memory_agent_demo():
     """Demonstration of memory-enhanced ReAct agent."""
+    # mem0/dspy/litellm 只在真正运行 demo 时导入
+    import dspy
+    import litellm
+    from mem0 import Memory
+
+    from lib.custom_lm.cache import with_cache
+    from lib.custom_lm.lms import Lm_Glm
+    from mem.memory_tools import MemoryReActAgent
+
+    logging.basicConfig(level=logging.DEBUG)
     load_dotenv()
     logging.info(os.environ["ZAI_API_KEY"])
     lm = Lm_Glm
     litellm.drop_params = True
 
     # Configure DSPy
-    dspy.configure(lm=lm)
+    dspy.configure(lm=with_cache(lm, "mem"))
 
     # Optional: hard reset the on-disk Mem0 store to avoid dim-mismatch
     if os.getenv("MEM_CLEAR_DISK") == "1" or "--clear-disk" in sys.argv:
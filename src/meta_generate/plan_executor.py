@@ -27,6 +27,17 @@ def generate_plan(user_request: str, tool_descriptions: str, database_schema: st
     return response.plan
 
 
+async def agenerate_plan(user_request: str, tool_descriptions: str, database_schema: str):
+    """generate_plan 的异步版本，在 agentd 里使用时不阻塞事件循环"""
+    predictor = dspy.ChainOfThought(GenerateDAGPlan)
+    response = await predictor.acall(
+        user_request=user_request,
+        tool_descriptions=tool_descriptions,
+        database_schema=database_schema,
+    )
+    return response.plan
+
+
 class PlanExecutor:
     def __init__(self, tool_registry: Dict[str, ToolFunction]):
         self.tools = tool_registry
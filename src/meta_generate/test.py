@@ -1,25 +1,23 @@
 import logging
-import json
-import dspy
-from fastmcp import Client
-from lib.custom_lm.lms import Lm_Glm
-from lib.dspy_utils import list_tools, init_dspy
-from meta_generate.plan_executor import PlanExecutor
-from meta_generate.utils import (
-    generate_mock_function,
-    insert_mock_data,
-)
 from pathlib import Path
 
-logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
-
 
 async def run_plan():
-    mcp_client = Client("http://127.0.0.1:8999/mcp")
+    import dspy
+    from lib.custom_lm.cache import with_cache
+    from lib.custom_lm.lms import Lm_Glm
+    from lib.dspy_utils import create_client, list_tools
+    from meta_generate.plan_executor import PlanExecutor
+    from meta_generate.utils import (
+        generate_mock_function,
+        insert_mock_data,
+    )
+
+    mcp_client = create_client("http://127.0.0.1:8999/mcp")
     SCRIPT_DIR = Path(__file__).parent.resolve()
     logging.info(f"Loading generated plan from {SCRIPT_DIR / 'generated.json'}")
     dspy.configure(show_guidelines=True)
-    dspy.configure(lm=Lm_Glm)
+    dspy.configure(lm=with_cache(Lm_Glm, "meta_exe"))
     # Allow sync tool calls to execute async implementations (e.g., insert_mock_data)
     dspy.settings.allow_tool_async_sync_conversion = True
     async with mcp_client:
@@ -37,4 +35,6 @@ async def run_plan():
 def run():
     import asyncio
 
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+
     asyncio.run(run_plan())
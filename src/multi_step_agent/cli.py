@@ -1,13 +1,19 @@
 import logging
 import asyncio
+
+from agentd import client as agentd_client
 from lib.utils import parse_args
-from multi_step_agent.modules import PlanThenReAct
 
 
 def run():
     args = parse_args()
+    logging.basicConfig(level=args.log_level)
     logging.info(f"User request: {args.user_request}")
-    planner = PlanThenReAct()
-    # planner.forward is async, so run it via the event loop
-    result = asyncio.run(planner.forward(goal=args.user_request))
+    result = agentd_client.call("planner", {"goal": args.user_request})
+    if result is None:
+        from multi_step_agent.modules import PlanThenReAct
+
+        planner = PlanThenReAct()
+        # planner.forward is async, so run it via the event loop
+        result = asyncio.run(planner.forward(goal=args.user_request))
     logging.info(f"Plan result: {result}")
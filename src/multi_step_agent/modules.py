@@ -2,7 +2,6 @@
 import json
 import logging
 import dspy
-from fastmcp import Client
 from lib import dspy_utils
 from lib.custom_lm.lms import Lm_Glm
 from mcp_demo.dspy_tools import DSPyAirlineCustomerService
@@ -10,7 +9,7 @@ from multi_step_agent.schemas import PlanSignature, SubTaskInput, SummarySignatu
 from typing import List, Tuple
 
 
-client = Client("http://127.0.0.1:8999/mcp")
+client = dspy_utils.create_client("http://127.0.0.1:8999/mcp")
 
 
 class PlanThenReAct(dspy.Module):
@@ -23,7 +22,7 @@ class PlanThenReAct(dspy.Module):
 
     def __init__(self, max_subtasks: int = 6, max_react_iters: int = 5):
         super().__init__()
-        dspy_utils.init_dspy(Lm_Glm)
+        dspy_utils.init_dspy(Lm_Glm, namespace="planner")
         self.max_subtasks = max_subtasks
 
     def _build_context_summary(self, completed: List[Tuple[str, str]]) -> str:
@@ -52,13 +51,10 @@ class PlanThenReAct(dspy.Module):
 
     async def forward(self, goal: str):
         async with client:
-            tools = await client.list_tools()
-            logging.info(f"Available tools: {tools}")
-            tool_desc = [tool.description for tool in tools]
+            dspy_tools = await dspy_utils.list_tools(client)
+            logging.info(f"Available tools: {[tool.name for tool in dspy_tools]}")
+            tool_desc = [tool.desc for tool in dspy_tools]
             logging.info(f"Tool descriptions: {tool_desc}")
-            dspy_tools: List[dspy.Tool] = []
-            for tool in tools:
-                dspy_tools.append(dspy.Tool.from_mcp_tool(client.session, tool))
             # === Step 1: 结构化 Planning ===
             planner = dspy.Predict(PlanSignature)
             subtask_react = dspy.ReAct(SubTaskInput, tools=dspy_tools)
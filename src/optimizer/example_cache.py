@@ -0,0 +1,181 @@
+import json
+import logging
+import os
+import random
+import shutil
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import dspy
+import numpy as np
+
+
+CACHE_DIR = Path(
+    os.getenv("EXAMPLE_CACHE_DIR", Path.home() / ".cache" / "dspy-demo" / "examples")
+)
+# 缓存格式或准备逻辑变化时加一，旧版本的目录不再使用
+CACHE_VERSION = 2
+
+BANKING77 = "PolyAI/banking77"
+
+_META = "meta.json"
+_ARRAYS = "examples.npz"
+
+
+class ExampleCache:
+    """
+    一个数据集划分的本地缓存：文本（UTF-8 拼接 + 偏移）、int16 标签和类名。
+    保存完整的划分，采样大小和方式变化时不需要重新下载。
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.meta = json.loads((self.root / _META).read_text(encoding="utf-8"))
+        with np.load(self.root / _ARRAYS) as arrays:
+            self._text = arrays["text"].tobytes()
+            self._offsets = arrays["offsets"]
+            self.labels = arrays["labels"]
+        self.classes: List[str] = self.meta["classes"]
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def text(self, i: int) -> str:
+        return self._text[self._offsets[i] : self._offsets[i + 1]].decode("utf-8")
+
+    def example(self, i: int) -> dspy.Example:
+        label = self.classes[int(self.labels[i])]
+        return dspy.Example(text=self.text(i), hint=label, label=label).with_inputs(
+            "text", "hint"
+        )
+
+    def sample(
+        self, size: Optional[int] = 2000, stratified: bool = False, seed: int = 0
+    ) -> List[dspy.Example]:
+        """
+        取 size 条样本并打乱。
+
+        - stratified=True：按各类别在划分中的比例分配名额（最大余数法），类内随机抽取
+        - stratified=False：与原来相同，取前 size 条
+        """
+        n = len(self) if size is None else min(size, len(self))
+        if stratified:
+            indices = stratified_indices(self.labels, n, seed)
+        else:
+            indices = list(range(n))
+        examples = [self.example(i) for i in indices]
+        random.Random(seed).shuffle(examples)
+        return examples
+
+
+def stratified_indices(labels: Sequence[int], size: int, seed: int = 0) -> List[int]:
+    by_label = defaultdict(list)
+    for i, label in enumerate(labels):
+        by_label[int(label)].append(i)
+    total = len(labels)
+    quotas = {label: size * len(rows) / total for label, rows in by_label.items()}
+    counts = {label: int(quota) for label, quota in quotas.items()}
+    # 剩下的名额给小数部分最大的类别
+    remainder = size - sum(counts.values())
+    for label in sorted(quotas, key=lambda l: (counts[l] - quotas[l], l))[:remainder]:
+        counts[label] += 1
+    rng = random.Random(seed)
+    indices = []
+    for label in sorted(by_label):
+        indices += rng.sample(by_label[label], counts[label])
+    return sorted(indices)
+
+
+def cache_root(dataset: str, split: str) -> Path:
+    return CACHE_DIR / dataset.replace("/", "__") / split / f"v{CACHE_VERSION}"
+
+
+def build_cache(
+    root: Path, texts: Sequence[str], labels: Sequence[int], classes: Sequence[str], **meta
+) -> ExampleCache:
+    root.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(dir=root.parent, prefix=f".{root.name}-"))
+    try:
+        encoded = [text.encode("utf-8") for text in texts]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(data) for data in encoded], out=offsets[1:])
+        np.savez(
+            staging / _ARRAYS,
+            text=np.frombuffer(b"".join(encoded), dtype=np.uint8),
+            offsets=offsets,
+            labels=np.asarray(labels, dtype=np.int16),
+        )
+        meta = {
+            "version": CACHE_VERSION,
+            "rows": len(encoded),
+            "classes": list(classes),
+            "built": time.time(),
+            **meta,
+        }
+        # meta.json 最后写，存在即表示缓存完整
+        (staging / _META).write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        shutil.rmtree(root, ignore_errors=True)
+        try:
+            staging.rename(root)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return ExampleCache(root)
+
+
+def _download(
+    dataset: str, split: str, revision: Optional[str] = None
+) -> Tuple[List[str], List[int], List[str], str]:
+    # 只在第一次构建缓存时需要 datasets 和网络
+    from datasets import load_dataset
+
+    ds = load_dataset(dataset, split=split, revision=revision, trust_remote_code=True)
+    try:
+        classes = list(ds.features["label"].names)  # type: ignore[attr-defined]
+    except Exception as e:
+        raise RuntimeError(f"Failed to load dataset features for '{dataset}'") from e
+    # datasets 按数据文件和处理步骤算出的 hash，上游数据变了它也会变
+    return list(ds["text"]), list(ds["label"]), classes, ds._fingerprint
+
+
+def _is_fresh(root: Path, revision: Optional[str]) -> bool:
+    try:
+        meta = json.loads((root / _META).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return False
+    return meta.get("revision") == revision and bool(meta.get("fingerprint"))
+
+
+def load_example_cache(
+    dataset: str = BANKING77,
+    split: str = "train",
+    revision: Optional[str] = None,
+    rebuild: bool = False,
+) -> ExampleCache:
+    """
+    读取本地缓存；没有缓存、缓存是按别的 revision 建的（或 rebuild=True）时下载一次并写入缓存。
+
+    revision 是 Hugging Face 上数据集仓库的 commit / tag，固定它才能保证不同机器上的样本
+    相同；为 None 时缓存第一次下载时的最新版本，之后不再联网检查，上游更新后用
+    rebuild=True 刷新。meta.json 里的 fingerprint 记录了建缓存时数据的 hash，用于对比。
+    """
+    root = cache_root(dataset, split)
+    if not rebuild and _is_fresh(root, revision):
+        return ExampleCache(root)
+    logging.info(f"Building example cache for {dataset}[{split}]@{revision or 'latest'} in {root}")
+    texts, labels, classes, fingerprint = _download(dataset, split, revision)
+    return build_cache(
+        root,
+        texts,
+        labels,
+        classes,
+        dataset=dataset,
+        split=split,
+        revision=revision,
+        fingerprint=fingerprint,
+    )
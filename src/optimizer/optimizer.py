@@ -1,58 +1,30 @@
 import dspy
-import random
-from typing import Any
-from datasets import load_dataset
-from dspy.datasets import DataLoader
-from itertools import islice
+from typing import Optional
 from dspy.teleprompt import LabeledFewShot
 import logging
 
-logging.basicConfig(level=logging.INFO)
-
-
-def setup_optimizer(lm: dspy.LM):
-    # Load the Banking77 dataset.
-    ds = load_dataset("PolyAI/banking77", split="train", trust_remote_code=True)
-
-    # Safely obtain the label names; load_dataset can return different container types
-    # depending on typing/runtime, so try multiple access patterns and raise a clear error.
-    try:
-        label_names = ds.features["label"].names  # type: ignore[attr-defined]
-    except Exception:
-        try:
-            label_names = ds["train"].features["label"].names  # type: ignore[index]
-        except Exception as e:
-            raise RuntimeError(
-                "Failed to load dataset features for 'PolyAI/banking77'"
-            ) from e
+from optimizer.example_cache import BANKING77, load_example_cache
 
-    CLASSES: list[str] = list(label_names)
-    kwargs: dict[str, Any] = {
-        "fields": ("text", "label"),
-        "input_keys": ("text",),
-        "split": "train",
-        "trust_remote_code": True,
-    }
-
-    # Load the first 2000 examples from the dataset, and assign a hint to each *training* example.
-    def _label_index(x: Any) -> int:
-        if isinstance(x, dict):
-            return x["label"]
-        if hasattr(x, "label"):
-            return getattr(x, "label")
-        raise TypeError("Cannot extract 'label' from example")
+logging.basicConfig(level=logging.INFO)
 
-    trainset: list[dspy.Example] = []
-    hf_loaded = DataLoader().from_huggingface(dataset_name="PolyAI/banking77", **kwargs)
-    for x in islice(hf_loaded, 2000):
-        label_idx = _label_index(x)
-        trainset.append(
-            dspy.Example(
-                x, hint=CLASSES[label_idx], label=CLASSES[label_idx]
-            ).with_inputs("text", "hint")
-        )
 
-    random.Random(0).shuffle(trainset)
+def setup_optimizer(
+    lm: dspy.LM,
+    sample_size: Optional[int] = 2000,
+    stratified: bool = False,
+    seed: int = 0,
+    revision: Optional[str] = None,
+):
+    # Banking77 的训练集缓存在本地（第一次运行时下载一次），之后离线读取；
+    # revision 固定 Hugging Face 上的数据集版本
+    cache = load_example_cache(BANKING77, split="train", revision=revision)
+    CLASSES: list[str] = cache.classes
+
+    # 每条训练样本都带上 hint；默认与原来一样取前 sample_size 条，
+    # stratified=True 时按类别比例抽样，各类别占比与完整训练集一致
+    trainset: list[dspy.Example] = cache.sample(
+        sample_size, stratified=stratified, seed=seed
+    )
 
     # keep the signature string separate to avoid passing a positional argument
     signature_spec: str = "text, hint -> label"
@@ -0,0 +1,23 @@
+import pytest
+
+from lib.custom_lm.rate_limit import RateLimiter, TokenBucket
+
+
+@pytest.mark.parametrize("rate", [0.1, 0.25, 0.5])
+def test_rate_below_one_spaces_requests_by_one_over_rate(rate):
+    bucket = TokenBucket(rate)
+    assert bucket.reserve(1) == 0.0
+    assert bucket.reserve(1) == pytest.approx(1 / rate, abs=0.01)
+    assert bucket.reserve(1) == pytest.approx(2 / rate, abs=0.01)
+
+
+def test_limiter_requests_per_sec_below_one():
+    limiter = RateLimiter(requests_per_sec=0.5)
+    waits = [limiter.request_bucket.reserve(1) for _ in range(3)]
+    assert waits == pytest.approx([0.0, 2.0, 4.0], abs=0.01)
+
+
+def test_rate_above_one_allows_burst_of_rate():
+    bucket = TokenBucket(4)
+    assert [bucket.reserve(1) for _ in range(4)] == [0.0] * 4
+    assert bucket.reserve(1) == pytest.approx(0.25, abs=0.01)